@@ -1,29 +1,38 @@
 import asyncio
 import logging
 import sys
-import time
 
 import mini.mini_sdk as MiniSdk
-from mini.dns.dns_browser import WiFiDevice
 
 from mini.apis.api_action import MoveRobot, MoveRobotDirection, MoveRobotResponse, StopAllAction
 
 from mini.apis.api_action import PlayAction, PlayActionResponse
 
-from mini.apis.api_sence import GetInfraredDistance
 from mini.apis.base_api import MiniApiResultType
 
-from mini.apis.api_sound import StartPlayTTS
-
 from mini.apis.api_observe import ObserveFaceDetect
-from mini.pb2.codemao_facedetecttask_pb2 import FaceDetectTaskResponse
+
+import robot_daemon
+import sdk_metrics
+import phrase_cache
+import speech_scheduler
+from motion_plan import MotionPlan
+from ir_stream import IRDistanceStream
+from obstacle_watchdog import ObstacleWatchdog
+from face_actor import FaceInteraction
+from pose_tracker import PoseTracker
+from occupancy_grid import OccupancyGrid
+from grid_detour import GridDetour
+from edge_bypass import EdgeBypass, rectangle_plan
+from ir_sweep import RangeSweep
+from step_governor import StepGovernor
 
 MiniSdk.set_log_level(logging.INFO)
 MiniSdk.set_robot_type(MiniSdk.RobotType.EDU)
 
 ROBOT_ID = "412"
 SEARCH_TIMEOUT = 20
-FORWARD_STEPS = 5
+CIRCLE_SIDE_STEPS = 5  # шагов между поворотами на 30°: от этого зависит размер круга
 SQUARE_SIDE_STEPS = 20
 TURN_STEPS = 1
 SLEEP_TIME = 0.3
@@ -31,49 +40,33 @@ OBSTACLE_DISTANCE_MM = 150
 OBSTACLE_BYPASS_STEPS = 7
 PAUSE_DURATION = 8
 SPEECH_DURATION = 3
+POSE_SIGMA_WARNING_MM = 300  # при такой неопределённости позы просим вернуть робота на старт
 
 # Фразы
 PHRASE_PROMOTION = "Welcome to PSB academy, I am robot promoter. Nice to meet you!"
 PHRASE_STOP = "Im fine, just need to avoid obstacle"
 PHRASE_RESUME = "Resuming promoting"
 PHRASE_FACE_DETECTED = "Hi, how are you. If u have any questions, scan the QR code"
+PHRASES = [PHRASE_PROMOTION, PHRASE_STOP, PHRASE_RESUME, PHRASE_FACE_DETECTED]
 
 
 face_observer: ObserveFaceDetect | None = None
-is_robot_paused = False
-last_face_action_time = 0
+ir_stream = IRDistanceStream()
+watchdog = ObstacleWatchdog(ir_stream, OBSTACLE_DISTANCE_MM)
+phrases = phrase_cache.PhraseCache()
+speech = speech_scheduler.SpeechScheduler(phrase_cache=phrases)
+pose = PoseTracker.load()
+grid = OccupancyGrid()
+detour = GridDetour(grid, pose, ir_stream, watchdog, OBSTACLE_DISTANCE_MM)
+sweep = RangeSweep(pose, ir_stream, on_reading=detour.record)
+governor = StepGovernor(ir_stream, pose, OBSTACLE_DISTANCE_MM)
+edge = EdgeBypass(pose, ir_stream, watchdog, OBSTACLE_BYPASS_STEPS, on_reading=detour.record, sweep=sweep)
 SPEECH_COOLDOWN = 5  #
 
 
 
-async def search_device_by_name(serial_number_suffix: str, timeout: int) -> WiFiDevice:
-    try:
-        result = await MiniSdk.get_device_by_name(serial_number_suffix, timeout)
-        print(f"Found device: {result}")
-        return result
-    except Exception as e:
-        print(f"Error searching for device: {e}")
-        return None
-
-
-async def connect_device(device: WiFiDevice):
-    try:
-        connected = await MiniSdk.connect(device)
-        if connected:
-            print(f"Successfully connected to {device.name}")
-            return True
-        else:
-            print("Connection failed")
-            return False
-    except Exception as e:
-        print(f"Error connecting: {e}")
-        return False
-
-
-async def speak(text: str):
-    tts = StartPlayTTS(text=text)
-    asyncio.create_task(tts.execute())
-    print(f"Spoke: '{text}' (in background)")
+def speak(text: str, priority: int = speech_scheduler.PROMOTION):
+    speech.say(text, priority)
 
 
 
@@ -108,15 +101,26 @@ async def turn_right(steps: int):
 
 
 async def turn_left_90():
-    for _ in range(3):
-        await turn_left(TURN_STEPS)
-        await asyncio.sleep(0.1)
+    await MotionPlan("turn_left_90").turn_left_90().run()
 
 
 async def turn_right_90():
-    for _ in range(3):
-        await turn_right(TURN_STEPS)
-        await asyncio.sleep(0.1)
+    await MotionPlan("turn_right_90").turn_right_90().run()
+
+
+async def face_towards(x: float, y: float):
+    # Доворачиваем на цель по оценке позы: так обходы и неточные повороты не копятся в дрейф
+    units = pose.turn_units_to(x, y)
+    if units > 0:
+        await MotionPlan("face_towards").turn_left(units).run()
+    elif units < 0:
+        await MotionPlan("face_towards").turn_right(-units).run()
+
+
+def report_pose():
+    print(pose)
+    if pose.position_sigma > POSE_SIGMA_WARNING_MM:
+        print(f"[POSE] Position uncertain by {pose.position_sigma:.0f} mm, put the robot back on the start mark")
 
 
 
@@ -133,86 +137,44 @@ async def play_action_by_name(action_name: str):
 
 
 async def get_distance() -> float:
-    sensor = GetInfraredDistance()
-    result_type, response = await sensor.execute()
-    if result_type == MiniApiResultType.Success and hasattr(response, "distance"):
-        return response.distance
-    return 1000.0
+    distance = await ir_stream.get_distance()
+    detour.record(distance)
+    return distance
 
 
-async def bypass_obstacle():
+async def bypass_obstacle(route_from=None, route_to=None):
     print("Initiating obstacle bypass.")
-    await speak(PHRASE_STOP)
-
-    await turn_left_90()
-    await move_forward(OBSTACLE_BYPASS_STEPS)
-
-    await turn_right_90()
-    await move_forward(OBSTACLE_BYPASS_STEPS * 2)
-
-    await turn_right_90()
-    await move_forward(OBSTACLE_BYPASS_STEPS)
+    speak(PHRASE_STOP, speech_scheduler.SAFETY)
 
-    await turn_left_90()
+    # Сначала шагаем вбок, пока впереди не станет свободно; широкое препятствие — обход по карте
+    # с возвратом на маршрут; прямоугольник — только если путь не найден
+    if not (await edge.run()).ok and not (await detour.run(route_from, route_to)).ok:
+        print("[⚠️] No detour on the map, falling back to the fixed bypass.")
+        await rectangle_plan(OBSTACLE_BYPASS_STEPS).run()
 
-    await speak(PHRASE_RESUME)
+    speak(PHRASE_RESUME, speech_scheduler.SAFETY)
     print("Obstacle bypassed. Resuming pattern.")
 
 
 
-async def resume_robot():
-    global is_robot_paused, last_face_action_time
-    if is_robot_paused:
-        is_robot_paused = False
-        last_face_action_time = time.time()
-        print("[RESUME] Face disappeared. Robot resumed movement.")
-
-
-async def DoFaceAction():
-    global is_robot_paused
-
-
+async def greet_visitor():
     await StopAllAction(is_serial=True).execute()
-    is_robot_paused = True
     print("[PAUSE] Robot paused due to face detection and waiting for person to leave.")
 
-
-    await speak(PHRASE_FACE_DETECTED)
+    speak(PHRASE_FACE_DETECTED, speech_scheduler.FACE_GREETING)
     await play_action_by_name("greet_2")
 
     await asyncio.sleep(SPEECH_DURATION)
 
 
-
-
-def face_detect_handler(msg: FaceDetectTaskResponse):
-    global is_robot_paused, last_face_action_time
-
-    if msg.isSuccess:
-        count = msg.count
-        current_time = time.time()
-
-        if count > 0:
-
-            if not is_robot_paused and (current_time - last_face_action_time) > SPEECH_COOLDOWN:
-
-                asyncio.create_task(DoFaceAction())
-            elif is_robot_paused:
-
-                pass
-
-        else:
-
-            if is_robot_paused:
-
-                asyncio.create_task(resume_robot())
+faces = FaceInteraction(greet_visitor, cooldown=SPEECH_COOLDOWN)
 
 
 def setup_face_observer():
     global face_observer
     if face_observer is None:
         face_observer = ObserveFaceDetect()
-        face_observer.set_handler(face_detect_handler)
+        face_observer.set_handler(faces.handle)
         face_observer.start()
         print("[OBSERVE] Face detection observer started.")
 
@@ -235,20 +197,29 @@ async def walk_in_circle_pattern(turn_function):
 
     while True:
 
-        if is_robot_paused:
+        if faces.paused:
             await asyncio.sleep(0.5)
             continue
 
 
-        distance = await get_distance()
-        if distance <= OBSTACLE_DISTANCE_MM:
-            print(f" Obstacle detected at {distance:.1f} mm! Stopping and bypassing.")
-            await StopAllAction(is_serial=True).execute()
-            await bypass_obstacle()
-            continue
+        # Сторона всегда CIRCLE_SIDE_STEPS шагов; регулятор только режет её на куски покороче у препятствия
+        steps_left = CIRCLE_SIDE_STEPS
+        while steps_left > 0:
+            distance = await get_distance()
+            if distance <= OBSTACLE_DISTANCE_MM:
+                print(f" Obstacle detected at {distance:.1f} mm! Stopping and bypassing.")
+                await StopAllAction(is_serial=True).execute()
+                await bypass_obstacle()
+                continue
 
 
-        await move_forward(FORWARD_STEPS)
+            chunk = min(governor.chunk(distance), steps_left)
+            moved = await watchdog.guard(move_forward(chunk))
+            governor.record(moved is None)
+            if moved is None:
+                await bypass_obstacle()
+                continue
+            steps_left -= chunk
         await asyncio.sleep(SLEEP_TIME)
 
         #
@@ -257,7 +228,8 @@ async def walk_in_circle_pattern(turn_function):
 
 
         if turn_counter % 2 == 0:
-            asyncio.create_task(speak(PHRASE_PROMOTION))
+            speak(PHRASE_PROMOTION)
+            report_pose()
 
         await asyncio.sleep(SLEEP_TIME)
 
@@ -267,41 +239,52 @@ async def walk_in_circle_pattern(turn_function):
 async def walk_in_square_pattern(turn_function):
     side_counter = 0
 
-    turn_90_function = turn_left_90 if turn_function == turn_left else turn_right_90
+    turn_sign = 1 if turn_function == turn_left else -1
     direction_name = "LEFTWARD (counterclockwise)" if turn_function == turn_left else "RIGHTWARD (clockwise)"
     print(f"[INFO] Chosen pattern: SQUARE. Direction: {direction_name}")
 
+    # Углы квадрата в системе координат старта: робот идёт к углу по оценке позы, а не вслепую
+    side_mm = SQUARE_SIDE_STEPS * pose.step_length_mm
+    corners = [(side_mm, 0.0), (side_mm, turn_sign * side_mm), (0.0, turn_sign * side_mm), (0.0, 0.0)]
+    pose.reset()
+
     while True:
 
-        if is_robot_paused:
+        if faces.paused:
             await asyncio.sleep(0.5)
             continue
 
-
-        steps_done = 0
-        while steps_done < SQUARE_SIDE_STEPS:
+        corner = corners[side_counter % 4]
+        previous = corners[(side_counter - 1) % 4]
+        await face_towards(*corner)
+        while (steps_left := pose.steps_to(*corner)) > 0:
 
 
             distance = await get_distance()
             if distance <= OBSTACLE_DISTANCE_MM:
                 print(f" Obstacle detected at {distance:.1f} mm! Stopping and bypassing.")
                 await StopAllAction(is_serial=True).execute()
-                await bypass_obstacle()
+                await bypass_obstacle(previous, corner)
+                await face_towards(*corner)
                 continue
 
 
-            await move_forward(FORWARD_STEPS)
-            steps_done += FORWARD_STEPS
+            moved = await watchdog.guard(move_forward(min(governor.chunk(distance), steps_left)))
+            governor.record(moved is None)
+            if moved is None:
+                await bypass_obstacle(previous, corner)
+                await face_towards(*corner)
+                continue
             await asyncio.sleep(SLEEP_TIME)
 
 
         print(f"[→] Side {side_counter % 4 + 1} complete. Turning 90 degrees.")
-        await turn_90_function()
+        report_pose()
         side_counter += 1
 
 
         if side_counter % 4 == 0:
-            asyncio.create_task(speak(PHRASE_PROMOTION))
+            speak(PHRASE_PROMOTION)
 
         await asyncio.sleep(SLEEP_TIME * 2)
 
@@ -350,26 +333,29 @@ async def main():
         selected_pattern_function = walk_in_square_pattern
 
 
-    device = await search_device_by_name(ROBOT_ID, SEARCH_TIMEOUT)
-    if not device:
-        print("[Error] No robot found.")
-        return
+    sdk_metrics.instrument_sdk()
+    sdk_metrics.start_http_server()
 
-    connected = await connect_device(device)
-    if not connected:
+    # Если демон уже держит подключение, старт занимает миллисекунды вместо поиска и enter_program
+    session = await robot_daemon.open_session(ROBOT_ID, SEARCH_TIMEOUT)
+    if not session:
         print("[Error] Could not connect to robot.")
         return
 
+    metrics_dump = asyncio.create_task(sdk_metrics.dump_periodically())
+    pose.attach()
+    phrases.serve(session.address)
     try:
-        await MiniSdk.enter_program()
-        print("Entered programming mode.")
-        await asyncio.sleep(1)
+        await phrases.prewarm(PHRASES)
 
 
+        faces.start()
         setup_face_observer()
+        ir_stream.start()
+        speech.start()
 
 
-        await speak(PHRASE_PROMOTION)
+        speak(PHRASE_PROMOTION)
         await asyncio.sleep(1)
 
 
@@ -381,8 +367,13 @@ async def main():
     finally:
 
         stop_face_observer()
-        await MiniSdk.quit_program()
-        await MiniSdk.release()
+        faces.stop()
+        ir_stream.stop()
+        speech.stop()
+        phrases.shutdown()
+        metrics_dump.cancel()
+        sdk_metrics.dump_json()
+        await session.close()
         print("Shutdown complete.")
 
 
@@ -3,8 +3,7 @@ import logging
 import sys
 from mini.dns.dns_browser import WiFiDevice
 import mini.mini_sdk as MiniSdk
-from mini.apis.base_api import MiniApiResultType
-from mini.apis.api_sence import GetInfraredDistance
+from ir_stream import IRDistanceStream, MAX_SAMPLE_AGE
 
 # === SDK Configuration & Constants ===
 MiniSdk.set_log_level(logging.INFO)
@@ -12,6 +11,7 @@ MiniSdk.set_robot_type(MiniSdk.RobotType.EDU)
 ROBOT_ID = "412"
 SEARCH_TIMEOUT = 20
 SLEEP_DURATION = 1
+MONITOR_PERIOD = 0.2  # сек — период подписки на датчик
 
 
 # === Search and Connect ===
@@ -44,34 +44,43 @@ async def connect_device(device: WiFiDevice):
 # ----------------------------------------------------------------------
 
 async def monitor_distance():
-    """Непрерывно опрашивает и выводит данные с TOF IR сенсора."""
+    """Подписывается на TOF IR сенсор и выводит его данные."""
 
     print("\n=======================================================")
     print(" [📊] Начинаю мониторинг TOF IR сенсора. Нажмите Ctrl+C для выхода.")
     print("=======================================================")
 
-    # Создаем блок команды
-    monitor_command = GetInfraredDistance(is_serial=True)
+    # Робот сам присылает замеры, читаем последний из кольцевого буфера
+    stream = IRDistanceStream(use_observer=True, period=MONITOR_PERIOD)
+    stream.start()
+
+    try:
+        await _print_samples(stream)
+    finally:
+        stream.stop()
+
+
+async def _print_samples(stream: IRDistanceStream):
+    last_count = 0
 
     while True:
         try:
-            # Вызываем .execute() НА БЛОКЕ КОМАНДЫ
-            result_type, response = await monitor_command.execute()
+            await asyncio.sleep(MONITOR_PERIOD)
 
-            if result_type == MiniApiResultType.Success and response and hasattr(response, 'distance'):
-                distance_mm = response.distance
+            sample = stream.latest()
+            if sample is not None and stream.ring.count != last_count:
+                last_count = stream.ring.count
+                distance_mm, age = sample
 
                 # *** Визуальный индикатор для проверки ***
                 # Предупреждение о близком объекте (например, 200 мм = 20 см)
                 if distance_mm < 200:
-                    print(f"[🚨 БЛИЗКО] Расстояние: {distance_mm} мм")
+                    print(f"[🚨 БЛИЗКО] Расстояние: {distance_mm:.0f} мм (возраст {age * 1000:.0f} мс)")
                 else:
-                    print(f"[✅ ОК] Расстояние: {distance_mm} мм")
-            else:
-                # В случае неудачи или таймаута
-                print(f"[⚠️ ОШИБКА] Мониторинг не удался. Результат: {result_type}")
-
-            await asyncio.sleep(0.5)
+                    print(f"[✅ ОК] Расстояние: {distance_mm:.0f} мм (возраст {age * 1000:.0f} мс)")
+            elif sample is None or sample[1] > MAX_SAMPLE_AGE:
+                # Новых замеров нет
+                print("[⚠️ ОШИБКА] Нет свежих данных от сенсора.")
 
         except (asyncio.CancelledError, KeyboardInterrupt):
             print("\n[!] Мониторинг прерван пользователем.")
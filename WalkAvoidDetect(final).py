@@ -3,7 +3,6 @@ import logging
 import sys
 
 import mini.mini_sdk as MiniSdk
-from mini.dns.dns_browser import WiFiDevice
 from mini.apis.api_action import MoveRobot, MoveRobotDirection, MoveRobotResponse, StopAllAction
 from mini.apis.api_sence import GetInfraredDistance
 from mini.apis.base_api import MiniApiResultType
@@ -12,6 +11,8 @@ from mini.apis.api_sound import StartPlayTTS
 from mini.apis.api_observe import ObserveFaceDetect
 from mini.pb2.codemao_facedetecttask_pb2 import FaceDetectTaskResponse
 
+import robot_daemon
+
 # ==================================
 
 # === SDK CONFIG ===
@@ -25,7 +26,6 @@ WALK_STEPS = 20
 STEP_SIZE = 5  # шаги за один execute
 OBSTACLE_DISTANCE_MM = 150  # порог в миллиметрах
 RESUME_WAIT = 1.5
-SLEEP_AFTER_PROGRAM = 3
 OBSTACLE_BYPASS_STEPS = 7  # шаги при обходе препятствия
 
 # === ФРАЗЫ ===
@@ -43,28 +43,6 @@ SPEECH_COOLDOWN = 5  # Задержка в секундах между прив
 
 # === HELPER FUNCTIONS ===
 
-async def search_device(serial_number: str, timeout: int) -> WiFiDevice:
-    try:
-        device = await MiniSdk.get_device_by_name(serial_number, timeout)
-        print(f"[✓] Found device: {device}")
-        return device
-    except Exception as e:
-        print(f"[X] Error searching device: {e}")
-        return None
-
-
-async def connect_device(device: WiFiDevice):
-    try:
-        connected = await MiniSdk.connect(device)
-        if connected:
-            print(f"[✓] Connected to {device.name}")
-            return True
-        print("[X] Connection failed")
-        return False
-    except Exception as e:
-        print(f"[X] Error connecting: {e}")
-        return False
-
 
 async def speak(text: str):
     tts = StartPlayTTS(text=text)
@@ -235,20 +213,13 @@ async def walk_with_obstacle_check():
 # === MAIN PROGRAM ===
 
 async def main():
-    device = await search_device(ROBOT_ID, SEARCH_TIMEOUT)
-    if not device:
+    # Через демон, если он запущен; иначе поиск, подключение и enter_program здесь же
+    session = await robot_daemon.open_session(ROBOT_ID, SEARCH_TIMEOUT)
+    if not session:
         print("[X] Robot not found")
         return
 
-    if not await connect_device(device):
-        print("[X] Connection failed")
-        return
-
     try:
-        await MiniSdk.enter_program()
-        print("[✓] Entered program mode")
-        await asyncio.sleep(SLEEP_AFTER_PROGRAM)
-
         # === ЗАПУСК ФОНОВОГО НАБЛЮДАТЕЛЯ ЛИЦ ===
         setup_face_observer()
         # =======================================
@@ -263,8 +234,7 @@ async def main():
         stop_face_observer()
         # ===============================================
         print("\n[SHUTDOWN] Exiting programming mode and releasing SDK resources...")
-        await MiniSdk.quit_program()
-        await MiniSdk.release()
+        await session.close()
         print("[SHUTDOWN] Complete.")
 
 
@@ -4,17 +4,23 @@ import sys
 import time  # Добавлен импорт time для точного отслеживания времени паузы
 
 import mini.mini_sdk as MiniSdk
-from mini.dns.dns_browser import WiFiDevice
 from mini.apis.api_action import MoveRobot, MoveRobotDirection, MoveRobotResponse, StopAllAction
 # === ИМПОРТ ДЛЯ РУКИ ===
 from mini.apis.api_action import PlayAction, PlayActionResponse
 # ========================
-from mini.apis.api_sence import GetInfraredDistance
 from mini.apis.base_api import MiniApiResultType
 from mini.apis.api_sound import StartPlayTTS
 from mini.apis.api_observe import ObserveFaceDetect
 from mini.pb2.codemao_facedetecttask_pb2 import FaceDetectTaskResponse
 
+from ir_stream import IRDistanceStream
+from obstacle_watchdog import ObstacleWatchdog
+from pose_tracker import PoseTracker
+from edge_bypass import EdgeBypass
+from ir_sweep import RangeSweep
+from step_governor import StepGovernor
+import robot_daemon
+
 
 MiniSdk.set_log_level(logging.INFO)
 MiniSdk.set_robot_type(MiniSdk.RobotType.EDU)
@@ -23,9 +29,7 @@ MiniSdk.set_robot_type(MiniSdk.RobotType.EDU)
 ROBOT_ID = "412"
 SEARCH_TIMEOUT = 20
 WALK_STEPS = 25
-STEP_SIZE = 5
 OBSTACLE_DISTANCE_MM = 150
-SLEEP_AFTER_PROGRAM = 3
 OBSTACLE_BYPASS_STEPS = 7
 PAUSE_DURATION = 8
 
@@ -37,6 +41,11 @@ PHRASE_FACE_DETECTED = "Hi, how are you. If u have any questions, scan the QR co
 
 
 face_observer: ObserveFaceDetect | None = None
+ir_stream = IRDistanceStream()
+watchdog = ObstacleWatchdog(ir_stream, OBSTACLE_DISTANCE_MM)
+pose = PoseTracker.load()
+governor = StepGovernor(ir_stream, pose, OBSTACLE_DISTANCE_MM)
+edge = EdgeBypass(pose, ir_stream, watchdog, OBSTACLE_BYPASS_STEPS, sweep=RangeSweep(pose, ir_stream))
 is_robot_paused = False
 last_face_action_time = 0
 SPEECH_COOLDOWN = 5
@@ -46,29 +55,6 @@ SPEECH_COOLDOWN = 5
 
 
 
-async def search_device(serial_number: str, timeout: int) -> WiFiDevice:
-    try:
-        device = await MiniSdk.get_device_by_name(serial_number, timeout)
-        print(f"[✓] Found device: {device}")
-        return device
-    except Exception as e:
-        print(f"[X] Error searching device: {e}")
-        return None
-
-
-async def connect_device(device: WiFiDevice):
-    try:
-        connected = await MiniSdk.connect(device)
-        if connected:
-            print(f"[✓] Connected to {device.name}")
-            return True
-        print("[X] Connection failed")
-        return False
-    except Exception as e:
-        print(f"[X] Error connecting: {e}")
-        return False
-
-
 async def speak(text: str):
     tts = StartPlayTTS(text=text)
     asyncio.create_task(tts.execute())
@@ -76,11 +62,7 @@ async def speak(text: str):
 
 
 async def get_distance() -> float:
-    sensor = GetInfraredDistance()
-    result_type, response = await sensor.execute()
-    if result_type == MiniApiResultType.Success and hasattr(response, "distance"):
-        return response.distance
-    return 1000.0
+    return await ir_stream.get_distance()
 
 
 async def move_forward(steps: int):
@@ -203,18 +185,20 @@ async def bypass_obstacle():
 
     await speak(PHRASE_STOP)
 
-    await turn_left_90()
-    await move_forward(OBSTACLE_BYPASS_STEPS)
+    # Шагаем вбок, пока впереди не станет свободно; полный прямоугольник — если не вышло
+    if not (await edge.run()).ok:
+        await turn_left_90()
+        await move_forward(OBSTACLE_BYPASS_STEPS)
 
-    await turn_right_90()
-    await move_forward(OBSTACLE_BYPASS_STEPS)
+        await turn_right_90()
+        await move_forward(OBSTACLE_BYPASS_STEPS)
 
-    await move_forward(OBSTACLE_BYPASS_STEPS)
+        await move_forward(OBSTACLE_BYPASS_STEPS)
 
-    await turn_right_90()
-    await move_forward(OBSTACLE_BYPASS_STEPS)
+        await turn_right_90()
+        await move_forward(OBSTACLE_BYPASS_STEPS)
 
-    await turn_left_90()
+        await turn_left_90()
     await speak(PHRASE_RESUME)
 
 
@@ -239,9 +223,15 @@ async def walk_with_obstacle_check():
                 continue
 
 
-            moved = await move_forward(STEP_SIZE)
+            # Длина куска — по свободному месту впереди, а не постоянная
+            chunk = min(governor.chunk(distance), WALK_STEPS - steps_done)
+            moved = await watchdog.guard(move_forward(chunk))
+            governor.record(moved is None)
+            if moved is None:
+                await bypass_obstacle()
+                continue
             if moved:
-                steps_done += STEP_SIZE
+                steps_done += chunk
 
             await asyncio.sleep(0.1)
 
@@ -252,28 +242,23 @@ async def walk_with_obstacle_check():
                 await asyncio.sleep(0.2)
 
 
+            print(pose)
             await speak(PHRASE_START)
 
 
 
 
 async def main():
-    device = await search_device(ROBOT_ID, SEARCH_TIMEOUT)
-    if not device:
+    # Через демон, если он запущен; иначе поиск, подключение и enter_program здесь же
+    session = await robot_daemon.open_session(ROBOT_ID, SEARCH_TIMEOUT)
+    if not session:
         print("Robot not found")
         return
 
-    if not await connect_device(device):
-        print("Connection failed")
-        return
-
     try:
-        await MiniSdk.enter_program()
-        print("Entered program mode")
-        await asyncio.sleep(SLEEP_AFTER_PROGRAM)
-
-
         setup_face_observer()
+        ir_stream.start()
+        pose.attach()
 
 
         await speak(PHRASE_START)
@@ -284,10 +269,10 @@ async def main():
     finally:
 
         stop_face_observer()
+        ir_stream.stop()
 
         print("\n[SHUTDOWN] Exiting programming mode and releasing SDK resources...")
-        await MiniSdk.quit_program()
-        await MiniSdk.release()
+        await session.close()
         print("[SHUTDOWN] Complete.")
 
 
@@ -4,7 +4,6 @@ import sys
 import time
 
 import mini.mini_sdk as MiniSdk
-from mini.dns.dns_browser import WiFiDevice
 # Импорт для движения и остановки
 from mini.apis.api_action import MoveRobot, MoveRobotDirection, MoveRobotResponse, StopAllAction
 # Импорт для руки
@@ -18,6 +17,8 @@ from mini.apis.api_sound import StartPlayTTS
 from mini.apis.api_observe import ObserveFaceDetect
 from mini.pb2.codemao_facedetecttask_pb2 import FaceDetectTaskResponse
 
+import robot_daemon
+
 MiniSdk.set_log_level(logging.INFO)
 MiniSdk.set_robot_type(MiniSdk.RobotType.EDU)
 
@@ -43,31 +44,7 @@ last_face_action_time = 0
 SPEECH_COOLDOWN = 5  # Задержка между действиями при обнаружении лица
 
 
-# --- Базовые функции (Поиск, Подключение, Речь) ---
-
-async def search_device_by_name(serial_number_suffix: str, timeout: int) -> WiFiDevice:
-    try:
-        result = await MiniSdk.get_device_by_name(serial_number_suffix, timeout)
-        print(f"[✓] Found device: {result}")
-        return result
-    except Exception as e:
-        print(f"[X] Error searching for device: {e}")
-        return None
-
-
-async def connect_device(device: WiFiDevice):
-    try:
-        connected = await MiniSdk.connect(device)
-        if connected:
-            print(f"[✓] Successfully connected to {device.name}")
-            return True
-        else:
-            print("[X] Connection failed")
-            return False
-    except Exception as e:
-        print(f"[X] Error connecting: {e}")
-        return False
-
+# --- Базовые функции (Речь) ---
 
 async def speak(text: str):
     tts = StartPlayTTS(text=text)
@@ -270,21 +247,13 @@ async def main():
             print("Неверный ввод. Пожалуйста, введите 1 или 2.")
     # =====================
 
-    device = await search_device_by_name(ROBOT_ID, SEARCH_TIMEOUT)
-    if not device:
-        print("[Error] No robot found.")
-        return
-
-    connected = await connect_device(device)
-    if not connected:
+    # Подключение через демон, если он запущен (иначе — поиск, подключение и enter_program)
+    session = await robot_daemon.open_session(ROBOT_ID, SEARCH_TIMEOUT)
+    if not session:
         print("[Error] Could not connect to robot.")
         return
 
     try:
-        await MiniSdk.enter_program()
-        print("[✓] Entered programming mode.")
-        await asyncio.sleep(1)
-
         # Настраиваем наблюдателя за лицом
         setup_face_observer()
 
@@ -301,8 +270,7 @@ async def main():
     finally:
         # Очистка
         stop_face_observer()
-        await MiniSdk.quit_program()
-        await MiniSdk.release()
+        await session.close()
         print("[✓] Shutdown complete.")
 
 
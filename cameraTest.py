@@ -1,122 +1,65 @@
+import argparse
 import asyncio
-import logging
+import os
 import sys
-import mini.mini_sdk as MiniSdk
-from mini.dns.dns_browser import WiFiDevice
-from PIL import Image
-from io import BytesIO
 
-# === SDK Configuration ===
-MiniSdk.set_log_level(logging.INFO)
-MiniSdk.set_robot_type(MiniSdk.RobotType.EDU)
+from camera_snapshots import SnapshotFetcher, HumanDetector
 
 # === Constants ===
-ROBOT_ID = "412"  # последние цифры серийного номера AlphaMini
-SEARCH_TIMEOUT = 20  # время поиска (сек)
-SLEEP_DURATION = 2  # задержка после подключения
-
-# === Search for the robot ===
-async def search_device_by_name(serial_number_suffix: str, timeout: int) -> WiFiDevice:
-    try:
-        result = await MiniSdk.get_device_by_name(serial_number_suffix, timeout)
-        print(f"[✓] Found device: {result}")
-        return result
-    except Exception as e:
-        print(f"[X] Error searching for device: {e}")
-        return None
-
-# === Connect to the robot ===
-async def connect_device(device: WiFiDevice):
-    try:
-        connected = await MiniSdk.connect(device)
-        if connected:
-            print(f"[✓] Successfully connected to {device.name}")
-            return True
-        else:
-            print("[X] Connection failed")
-            return False
-    except Exception as e:
-        print(f"[X] Error connecting: {e}")
-        return False
+SLEEP_DURATION = 2  # задержка перед завершением
+# Адреса JPEG-снимков камер (SDK не отдаёт кадры камеры робота, только сохраняет фото на SD-карту).
+# Берутся из командной строки или из переменной окружения, через пробел или запятую
+CAMERA_URLS_ENV = "ALPHAMINI_CAMERA_URLS"
 
 # === Get camera images ===
-async def get_camera_images(programmer):
-    # === Проверка датчиков камеры 1 ====
-    if programmer.camera1:
-        camera1 = programmer.camera1
-        await asyncio.sleep(1)
-        frame1 = await camera1.get_frame()
-        print(f"[INFO] Camera image received:\n{str(frame1)}")
-    else:
-        print("[Error] No camera 1 found.")
-
-    # === Проверка датчиков камеры 2 ====
-    if programmer.camera2:
-        camera2 = programmer.camera2
-        await asyncio.sleep(1)
-        frame2 = await camera2.get_frame()
-        print(f"[INFO] Camera image received:\n{str(frame2)}")
-    else:
-        print("[Error] No camera 2 found.")
-
-    # === Проверка датчиков камеры 3 ====
-    if programmer.camera3:
-        camera3 = programmer.camera3
-        await asyncio.sleep(1)
-        frame3 = await camera3.get_frame()
-        print(f"[INFO] Camera image received:\n{str(frame3)}")
-    else:
-        print("[Error] No camera 3 found.")
-
-    # === Проверка датчиков камеры 4 ====
-    if programmer.camera4:
-        camera4 = programmer.camera4
-        await asyncio.sleep(1)
-        frame4 = await camera4.get_frame()
-        print(f"[INFO] Camera image received:\n{str(frame4)}")
-    else:
-        print("[Error] No camera 4 found.")
+async def get_camera_images(fetcher: SnapshotFetcher):
+    # Все камеры запрашиваются одновременно, декодирование идёт в пуле потоков
+    frames = await fetcher.fetch_all()
+    for index, frame in enumerate(frames, start=1):
+        if frame is not None:
+            print(f"[INFO] Camera {index} image received: {frame.shape[1]}x{frame.shape[0]}")
+        else:
+            print(f"[Error] No image from camera {index}.")
+    print(f"[INFO] {len(frames)} cameras read in {fetcher.last_batch_seconds:.2f} s")
+    return frames
 
 # === Check if human detected in the images ===
-async def check_human_in_images(frame1, frame2, frame3, frame4):
-    # Replace with your own logic for detecting humans in images
-    # For example, using OpenCV library:
-    # https://docs.opencv.org/master/d7/d9f/tutorial_py_face_detection.html
-    pass
-
-# === Main connection and processing logic ===
-async def main():
-    device = await search_device_by_name(ROBOT_ID, SEARCH_TIMEOUT)
-    if not device:
-        print("[Error] No robot found.")
-        return
-
-    connected = await connect_device(device)
-    if not connected:
-        print("[Error] Couldn't connect to the robot.")
-        sys.exit()
-
-    programmer = MiniSdk.Programmer()
-    await programmer.connect(device)
-
-    # === Check if human detected in images ====
-    frames = (frame1, frame2, frame3, frame4)
-    human_detected = await check_human_in_images(*frames)
-
-    if human_detected:
-        print("[INFO] Human detected!")
-        # Replace with your own logic for stopping the robot and making sounds
-        pass
-    else:
-        print("[INFO] No human detected.")
-        # Replace with your own logic for continuing to process images
-        pass
+async def check_human_in_images(detector: HumanDetector, frames):
+    return await detector.check_human_in_images(frames)
+
+# === Camera addresses ===
+def camera_urls(argv=None) -> list[str]:
+    parser = argparse.ArgumentParser(description="Fetch snapshots from the hall cameras and check them for people")
+    parser.add_argument("urls", nargs="*", help=f"snapshot URLs of the cameras (default: ${CAMERA_URLS_ENV})")
+    args = parser.parse_args(argv)
+    return args.urls or os.environ.get(CAMERA_URLS_ENV, "").replace(",", " ").split()
+
+# === Main processing logic ===
+async def main(urls: list[str]):
+    fetcher = SnapshotFetcher(urls)
+    detector = HumanDetector()
+    try:
+        # === Check if human detected in images ====
+        frames = await get_camera_images(fetcher)
+        human_detected = await check_human_in_images(detector, frames)
+
+        if human_detected:
+            print("[INFO] Human detected!")
+            # Replace with your own logic for stopping the robot and making sounds
+            pass
+        else:
+            print("[INFO] No human detected.")
+            # Replace with your own logic for continuing to process images
+            pass
 
-    await asyncio.sleep(SLEEP_DURATION)
-    await programmer.disconnect()
+        await asyncio.sleep(SLEEP_DURATION)
+    finally:
+        fetcher.close()
 
 # === Main ====
-if name == "main":
-    asyncio.run(main())
-else:
-    pass
\ No newline at end of file
+if __name__ == "__main__":
+    urls = camera_urls()
+    if not urls:
+        print(f"[Error] No camera URLs: pass them as arguments or set {CAMERA_URLS_ENV}.")
+        sys.exit(1)
+    asyncio.run(main(urls))
@@ -0,0 +1,330 @@
+import asyncio
+import math
+import multiprocessing
+import os
+import time
+from multiprocessing import shared_memory
+from multiprocessing.connection import wait
+from threading import Thread
+
+import cv2
+import numpy as np
+
+from motion_detector import MotionDetector, FRAME_WIDTH, FRAME_HEIGHT
+from sdk_metrics import registry
+
+# === Constants ===
+FRAME_SLOTS = 4
+RESULT_SLOTS = 32
+MAX_BOXES = 8
+START_TIMEOUT = 10  # сек на открытие камеры в рабочем процессе
+STOP_TIMEOUT = 3
+WATCH_TIMEOUT = 0.25  # сек — как часто поток уведомлений снимает метрики с колец и проверяет остановку
+
+RESULT_DTYPE = np.dtype([
+    ("frame_seq", "i8"),
+    ("captured_at", "f8"),
+    ("area", "f8"),
+    ("cx", "f8"),
+    ("cy", "f8"),
+    ("detected", "u1"),
+    ("n_boxes", "i4"),
+    ("boxes", "i4", (MAX_BOXES, 4)),
+    ("person", "i1"),  # -1 — вторая стадия не запускалась
+    ("motion_ms", "f4"),
+    ("person_ms", "f4"),
+    ("fps", "f4"),
+    ("cpu_ms", "f4"),
+])
+
+
+# === Shared-memory ring ===
+class SharedRing:
+    """Fixed-size records in one shared memory block, one writer process, any number of readers.
+
+    Layout: head sequence number, one sequence number per slot, then the slots. The writer marks
+    a slot with -1 while filling it and stamps it with its sequence number afterwards; a reader
+    copies the slot and accepts it only if the stamp is the same before and after the copy
+    (a seqlock), so no locks are shared between processes and nothing is pickled.
+    """
+
+    def __init__(self, shape: tuple, dtype, slots: int, name: str | None = None):
+        self.shape = shape
+        self.dtype = np.dtype(dtype)
+        self.slots = slots
+        slot_bytes = int(np.prod(shape, dtype=np.int64)) * self.dtype.itemsize
+        size = 8 * (1 + slots) + slot_bytes * slots
+        self.owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.owner, size=size if self.owner else 0)
+        self.name = self.shm.name
+        self._head = np.ndarray((1,), np.int64, self.shm.buf, 0)
+        self._seqs = np.ndarray((slots,), np.int64, self.shm.buf, 8)
+        self._data = np.ndarray((slots,) + tuple(shape), self.dtype, self.shm.buf, 8 * (1 + slots))
+        if self.owner:
+            self._head[0] = 0
+            self._seqs[:] = 0
+
+    @property
+    def head(self) -> int:
+        return int(self._head[0])
+
+    def write(self, value) -> int:
+        seq = self.head + 1
+        slot = seq % self.slots
+        self._seqs[slot] = -1
+        self._data[slot] = value
+        self._seqs[slot] = seq
+        self._head[0] = seq
+        return seq
+
+    def read(self, seq: int, out: np.ndarray) -> bool:
+        """Copies record `seq` into out; False if it was already overwritten."""
+        slot = seq % self.slots
+        if seq <= 0 or self._seqs[slot] != seq:
+            return False
+        np.copyto(out, self._data[slot])
+        return self._seqs[slot] == seq
+
+    def close(self):
+        # Представления массивов держат буфер: без них SharedMemory не закроется
+        self._head = self._seqs = self._data = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+# === Events ===
+class MotionEvent:
+    """One analyzed frame of one camera, read back from shared memory."""
+
+    def __init__(self, camera_id, seq: int, record):
+        self.camera_id = camera_id
+        self.seq = seq
+        self.frame_seq = int(record["frame_seq"])
+        self.captured_at = float(record["captured_at"])
+        self.area = float(record["area"])
+        self.detected = bool(record["detected"])
+        self.boxes = record["boxes"][:int(record["n_boxes"])].copy()
+        self.person = None if record["person"] < 0 else bool(record["person"])
+        self.motion_ms = float(record["motion_ms"])
+        self.person_ms = float(record["person_ms"])
+        self.fps = float(record["fps"])
+        self.cpu_ms = float(record["cpu_ms"])
+        cx, cy = float(record["cx"]), float(record["cy"])
+        self.centroid = None if math.isnan(cx) else (cx, cy)
+
+    def __str__(self):
+        centroid = "-" if self.centroid is None else f"({self.centroid[0]:.0f}, {self.centroid[1]:.0f})"
+        state = "MOTION" if self.detected else "quiet"
+        return f"[CAM {self.camera_id}] {state} | Area: {int(self.area)} | Blobs: {len(self.boxes)} | Largest at {centroid}"
+
+
+class MotionTransition:
+    """Start or end of confirmed motion on one camera, pushed from its worker process."""
+
+    def __init__(self, camera_id, started: bool, captured_at: float, frame_seq: int, area: float):
+        self.camera_id = camera_id
+        self.started = started
+        self.captured_at = captured_at  # time.monotonic() кадра; часы общие для всех процессов
+        self.frame_seq = frame_seq
+        self.area = area
+        self.delivered_at = time.monotonic()
+
+    def __str__(self):
+        state = "motion started" if self.started else "motion ended"
+        return (f"[CAM {self.camera_id}] {state} | Area: {int(self.area)} | "
+                f"Delivered in {(self.delivered_at - self.captured_at) * 1000:.1f} ms")
+
+
+# === Worker process ===
+def _camera_worker(camera_id, frame_shape, frame_ring_name, result_ring_name, ready, stop, notify,
+                   detector_options):
+    frames = SharedRing(frame_shape, np.uint8, FRAME_SLOTS, frame_ring_name)
+    results = SharedRing((), RESULT_DTYPE, RESULT_SLOTS, result_ring_name)
+    record = np.zeros((), RESULT_DTYPE)
+    resized = np.empty(frame_shape, np.uint8)
+
+    def publish(frame, captured_at, motion, detected):
+        if frame.shape != frame_shape:
+            frame = cv2.resize(frame, (frame_shape[1], frame_shape[0]), dst=resized)
+        record["frame_seq"] = frames.write(frame)
+        record["captured_at"] = captured_at
+        record["detected"] = detected
+        record["area"] = motion.area
+        if motion.centroid is None:
+            record["cx"] = record["cy"] = math.nan
+        else:
+            record["cx"], record["cy"] = motion.centroid
+        n_boxes = min(len(motion.boxes), MAX_BOXES)
+        record["n_boxes"] = n_boxes
+        record["boxes"][:n_boxes] = motion.boxes[:n_boxes]
+        record["person"] = -1 if motion.person is None else motion.person
+        record["motion_ms"] = motion.motion_seconds * 1000
+        record["person_ms"] = motion.person_seconds * 1000
+        record["fps"] = detector.frame_rate.fps
+        record["cpu_ms"] = detector.frame_rate.cpu_per_frame * 1000
+        results.write(record)
+
+    def push(started, motion, captured_at):
+        # Только смены состояния: редкие сообщения, труба никогда не переполняется
+        notify.send((started, captured_at, frames.head, motion.area))
+
+    if detector_options.get("record_to"):
+        # У каждой камеры своя запись
+        detector_options = dict(detector_options, record_to=os.path.join(
+            detector_options["record_to"], f"camera-{os.path.basename(str(camera_id).rstrip(os.sep))}"))
+    detector = MotionDetector(camera_id, **detector_options)
+    detector.on_frame = publish
+    detector.on_motion = push
+    try:
+        if not detector.start():
+            return
+        ready.set()
+        stop.wait()
+    finally:
+        detector.stop()
+        frames.close()
+        results.close()
+        notify.close()
+
+
+# === Supervisor ===
+class CameraPool:
+    """Runs one MotionDetector per camera in its own process and merges their results.
+
+    Frames and motion results come back through SharedRing blocks, so the asyncio loop of the
+    robot never decodes or analyzes video and never unpickles frames. Starts and ends of motion
+    are pushed through a pipe per camera: a watcher thread blocks on the pipes and hands each
+    transition to the event loop with call_soon_threadsafe, so transitions() wakes up at once
+    instead of polling. Between notifications the same thread drains the result rings into the
+    metrics registry (stage timings, person hit rate, fps and CPU per camera).
+    """
+
+    def __init__(self, camera_ids, frame_shape: tuple = (FRAME_HEIGHT, FRAME_WIDTH, 3), **detector_options):
+        self.camera_ids = list(dict.fromkeys(camera_ids))
+        self.frame_shape = tuple(frame_shape)
+        self.detector_options = detector_options
+        self.frame_rings: dict = {}
+        self.result_rings: dict = {}
+        self.processes: dict = {}
+        self.notify_pipes: dict = {}
+        self.motion = asyncio.Event()  # установлено, пока хотя бы на одной камере есть движение
+        self.cameras_in_motion = set()
+        self._transitions = None
+        self._watcher = None
+        self._stop = None
+        self.person_checks = 0
+        self.person_hits = 0
+
+    def start(self) -> bool:
+        """Starts the workers; True if at least one camera is running."""
+        # spawn: форк процесса с потоками SDK и OpenCV небезопасен
+        ctx = multiprocessing.get_context("spawn")
+        self._stop = ctx.Event()
+        readiness = {}
+        for camera_id in self.camera_ids:
+            self.frame_rings[camera_id] = SharedRing(self.frame_shape, np.uint8, FRAME_SLOTS)
+            self.result_rings[camera_id] = SharedRing((), RESULT_DTYPE, RESULT_SLOTS)
+            readiness[camera_id] = ctx.Event()
+            reader, writer = ctx.Pipe(duplex=False)
+            process = ctx.Process(
+                target=_camera_worker, daemon=True, name=f"camera-{camera_id}",
+                args=(camera_id, self.frame_shape, self.frame_rings[camera_id].name,
+                      self.result_rings[camera_id].name, readiness[camera_id], self._stop, writer,
+                      self.detector_options))
+            process.start()
+            writer.close()  # копия осталась у процесса; когда он завершится, чтение вернёт EOF
+            self.processes[camera_id] = process
+            self.notify_pipes[reader] = camera_id
+
+        deadline = time.monotonic() + START_TIMEOUT
+        running = []
+        for camera_id, ready in readiness.items():
+            if ready.wait(max(deadline - time.monotonic(), 0)):
+                running.append(camera_id)
+            else:
+                print(f"[❌] Camera {camera_id} did not start")
+        print(f"[✓] Cameras running: {running}")
+        return bool(running)
+
+    async def transitions(self):
+        """Starts and ends of motion from all cameras as they happen; one consumer at a time."""
+        if self._watcher is None:
+            self._transitions = asyncio.Queue()
+            self._watcher = Thread(target=self._watch, args=(asyncio.get_running_loop(),), daemon=True,
+                                   name="camera-watcher")
+            self._watcher.start()
+        while True:
+            yield await self._transitions.get()
+
+    def _watch(self, loop):
+        """Watcher thread: blocks on the notification pipes, never touches asyncio objects directly."""
+        pipes = dict(self.notify_pipes)
+        record = np.zeros((), RESULT_DTYPE)
+        last_seen = {camera_id: ring.head for camera_id, ring in self.result_rings.items()}
+        while pipes and not self._stop.is_set():
+            ready = wait(list(pipes), WATCH_TIMEOUT)
+            self._drain_results(last_seen, record)
+            for reader in ready:
+                try:
+                    started, captured_at, frame_seq, area = reader.recv()
+                except (EOFError, OSError):
+                    del pipes[reader]  # рабочий процесс камеры завершился
+                    continue
+                transition = MotionTransition(pipes[reader], started, captured_at, frame_seq, area)
+                try:
+                    loop.call_soon_threadsafe(self._deliver, transition)
+                except RuntimeError:
+                    return  # event loop уже закрыт
+
+    def _deliver(self, transition: MotionTransition):
+        # Выполняется в event loop
+        if transition.started:
+            self.cameras_in_motion.add(transition.camera_id)
+            self.motion.set()
+        else:
+            self.cameras_in_motion.discard(transition.camera_id)
+            if not self.cameras_in_motion:
+                self.motion.clear()
+        registry.record("camera.transition_delivery", time.monotonic() - transition.captured_at)
+        self._transitions.put_nowait(transition)
+
+    def _drain_results(self, last_seen: dict, record: np.ndarray):
+        # Записи, перезаписанные в кольце до прихода потока, пропускаются: метрикам хватает выборки
+        for camera_id, ring in self.result_rings.items():
+            head = ring.head
+            for seq in range(max(last_seen[camera_id] + 1, head - ring.slots + 1), head + 1):
+                if ring.read(seq, record):
+                    self._record_metrics(MotionEvent(camera_id, seq, record))
+            last_seen[camera_id] = head
+
+    def _record_metrics(self, event: MotionEvent):
+        # Метрики пишет рабочий процесс, а экспортирует основной — поэтому переносим их здесь
+        registry.record("camera.stage.motion", event.motion_ms / 1000)
+        if event.person is not None:
+            registry.record("camera.stage.person", event.person_ms / 1000)
+            self.person_checks += 1
+            self.person_hits += event.person
+            registry.set_gauge("camera.person_check.hit_rate", round(self.person_hits / self.person_checks, 3))
+        registry.set_gauge(f"camera.{event.camera_id}.fps", round(event.fps, 2))
+        registry.set_gauge(f"camera.{event.camera_id}.cpu_ms_per_frame", round(event.cpu_ms, 3))
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+        for camera_id, process in self.processes.items():
+            process.join(STOP_TIMEOUT)
+            if process.is_alive():
+                print(f"[⚠️]  Camera {camera_id} worker did not stop, terminating")
+                process.terminate()
+        if self._watcher is not None:
+            self._watcher.join(WATCH_TIMEOUT * 2)
+            self._watcher = None
+        for reader in self.notify_pipes:
+            reader.close()
+        for ring in list(self.frame_rings.values()) + list(self.result_rings.values()):
+            ring.close()
+        self.processes.clear()
+        self.frame_rings.clear()
+        self.result_rings.clear()
+        self.notify_pipes.clear()
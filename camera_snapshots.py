@@ -0,0 +1,79 @@
+import asyncio
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from person_check import PersonCheck
+
+# === Constants ===
+SNAPSHOT_TIMEOUT = 5  # сек на один снимок
+FULL_FRAME_CHECK_HEIGHT = 480  # снимок проверяется целиком, поэтому уменьшаем меньше, чем область движения
+
+
+class SnapshotFetcher:
+    """Fetches JPEG snapshots from several cameras at once and decodes them to NumPy.
+
+    Each camera gets its own worker thread, which downloads and decodes. cv2.imdecode releases
+    the GIL, so the decodes really run in parallel. The downloaded bytes are wrapped with
+    np.frombuffer rather than copied. A batch therefore costs about one round trip to the
+    slowest camera instead of the sum of all of them.
+    """
+
+    def __init__(self, urls, timeout: float = SNAPSHOT_TIMEOUT):
+        self.urls = list(urls)
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(max_workers=max(len(self.urls), 1), thread_name_prefix="snapshot")
+        self.last_batch_seconds = 0.0
+
+    def _fetch(self, url: str) -> np.ndarray:
+        with urllib.request.urlopen(url, timeout=self.timeout) as response:
+            data = response.read()
+        frame = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            raise ValueError(f"not an image ({len(data)} bytes)")
+        return frame
+
+    async def fetch(self, url: str) -> np.ndarray:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, self._fetch, url)
+
+    async def fetch_all(self) -> list:
+        """One frame per camera, in the order of urls; None where a camera failed."""
+        started = time.perf_counter()
+        results = await asyncio.gather(*(self.fetch(url) for url in self.urls), return_exceptions=True)
+        self.last_batch_seconds = time.perf_counter() - started
+        frames = []
+        for url, result in zip(self.urls, results):
+            if isinstance(result, Exception):
+                print(f"[X] Camera {url}: {result}")
+                result = None
+            frames.append(result)
+        return frames
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
+
+class HumanDetector:
+    """Looks for a person in whole snapshots with the same OpenCV detectors as the motion pipeline."""
+
+    def __init__(self, method: str = "face"):
+        # Снимок проверяется целиком: это не рамка движения, и её верх — не голова
+        self.check = PersonCheck(method, check_height=FULL_FRAME_CHECK_HEIGHT, margin=0, head_crop=False)
+
+    def find_humans(self, frames) -> list[bool]:
+        found = []
+        for frame in frames:
+            if frame is None:
+                found.append(False)
+                continue
+            height, width = frame.shape[:2]
+            found.append(self.check.confirm(frame, np.array([[0, 0, width, height]], np.int32)))
+        return found
+
+    async def check_human_in_images(self, frames) -> bool:
+        """True if a person is in any of the frames; the detection runs off the event loop."""
+        found = await asyncio.get_running_loop().run_in_executor(None, self.find_humans, frames)
+        return any(found)
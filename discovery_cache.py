@@ -0,0 +1,116 @@
+import asyncio
+import json
+import os
+import time
+
+import mini.mini_sdk as MiniSdk
+from mini.dns.dns_browser import WiFiDevice
+
+# === Constants ===
+CACHE_PATH = os.environ.get("ALPHAMINI_DEVICE_CACHE", os.path.expanduser("~/.alphamini_devices.json"))
+DIRECT_CONNECT_TIMEOUT = 2  # сек — попытка прямого подключения по сохранённому адресу
+
+
+# === Counters ===
+class DiscoveryStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.connect_times = []
+
+    def record(self, hit: bool, seconds: float):
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        self.connect_times.append(seconds)
+
+    def summary(self) -> str:
+        last = f"{self.connect_times[-1]:.2f}s" if self.connect_times else "-"
+        return f"cache hits={self.hits} misses={self.misses} last time-to-connect={last}"
+
+
+stats = DiscoveryStats()
+
+
+# === Disk cache (last-known WiFiDevice per serial suffix) ===
+def load_cache(path: str = CACHE_PATH) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_device(serial_suffix: str, device: WiFiDevice, path: str = CACHE_PATH):
+    cache = load_cache(path)
+    cache[serial_suffix] = {
+        "name": device.name,
+        "address": device.address,
+        "port": device.port,
+        "type": device.type,
+        "server": device.server,
+        "saved_at": time.time(),
+    }
+    tmp_path = path + ".tmp"
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=2)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"[X] Could not save device cache: {e}")
+
+
+def cached_device(serial_suffix: str, path: str = CACHE_PATH) -> WiFiDevice | None:
+    entry = load_cache(path).get(serial_suffix)
+    if not entry:
+        return None
+    device = WiFiDevice(address=entry["address"], port=entry["port"],
+                        s_type=entry.get("type", ""), server=entry.get("server", ""))
+    # WiFiDevice обрезает суффикс типа из имени, а имя уже сохранено без него
+    device.name = entry["name"]
+    return device
+
+
+# === Discovery + connect ===
+async def _try_connect(device: WiFiDevice, timeout: float) -> bool:
+    try:
+        return await asyncio.wait_for(MiniSdk.connect(device), timeout)
+    except Exception as e:
+        # Как в connect_device: устаревший адрес может дать любую ошибку websockets/SDK, а не только таймаут
+        print(f"[X] Direct connect to {device.address} failed: {e}")
+        return False
+
+
+async def connect_robot(serial_suffix: str, search_timeout: int) -> WiFiDevice | None:
+    """Connects to the robot, trying the cached address before a full network browse.
+
+    Returns the connected WiFiDevice, or None if the robot was not found or refused the connection.
+    """
+    started = time.perf_counter()
+
+    device = cached_device(serial_suffix)
+    if device is not None:
+        if await _try_connect(device, DIRECT_CONNECT_TIMEOUT):
+            stats.record(True, time.perf_counter() - started)
+            print(f"[✓] Connected to cached device {device.name} ({device.address}) | {stats.summary()}")
+            return device
+        print("[→] Cached address is stale, browsing the network...")
+
+    try:
+        device = await MiniSdk.get_device_by_name(serial_suffix, search_timeout)
+    except Exception as e:
+        print(f"[X] Error searching for device: {e}")
+        return None
+    if not device:
+        print("[X] No robot found.")
+        return None
+
+    if not await _try_connect(device, search_timeout):
+        print("[X] Connection failed")
+        return None
+
+    save_device(serial_suffix, device)
+    stats.record(False, time.perf_counter() - started)
+    print(f"[✓] Found and connected to {device.name} ({device.address}) | {stats.summary()}")
+    return device
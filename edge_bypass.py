@@ -0,0 +1,151 @@
+import math
+import time
+
+from mini.apis.api_action import MoveRobotDirection
+
+from ir_stream import IRDistanceStream, NO_READING_MM
+from ir_sweep import RangeSweep
+from motion_plan import MotionPlan, TURN_90_UNITS
+from obstacle_watchdog import ObstacleWatchdog
+from pose_tracker import PoseTracker
+from sdk_metrics import registry
+
+# === Constants ===
+SIDESTEP_STEPS = 2  # шагов вбок между проверками: ножка стула уже за одну
+MAX_SIDESTEPS = 3  # проверок на сторону; шире — это уже стена, её обходят по карте
+CLEAR_DISTANCE_MM = 400  # впереди свободно, если ИК видит дальше этого
+CLEAR_LOOK_ATTEMPTS = 2  # замеров на проверку «впереди свободно», если датчик не ответил
+
+
+def rectangle_plan(bypass_steps: int) -> MotionPlan:
+    """The fixed bypass: out to the side, past the obstacle and back onto the line."""
+    return (MotionPlan("bypass_obstacle")
+            .turn_left_90().forward(bypass_steps)
+            .turn_right_90().forward(bypass_steps * 2)
+            .turn_right_90().forward(bypass_steps)
+            .turn_left_90())
+
+
+class EdgeBypassReport:
+    def __init__(self, rectangle: MotionPlan):
+        self.rectangle_steps = sum(steps for direction, steps in rectangle.primitives
+                                   if direction in (MoveRobotDirection.FORWARD, MoveRobotDirection.BACKWARD))
+        self.rectangle_seconds = rectangle.planned_duration()
+        self.sidesteps = 0
+        self.side = "left"
+        self.steps = 0.0
+        self.turn_units = 0.0
+        self.seconds = 0.0
+        self.ok = False
+
+    @property
+    def steps_saved(self) -> float:
+        return self.rectangle_steps - self.steps
+
+    @property
+    def seconds_saved(self) -> float:
+        return self.rectangle_seconds - self.seconds
+
+    def __str__(self):
+        text = (f"[EDGE] {self.sidesteps} sidesteps to the {self.side}: {self.steps:.0f} steps, "
+                f"{self.turn_units:.0f} turn units, {self.seconds:.1f}s")
+        if not self.ok:
+            return text + " -> GAVE UP"
+        return (text + f" -> OK; saved {self.steps_saved:.0f} steps / {self.seconds_saved:.1f}s "
+                       f"against the rectangle")
+
+
+# === Edge following ===
+class EdgeBypass:
+    """Sidesteps along the obstacle in small increments until the way ahead is clear.
+
+    After each increment the robot turns back to its original heading and takes a fresh IR
+    reading; the bypass ends there, facing the way it was going, as soon as the reading is
+    clear. A person who steps aside or a single chair leg costs one or two increments instead
+    of the whole rectangle. The first side is the left one, or the more open one if a
+    RangeSweep is given. If that side is blocked the robot tries the other one; if neither
+    clears within MAX_SIDESTEPS increments it gives up and the caller picks another bypass.
+    """
+
+    def __init__(self, pose: PoseTracker, stream: IRDistanceStream, watchdog: ObstacleWatchdog,
+                 bypass_steps: int, clear_mm: float = CLEAR_DISTANCE_MM, on_reading=None,
+                 sweep: RangeSweep | None = None):
+        self.pose = pose
+        self.stream = stream
+        self.watchdog = watchdog
+        self.rectangle = rectangle_plan(bypass_steps)
+        self.clear_mm = clear_mm
+        self.on_reading = on_reading  # например, GridDetour.record: замеры попадают на карту
+        self.sweep = sweep  # если задан, сторону обхода выбирает профиль дальностей, а не «всегда влево»
+        self.total_steps_saved = 0.0
+
+    async def look(self) -> float:
+        # Только замер, запрошенный после поворота: пришедший следующим мог быть запрошен на его середине,
+        # и тогда боковое расстояние после возврата на курс выдало бы себя за «впереди свободно»
+        distance = await self.stream.distance_after(time.monotonic())
+        if self.on_reading is not None:
+            self.on_reading(distance)
+        return distance
+
+    async def _clear_ahead(self) -> bool:
+        """True only for a real reading beyond clear_mm; a sensor timeout is asked again, then counts as blocked."""
+        for _ in range(CLEAR_LOOK_ATTEMPTS):
+            distance = await self.look()
+            if distance < NO_READING_MM:
+                return distance > self.clear_mm
+        return False
+
+    @staticmethod
+    def _turn(plan: MotionPlan, units: int) -> MotionPlan:
+        return plan.turn_left(units) if units > 0 else plan.turn_right(-units)
+
+    async def _sidestep(self, sign: int, extra_steps: int = 0) -> bool:
+        """One increment to the side (sign 1: left); False if the side itself is blocked."""
+        await self._turn(MotionPlan("edge_turn_out"), sign * TURN_90_UNITS).run()
+        blocked = await self.look() <= self.watchdog.threshold_mm
+        if not blocked:
+            sidestep = MotionPlan("edge_sidestep").forward(extra_steps + SIDESTEP_STEPS)
+            blocked = await self.watchdog.guard(sidestep.run()) is None
+        await self._turn(MotionPlan("edge_turn_back"), -sign * TURN_90_UNITS).run()
+        return not blocked
+
+    def _offset_steps(self, x: float, y: float, heading: float) -> int:
+        """Whole steps the robot has drifted to the left of the line it was walking along."""
+        lateral = -(self.pose.x - x) * math.sin(heading) + (self.pose.y - y) * math.cos(heading)
+        return round(lateral / self.pose.step_length_mm)
+
+    async def run(self) -> EdgeBypassReport:
+        report = EdgeBypassReport(self.rectangle)
+        started = time.perf_counter()
+        steps_before, turns_before = self.pose.steps_walked, self.pose.turn_units
+        line = (self.pose.x, self.pose.y, self.pose.heading)
+
+        # Посетитель мог уже отойти: тогда обход не нужен вовсе
+        report.ok = await self._clear_ahead()
+        sides = [(1, "left"), (-1, "right")]
+        if not report.ok and self.sweep is not None and await self.sweep.best_side() < 0:
+            sides.reverse()
+        for sign, side in () if report.ok else sides:
+            report.side = side
+            # С первой стороны не вышло: первый шаг в другую заодно возвращает на исходную линию
+            extra = max(-sign * self._offset_steps(*line), 0)
+            for _ in range(MAX_SIDESTEPS):
+                if not await self._sidestep(sign, extra):
+                    break
+                extra = 0
+                report.sidesteps += 1
+                if await self._clear_ahead():
+                    report.ok = True
+                    break
+            if report.ok:
+                break
+
+        report.steps = self.pose.steps_walked - steps_before
+        report.turn_units = self.pose.turn_units - turns_before
+        report.seconds = time.perf_counter() - started
+        if report.ok:
+            self.total_steps_saved += report.steps_saved
+            registry.set_gauge("bypass.steps_saved", round(self.total_steps_saved))
+        registry.record("bypass.edge_seconds", report.seconds, report.ok)
+        print(report)
+        return report
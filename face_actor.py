@@ -0,0 +1,141 @@
+import asyncio
+import time
+from collections import deque
+
+from sdk_metrics import registry
+
+# === States ===
+IDLE = "idle"
+GREETING = "greeting"
+WAITING_FOR_LEAVE = "waiting-for-leave"
+COOLDOWN = "cooldown"
+
+# === Constants ===
+ENTER_EVENTS = 2  # подряд идущих событий с лицом, чтобы считать посетителя пришедшим
+LEAVE_EVENTS = 3  # подряд идущих событий без лица, чтобы считать его ушедшим
+COOLDOWN_SECONDS = 5
+INBOX_SIZE = 8
+
+
+class FaceInteraction:
+    """Single-flight actor for face detection events.
+
+    The SDK callback only drops (timestamp, face count) into a bounded inbox; one task consumes it
+    and walks idle → greeting → waiting-for-leave → cooldown → idle. Presence flips only after
+    ENTER_EVENTS consecutive faces and absence after LEAVE_EVENTS consecutive empty frames, so a
+    flickering detection cannot restart the greeting. When the inbox is full the oldest event is
+    dropped: only the recent face count matters.
+    """
+
+    def __init__(self, greet, enter_events: int = ENTER_EVENTS, leave_events: int = LEAVE_EVENTS,
+                 cooldown: float = COOLDOWN_SECONDS, inbox_size: int = INBOX_SIZE):
+        self.greet = greet
+        self.enter_events = enter_events
+        self.leave_events = leave_events
+        self.cooldown = cooldown
+        self.state = IDLE
+        self.present = False
+        self.greetings = 0
+        self.dropped = 0
+        self._inbox: deque[tuple[float, int]] = deque(maxlen=inbox_size)
+        self._face_streak = 0
+        self._empty_streak = 0
+        self._cooldown_until = 0.0
+        self._greeting: asyncio.Task | None = None
+        self._wakeup: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._task: asyncio.Task | None = None
+
+    @property
+    def paused(self) -> bool:
+        """True while the robot should stand still for the visitor."""
+        return self.state in (GREETING, WAITING_FOR_LEAVE)
+
+    def handle(self, msg):
+        """SDK observer callback; safe to call from any thread."""
+        if self._loop is None or msg is None or not msg.isSuccess:
+            return
+        if len(self._inbox) == self._inbox.maxlen:
+            self.dropped += 1
+        self._inbox.append((time.monotonic(), msg.count))
+        self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    def _set_state(self, state: str):
+        if state != self.state:
+            print(f"[FACE] {self.state} -> {state}")
+            self.state = state
+
+    def _update_presence(self, count: int):
+        if count > 0:
+            self._face_streak += 1
+            self._empty_streak = 0
+            if self._face_streak >= self.enter_events:
+                self.present = True
+        else:
+            self._empty_streak += 1
+            self._face_streak = 0
+            if self._empty_streak >= self.leave_events:
+                self.present = False
+
+    async def _run_greeting(self, received_at: float):
+        registry.record("face.event_to_action", time.monotonic() - received_at)
+        self.greetings += 1
+        try:
+            await self.greet()
+        except Exception as e:
+            print(f"[FACE] Greeting failed: {e}")
+
+    def _step(self, received_at: float):
+        now = time.monotonic()
+        if self.state == COOLDOWN and now >= self._cooldown_until:
+            self._set_state(IDLE)
+
+        if self.state == IDLE and self.present:
+            self._set_state(GREETING)
+            self._greeting = asyncio.create_task(self._run_greeting(received_at))
+            self._greeting.add_done_callback(lambda _: self._wakeup.set())
+        elif self.state == GREETING and self._greeting.done():
+            self._greeting = None
+            self._set_state(WAITING_FOR_LEAVE)
+
+        if self.state == WAITING_FOR_LEAVE and not self.present:
+            self._cooldown_until = now + self.cooldown
+            self._set_state(COOLDOWN)
+            print("[RESUME] Face disappeared. Robot resumed movement.")
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self._next_timeout())
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            while self._inbox:
+                received_at, count = self._inbox.popleft()
+                self._update_presence(count)
+                self._step(received_at)
+            self._step(time.monotonic())
+
+    def _next_timeout(self) -> float | None:
+        # Проснуться по окончании охлаждения, даже если новых событий нет
+        if self.state == COOLDOWN:
+            return max(self._cooldown_until - time.monotonic(), 0.0)
+        return None
+
+    def start(self):
+        if self._task is None:
+            self._loop = asyncio.get_running_loop()
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        if self._greeting:
+            self._greeting.cancel()
+            self._greeting = None
+        self._loop = None
+        self._inbox.clear()
+        self._set_state(IDLE)
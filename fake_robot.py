@@ -0,0 +1,384 @@
+import argparse
+import asyncio
+import logging
+import math
+import random
+import socket
+import sys
+import time
+import urllib.request
+import wave
+from io import BytesIO
+
+import websockets
+
+import mini.mini_sdk as MiniSdk
+from mini.apis.cmdid import _PCProgramCmdId
+from mini.channels import msg_utils
+from mini.dns import dns_browser
+from mini.dns.dns_browser import WiFiDevice
+from mini.dns.zeroconf import ServiceInfo, Zeroconf
+from mini.pb2.codemao_controltts_pb2 import ControlTTSRequest, ControlTTSResponse
+from mini.pb2.codemao_facedetecttask_pb2 import FaceDetectTaskRequest, FaceDetectTaskResponse
+from mini.pb2.codemao_getinfrareddistance_pb2 import GetInfraredDistanceResponse
+from mini.pb2.codemao_moverobot_pb2 import MoveRobotRequest, MoveRobotResponse
+from mini.pb2.codemao_observeinfrareddistance_pb2 import ObserveInfraredDistanceRequest, \
+    ObserveInfraredDistanceResponse
+from mini.pb2.codemao_playaction_pb2 import PlayActionRequest, PlayActionResponse
+from mini.pb2.codemao_playaudio_pb2 import PlayAudioRequest, PlayAudioResponse
+from mini.pb2.codemao_stopaction_pb2 import StopActionResponse
+from mini.pb2.pccodemao_getappversion_pb2 import GetAppVersionResponse
+
+import discovery_cache
+
+# === Constants ===
+ROBOT_ID = "412"
+ROBOT_NAME = f"Mini_Fake{ROBOT_ID}"
+SDK_PORT = 8800  # SDK всегда подключается к ws://<address>:8800
+ERROR_CODE = 500  # resultCode для искусственных отказов
+ROBOT_BODY_MM = 60  # от центра робота до ИК-датчика на груди: отсюда меряется расстояние
+
+
+# === Configuration ===
+class FakeRobotConfig:
+    """Latency, failure and motion model of the stand-in robot."""
+
+    def __init__(self, latency_ms: float = 40.0, latency_sigma: float = 0.5, failure_rate: float = 0.0,
+                 drop_rate: float = 0.0, step_seconds: float = 0.8, turn_seconds: float = 1.0,
+                 action_seconds: float = 3.0, tts_chars_per_second: float = 15.0,
+                 start_distance_mm: float = 1200.0, mm_per_step: float = 60.0, turn_unit_deg: float = 30.0,
+                 obstacles: list[tuple[float, float, float]] | None = None, ir_range_mm: float = 800.0,
+                 face_interval: float = 30.0, face_duration: float = 6.0, seed: int | None = None):
+        self.latency_ms = latency_ms  # медиана сетевой задержки
+        self.latency_sigma = latency_sigma  # разброс (σ логнормального распределения)
+        self.failure_rate = failure_rate  # доля ответов с isSuccess=False
+        self.drop_rate = drop_rate  # доля запросов без ответа (таймаут у клиента)
+        self.step_seconds = step_seconds
+        self.turn_seconds = turn_seconds
+        self.action_seconds = action_seconds
+        self.tts_chars_per_second = tts_chars_per_second
+        self.start_distance_mm = start_distance_mm
+        self.mm_per_step = mm_per_step
+        self.turn_unit_deg = turn_unit_deg
+        self.obstacles = obstacles  # круги (x, y, r) в мм; без них мир одномерный
+        self.ir_range_mm = ir_range_mm  # дальше препятствий ИК не видит
+        self.face_interval = face_interval  # посетитель появляется раз в N секунд
+        self.face_duration = face_duration  # и стоит перед роботом столько секунд
+        self.seed = seed
+
+
+# === Simulated robot state ===
+class FakeWorld:
+    """What the sensors see: a single distance ahead, or a floor with round obstacles if configured.
+
+    On the floor the robot starts at the origin facing +x, like PoseTracker, and walks through
+    nothing: a walk stops short of the first obstacle in the way.
+    """
+
+    def __init__(self, config: FakeRobotConfig):
+        self.config = config
+        self.random = random.Random(config.seed)
+        self.distance_mm = config.start_distance_mm
+        self.x = self.y = self.heading = 0.0
+        self.started_at = time.monotonic()
+
+    def walked(self, steps: int):
+        if self.config.obstacles is None:
+            self.distance_mm = max(self.distance_mm - steps * self.config.mm_per_step, 30.0)
+            return
+        distance = steps * self.config.mm_per_step
+        if distance > 0:
+            distance = min(distance, self._ray(self.heading))
+        self.x += distance * math.cos(self.heading)
+        self.y += distance * math.sin(self.heading)
+
+    def turned(self, units: int):
+        if self.config.obstacles is None:
+            # После поворота перед роботом оказывается новое препятствие на случайном расстоянии
+            self.distance_mm = self.random.uniform(300.0, 2 * self.config.start_distance_mm)
+            return
+        heading = self.heading + math.radians(units * self.config.turn_unit_deg)
+        self.heading = (heading + math.pi) % (2 * math.pi) - math.pi
+
+    def _ray(self, heading: float) -> float:
+        """Distance from the robot's front along `heading` to the nearest obstacle edge, or infinity."""
+        dx, dy = math.cos(heading), math.sin(heading)
+        nearest = math.inf
+        for ox, oy, radius in self.config.obstacles:
+            along = (ox - self.x) * dx + (oy - self.y) * dy
+            across_sq = (ox - self.x) ** 2 + (oy - self.y) ** 2 - along ** 2
+            if along > 0 and across_sq < radius ** 2:
+                nearest = min(nearest, along - math.sqrt(radius ** 2 - across_sq))
+        return max(nearest - ROBOT_BODY_MM, 0.0)
+
+    def ir_distance(self) -> int:
+        if self.config.obstacles is not None:
+            distance = min(self._ray(self.heading), self.config.ir_range_mm)
+            if distance < self.config.ir_range_mm:
+                distance += self.random.gauss(0, 5)
+            return int(max(distance, 0.0))
+        return int(self.distance_mm + self.random.gauss(0, 5))
+
+    def face_count(self) -> int:
+        if self.config.face_interval <= 0:
+            return 0
+        elapsed = (time.monotonic() - self.started_at) % self.config.face_interval
+        return 1 if elapsed >= self.config.face_interval - self.config.face_duration else 0
+
+
+# === Protocol server ===
+class FakeRobot:
+    """Speaks the AlphaMini websocket protocol so unmodified scripts can connect to it."""
+
+    def __init__(self, config: FakeRobotConfig, host: str = "0.0.0.0", port: int = SDK_PORT):
+        self.config = config
+        self.host = host
+        self.port = port
+        self.world = FakeWorld(config)
+        self.random = self.world.random
+        self.request_count = 0
+        self._motion: asyncio.Task | None = None
+        self._subscriptions: dict[int, asyncio.Task] = {}
+        self._handlers = {
+            _PCProgramCmdId.GET_ROBOT_VERSION_REQUEST.value: self._enter_program,
+            _PCProgramCmdId.MOVE_ROBOT_REQUEST.value: self._move_robot,
+            _PCProgramCmdId.STOP_ACTION_REQUEST.value: self._stop_action,
+            _PCProgramCmdId.GET_INFRARED_DISTANCE_REQUEST.value: self._get_infrared_distance,
+            _PCProgramCmdId.PLAY_TTS_REQUEST.value: self._play_tts,
+            _PCProgramCmdId.PLAY_ACTION_REQUEST.value: self._play_action,
+            _PCProgramCmdId.PLAY_AUDIO_REQUEST.value: self._play_audio,
+        }
+        self._observers = {
+            _PCProgramCmdId.SUBSCRIBE_INFRARED_DISTANCE_REQUEST.value: self._observe_infrared_distance,
+            _PCProgramCmdId.FACE_DETECT_TASK_REQUEST.value: self._observe_face_detect,
+        }
+
+    def _latency(self) -> float:
+        return self.config.latency_ms / 1000 * self.random.lognormvariate(0, self.config.latency_sigma)
+
+    def _fails(self) -> bool:
+        return self.random.random() < self.config.failure_rate
+
+    async def _send(self, websocket, cmd: int, msg_id: str, response, target: int = 0):
+        message = msg_utils.build_response_msg(cmd, msg_id, response)
+        message.header.target = target
+        await websocket.send(msg_utils.base64_encode(message.SerializeToString()))
+
+    # --- request handlers: return the response body ---
+    async def _enter_program(self, body: bytes):
+        return GetAppVersionResponse(version="fake", isSuccess=True)
+
+    async def _run_motion(self, seconds: float, steps: int = 1, on_step=None) -> bool:
+        self._motion = asyncio.current_task()
+        try:
+            for _ in range(steps):
+                await asyncio.sleep(seconds)
+                if on_step is not None:
+                    on_step()
+            return True
+        except asyncio.CancelledError:
+            return False
+        finally:
+            self._motion = None
+
+    async def _move_robot(self, body: bytes):
+        request = MoveRobotRequest()
+        request.ParseFromString(body)
+        if self._fails():
+            return MoveRobotResponse(isSuccess=False, code=ERROR_CODE)
+
+        forward = request.direction in (3, 4)  # FORWARD / BACKWARD
+        per_step = self.config.step_seconds if forward else self.config.turn_seconds
+        sign = 1 if request.direction in (3, 1) else -1  # FORWARD / LEFTWARD
+        # Мир меняется после каждого шага: ИК видит приближение, а StopAllAction обрывает движение между шагами
+        on_step = (lambda: self.world.walked(sign)) if forward else (lambda: self.world.turned(sign))
+        completed = await asyncio.create_task(self._run_motion(per_step, request.step, on_step))
+        return MoveRobotResponse(isSuccess=completed)
+
+    async def _stop_action(self, body: bytes):
+        if self._motion is not None:
+            self._motion.cancel()
+        return StopActionResponse(isSuccess=True)
+
+    async def _get_infrared_distance(self, body: bytes):
+        return GetInfraredDistanceResponse(distance=self.world.ir_distance())
+
+    async def _play_tts(self, body: bytes):
+        request = ControlTTSRequest()
+        request.ParseFromString(body)
+        if self._fails():
+            return ControlTTSResponse(isSuccess=False, resultCode=ERROR_CODE)
+        await asyncio.sleep(len(request.text) / self.config.tts_chars_per_second)
+        return ControlTTSResponse(isSuccess=True)
+
+    async def _play_action(self, body: bytes):
+        request = PlayActionRequest()
+        request.ParseFromString(body)
+        if self._fails():
+            return PlayActionResponse(isSuccess=False, resultCode=ERROR_CODE)
+        completed = await asyncio.create_task(self._run_motion(self.config.action_seconds))
+        return PlayActionResponse(isSuccess=completed)
+
+    async def _play_audio(self, body: bytes):
+        request = PlayAudioRequest()
+        request.ParseFromString(body)
+        # Как настоящий робот, скачиваем файл по URL и «играем» его столько, сколько он длится
+        try:
+            data = await asyncio.get_running_loop().run_in_executor(None, _download, request.cloud.url[0])
+            with wave.open(BytesIO(data)) as wav:
+                seconds = wav.getnframes() / wav.getframerate()
+        except (OSError, wave.Error):
+            return PlayAudioResponse(isSuccess=False, resultCode=ERROR_CODE)
+        await asyncio.sleep(seconds)
+        return PlayAudioResponse(isSuccess=True)
+
+    # --- observers: push events until unsubscribed ---
+    async def _observe_infrared_distance(self, websocket, cmd: int, body: bytes):
+        request = ObserveInfraredDistanceRequest()
+        request.ParseFromString(body)
+        if not request.isSubscribe:
+            return False
+        period = max(request.samplingPeriod, 50) / 1000
+        while True:
+            await asyncio.sleep(period)
+            await self._send(websocket, cmd, "0", ObserveInfraredDistanceResponse(distance=self.world.ir_distance()))
+
+    async def _observe_face_detect(self, websocket, cmd: int, body: bytes):
+        request = FaceDetectTaskRequest()
+        request.ParseFromString(body)
+        if not request.switch:
+            return False
+        period = max(request.period, 100) / 1000
+        while True:
+            await asyncio.sleep(period)
+            response = FaceDetectTaskResponse(count=self.world.face_count(), isSuccess=True)
+            await self._send(websocket, cmd, "0", response)
+
+    async def _handle_message(self, websocket, data: str):
+        message = msg_utils.parse_msg(msg_utils.base64_decode(data))
+        cmd, msg_id = message.header.command, message.header.id
+        self.request_count += 1
+
+        if cmd in self._observers:
+            previous = self._subscriptions.pop(cmd, None)
+            if previous:
+                previous.cancel()
+            self._subscriptions[cmd] = asyncio.create_task(
+                self._observers[cmd](websocket, cmd, message.bodyData))
+            return
+
+        handler = self._handlers.get(cmd)
+        if handler is None:
+            # Пустой ответ с target=-1: SDK считает команду неподдерживаемой
+            await self._send(websocket, cmd, msg_id, GetAppVersionResponse(), target=-1)
+            return
+
+        await asyncio.sleep(self._latency())
+        response = await handler(message.bodyData)
+        if self.random.random() < self.config.drop_rate:
+            return
+        await asyncio.sleep(self._latency())
+        await self._send(websocket, cmd, msg_id, response)
+
+    async def _serve_client(self, websocket, path=None):
+        print(f"[✓] Client connected: {websocket.remote_address}")
+        tasks = set()
+        try:
+            async for data in websocket:
+                task = asyncio.create_task(self._handle_message(websocket, data))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            for task in list(tasks) + list(self._subscriptions.values()):
+                task.cancel()
+            self._subscriptions.clear()
+            print(f"[→] Client disconnected ({self.request_count} requests so far)")
+
+    async def serve_forever(self):
+        async with websockets.serve(self._serve_client, self.host, self.port):
+            print(f"[✓] Fake AlphaMini listening on ws://{self.host}:{self.port}")
+            await asyncio.Future()
+
+
+def _download(url: str) -> bytes:
+    with urllib.request.urlopen(url, timeout=5) as response:
+        return response.read()
+
+
+# === Discovery ===
+class _RobotZeroconf(Zeroconf):
+    def check_service(self, info: ServiceInfo, allow_name_change: bool, cooperating_responders: bool = False):
+        # Тип сервиса робота содержит "_" ("_Edu_mini_channel_server"), и встроенный zeroconf
+        # отказывается его регистрировать. Имя уникально для стенда, проверку пропускаем.
+        pass
+
+
+def advertise(address: str, name: str = ROBOT_NAME) -> Zeroconf:
+    """Registers the fake robot over mDNS under the EDU service type, like the real one."""
+    MiniSdk.set_robot_type(MiniSdk.RobotType.EDU)
+    service_type = dns_browser.service_type
+    info = ServiceInfo(service_type, f"{name}.{service_type}", addresses=[socket.inet_aton(address)],
+                       port=SDK_PORT, server=f"{name}.local.")
+    zc = _RobotZeroconf()
+    zc.register_service(info)
+    print(f"[✓] Advertised {name} at {address} via mDNS")
+    return zc
+
+
+def parse_obstacles(text: str) -> list[tuple[float, float, float]]:
+    try:
+        obstacles = [tuple(float(v) for v in item.split(",")) for item in text.split(";") if item.strip()]
+    except ValueError:
+        obstacles = None
+    if obstacles is None or any(len(obstacle) != 3 for obstacle in obstacles):
+        raise argparse.ArgumentTypeError(f"expected 'x,y,r;x,y,r', got {text!r}")
+    return obstacles
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Local stand-in for the AlphaMini robot")
+    parser.add_argument("--address", default="127.0.0.1", help="address advertised to the scripts")
+    parser.add_argument("--latency-ms", type=float, default=40.0)
+    parser.add_argument("--latency-sigma", type=float, default=0.5)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--step-seconds", type=float, default=0.8)
+    parser.add_argument("--turn-seconds", type=float, default=1.0)
+    parser.add_argument("--face-interval", type=float, default=30.0)
+    parser.add_argument("--obstacles", type=parse_obstacles, default=None,
+                        help="round obstacles on the floor as 'x,y,r;x,y,r' in mm, robot starts at 0,0 facing +x")
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--no-mdns", action="store_true", help="only seed the discovery cache")
+    return parser.parse_args(argv)
+
+
+async def main(argv=None):
+    args = parse_args(argv)
+    config = FakeRobotConfig(latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+                             failure_rate=args.failure_rate, drop_rate=args.drop_rate,
+                             step_seconds=args.step_seconds, turn_seconds=args.turn_seconds,
+                             obstacles=args.obstacles, face_interval=args.face_interval, seed=args.seed)
+
+    # Кэш обнаружения позволяет скриптам подключиться без mDNS (например, в CI)
+    device = WiFiDevice(address=args.address, port=SDK_PORT)
+    device.name = ROBOT_NAME
+    discovery_cache.save_device(ROBOT_ID, device)
+
+    zc = None if args.no_mdns else advertise(args.address)
+    try:
+        await FakeRobot(config).serve_forever()
+    finally:
+        if zc:
+            zc.unregister_all_services()
+            zc.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\nFake robot stopped.")
+        sys.exit(0)
@@ -0,0 +1,107 @@
+import time
+from threading import Thread, Condition
+
+import numpy as np
+
+READ_RETRY_DELAY = 0.1  # сек — пауза, если камера не отдала кадр
+
+
+class LatestFrameGrabber:
+    """Reads a capture source in its own thread and keeps only the newest frame.
+
+    Three preallocated buffers rotate between the grabber and one reader: one being filled by
+    the camera, one holding the latest complete frame and one lent to the reader. When analysis
+    is slower than the camera, unread frames are overwritten (and counted in `dropped`) instead
+    of queueing up, so the reader always gets the freshest frame and nothing is allocated per
+    frame.
+
+    With decode_on_demand the camera queue is drained with cap.grab() and a frame is decoded with
+    cap.retrieve(image=...) only while a reader is waiting, so a slow reader also saves the
+    decoding CPU.
+    """
+
+    def __init__(self, cap, shape: tuple, dtype=np.uint8, decode_on_demand: bool = True):
+        self.cap = cap
+        self.decode_on_demand = decode_on_demand
+        self.buffers = [np.empty(shape, dtype) for _ in range(3)]
+        self.grabbed = 0  # кадров получено от камеры
+        self.frame_count = 0  # кадров декодировано
+        self.dropped = 0
+        self.running = False
+        self.last_decode_cpu = 0.0  # сек CPU на декодирование последнего прочитанного кадра
+        self._writing = 0
+        self._latest = None  # индекс последнего готового кадра
+        self._reading = None  # индекс кадра, отданного читателю
+        self._latest_time = 0.0
+        self._latest_cpu = 0.0
+        self._waiting = 0
+        self._cond = Condition()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self.running = True
+            self._thread = Thread(target=self._grab_loop, daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self.running = False
+        with self._cond:
+            self._cond.notify_all()
+        if self._thread:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+    def _grab_loop(self):
+        while self.running:
+            buffer = self.buffers[self._writing]
+            if self.decode_on_demand:
+                if not self.cap.grab():
+                    time.sleep(READ_RETRY_DELAY)
+                    continue
+                self.grabbed += 1
+                if not self._waiting:
+                    continue  # кадр никому не нужен — не тратим CPU на декодирование
+                cpu_started = time.thread_time()
+                ret, frame = self.cap.retrieve(buffer)
+            else:
+                cpu_started = time.thread_time()
+                ret, frame = self.cap.read(buffer)
+                self.grabbed += ret
+            decode_cpu = time.thread_time() - cpu_started
+            if not ret:
+                time.sleep(READ_RETRY_DELAY)
+                continue
+            if frame.ctypes.data != buffer.ctypes.data:
+                # Камера сменила разрешение и OpenCV выделил новый массив — берём его
+                self.buffers[self._writing] = frame
+            with self._cond:
+                if self._latest is not None:
+                    self.dropped += 1  # предыдущий кадр так и не прочитали, пишем поверх него
+                    free = self._latest
+                else:
+                    free = next(i for i in range(3) if i != self._writing and i != self._reading)
+                self._latest, self._writing = self._writing, free
+                self._latest_time = time.monotonic()
+                self._latest_cpu = decode_cpu
+                self.frame_count += 1
+                self._cond.notify_all()
+
+    def read(self, timeout: float = 1.0) -> tuple[np.ndarray, float] | None:
+        """Waits for a frame newer than the previous read; returns (frame, capture time).
+
+        The returned array stays valid until the next read() call.
+        """
+        with self._cond:
+            if self._latest is None:
+                self._waiting += 1
+                try:
+                    self._cond.wait_for(lambda: self._latest is not None or not self.running, timeout)
+                finally:
+                    self._waiting -= 1
+            if self._latest is None:
+                return None
+            self.last_decode_cpu = self._latest_cpu
+            # Прошлый буфер читателя освобождается и достанется граберу на следующем кадре
+            self._reading, self._latest = self._latest, None
+            return self.buffers[self._reading], self._latest_time
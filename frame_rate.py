@@ -0,0 +1,67 @@
+import time
+
+from sdk_metrics import registry
+
+# === Constants ===
+IDLE_FPS = 4  # кадров/с, пока в кадре ничего не происходит
+ACTIVE_FPS = 30  # кадров/с при движении (частота камеры)
+MIN_FPS = 1  # ниже не опускаемся даже при превышении бюджета
+CPU_BUDGET = 0.2  # доля одного ядра на захват и анализ
+ACTIVE_HOLD = 2.0  # сек полной частоты после последнего движения
+SMOOTHING = 0.1  # коэффициент экспоненциального сглаживания статистики
+
+
+class AdaptiveFrameRate:
+    """Duty-cycles the analysis loop: idle rate in an empty hall, full rate while something moves.
+
+    Motion switches to ACTIVE_FPS immediately and the rate drops back to IDLE_FPS after ACTIVE_HOLD
+    seconds without motion. Either rate is capped so that the smoothed CPU time per frame stays
+    within cpu_budget of one core.
+    """
+
+    def __init__(self, idle_fps: float = IDLE_FPS, active_fps: float = ACTIVE_FPS,
+                 cpu_budget: float = CPU_BUDGET, active_hold: float = ACTIVE_HOLD, name: str = "camera"):
+        self.idle_fps = idle_fps
+        self.active_fps = active_fps
+        self.cpu_budget = cpu_budget
+        self.active_hold = active_hold
+        self.name = name
+        self.fps = 0.0  # фактическая частота кадров (сглаженная)
+        self.cpu_per_frame = 0.0  # сек CPU на кадр (сглаженные)
+        self.target_fps = idle_fps
+        self._last_motion = float("-inf")
+        self._last_start = None
+
+    @property
+    def active(self) -> bool:
+        return time.monotonic() - self._last_motion < self.active_hold
+
+    def frame_done(self, cpu_seconds: float, motion: bool):
+        """Records one processed frame: CPU spent on it and whether it showed motion."""
+        if motion:
+            self._last_motion = time.monotonic()
+        self.cpu_per_frame += SMOOTHING * (cpu_seconds - self.cpu_per_frame)
+
+        target = self.active_fps if self.active else self.idle_fps
+        if self.cpu_per_frame > 0:
+            target = min(target, self.cpu_budget / self.cpu_per_frame)
+        self.target_fps = max(target, MIN_FPS)
+
+        registry.set_gauge(f"{self.name}.fps", round(self.fps, 2))
+        registry.set_gauge(f"{self.name}.target_fps", round(self.target_fps, 2))
+        registry.set_gauge(f"{self.name}.cpu_ms_per_frame", round(self.cpu_per_frame * 1000, 3))
+
+    def delay(self) -> float:
+        """Seconds left until the next frame is due."""
+        if self._last_start is None:
+            return 0.0
+        return max(self._last_start + 1 / self.target_fps - time.monotonic(), 0.0)
+
+    def sleep(self):
+        """Waits until the next frame is due and marks the start of that frame."""
+        time.sleep(self.delay())
+        now = time.monotonic()
+        if self._last_start is not None:
+            # Интервал считается между началами кадров, так ожидание камеры входит в период
+            self.fps += SMOOTHING * (1 / (now - self._last_start) - self.fps)
+        self._last_start = now
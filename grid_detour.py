@@ -0,0 +1,191 @@
+import math
+import time
+
+from ir_stream import IRDistanceStream, NO_READING_MM
+from motion_plan import MotionPlan
+from obstacle_watchdog import ObstacleWatchdog
+from occupancy_grid import DStarLite, OccupancyGrid
+from pose_tracker import PoseTracker
+from sdk_metrics import registry
+
+# === Constants ===
+REJOIN_AHEAD_MM = 900  # точка возврата на маршрут — столько за роботом по ходу маршрута
+MAX_LEG_STEPS = 5  # длиннее отрезки не ходим: ИК смотрит только вперёд, карта уточняется по дороге
+MIN_LEG_MM = 150  # ближе путевую точку не выбираем
+MAX_DETOUR_LEGS = 25  # не дошли за столько отрезков — пусть вызывающий обходит по-старому
+
+
+class DetourReport:
+    def __init__(self, start: tuple[float, float], goal: tuple[float, float] | None):
+        self.start = start
+        self.goal = goal
+        self.legs = 0
+        self.looks = 0
+        self.replans = 0
+        self.expanded = 0
+        self.steps = 0.0
+        self.turn_units = 0.0
+        self.preempted = 0
+        self.seconds = 0.0
+        self.ok = False
+
+    def __str__(self):
+        status = "OK" if self.ok else "FAILED"
+        return (f"[DETOUR] {self.legs} legs, {self.steps:.0f} steps, {self.turn_units:.0f} turn units, "
+                f"{self.looks} looks, {self.replans} replans ({self.expanded} cells expanded), "
+                f"{self.preempted} stops, {self.seconds:.1f}s -> {status}")
+
+
+# === Detour ===
+class GridDetour:
+    """Walks around an obstacle along the shortest path on the occupancy grid and back onto the route.
+
+    The goal is a free cell on the patrol route REJOIN_AHEAD_MM past the robot. Before each leg
+    the robot faces the next waypoint and takes a fresh IR reading; whatever it sees goes into
+    the grid and the D* Lite search is repaired, not rebuilt, so a blocked leg costs one look
+    and a few re-expanded cells. The grid outlives the detour, so an obstacle met on one lap
+    is already on the map on the next.
+    """
+
+    def __init__(self, grid: OccupancyGrid, pose: PoseTracker, stream: IRDistanceStream,
+                 watchdog: ObstacleWatchdog, threshold_mm: float):
+        self.grid = grid
+        self.pose = pose
+        self.stream = stream
+        self.watchdog = watchdog
+        self.threshold_mm = threshold_mm
+        self.planner: DStarLite | None = None
+        self._last_changed: list[tuple[int, int]] = []
+
+    def record(self, distance_mm: float) -> list[tuple[int, int]]:
+        """Puts a reading taken at the current pose on the map and repairs the active search."""
+        if distance_mm >= NO_READING_MM:
+            # Датчик не ответил: карта остаётся как была
+            self._last_changed = []
+            return []
+        changed = self.grid.observe(self.pose.x, self.pose.y, self.pose.heading, distance_mm)
+        if changed and self.planner is not None:
+            self.planner.cells_changed(changed)
+        self._last_changed = changed
+        return changed
+
+    async def look(self) -> float:
+        # Только замер, запрошенный после остановки: пришедший следующим мог быть запрошен на ходу или на повороте
+        distance = await self.stream.distance_after(time.monotonic())
+        self.record(distance)
+        return distance
+
+    def rejoin_goal(self, route_from: tuple[float, float], route_to: tuple[float, float]) -> tuple[int, int] | None:
+        """First free cell on the route at least REJOIN_AHEAD_MM ahead of the robot, up to the route end."""
+        length = math.dist(route_from, route_to)
+        if length == 0:
+            return None
+        ux, uy = (route_to[0] - route_from[0]) / length, (route_to[1] - route_from[1]) / length
+        along = (self.pose.x - route_from[0]) * ux + (self.pose.y - route_from[1]) * uy
+        along = min(along + REJOIN_AHEAD_MM, length)
+        while True:
+            cell = self.grid.cell(route_from[0] + along * ux, route_from[1] + along * uy)
+            if cell is not None and not self.grid.blocked[cell]:
+                return cell
+            if cell is None or along >= length:
+                return None
+            along = min(along + self.grid.cell_mm, length)
+
+    def _waypoint(self, path: list[tuple[int, int]]) -> tuple[int, int]:
+        # Самая дальняя клетка пути в пределах одного отрезка, до которой видна прямая.
+        # Слишком близкие клетки не берём: на них курс считается по нескольким сантиметрам и скачет
+        reach = max(int(MAX_LEG_STEPS * self.pose.step_length_mm // self.grid.cell_mm), 1)
+        for index in range(min(reach, len(path) - 1), 0, -1):
+            if index < len(path) - 1 and self.pose.relative(*self.grid.center(path[index]))[0] < MIN_LEG_MM:
+                break
+            rows, cols = self.grid.line_cells(path[0], path[index])
+            if self.grid.occupied[rows, cols].any():
+                continue
+            # Срезать можно, только если прямая идёт у препятствия не дольше, чем сам путь
+            prefix = tuple(zip(*path[1:index + 1]))
+            if self.grid.blocked[rows, cols].sum() <= self.grid.blocked[prefix].sum() * 2:
+                return path[index]
+        return path[min(2, len(path) - 1)]
+
+    async def _face(self, x: float, y: float):
+        units = self.pose.turn_units_to(x, y)
+        if units > 0:
+            await MotionPlan("detour_turn").turn_left(units).run()
+        elif units < 0:
+            await MotionPlan("detour_turn").turn_right(-units).run()
+
+    async def run(self, route_from: tuple[float, float] | None = None,
+                  route_to: tuple[float, float] | None = None) -> DetourReport:
+        """Detours to the route from route_from to route_to, by default the line ahead of the robot."""
+        if route_from is None or route_to is None:
+            ahead = 2 * REJOIN_AHEAD_MM
+            route_from = (self.pose.x, self.pose.y)
+            route_to = (self.pose.x + ahead * math.cos(self.pose.heading),
+                        self.pose.y + ahead * math.sin(self.pose.heading))
+
+        started = time.perf_counter()
+        steps_before, turns_before = self.pose.steps_walked, self.pose.turn_units
+        await self.look()
+        goal = self.rejoin_goal(route_from, route_to)
+        start = self.grid.cell(self.pose.x, self.pose.y)
+        report = DetourReport((self.pose.x, self.pose.y), goal and self.grid.center(goal))
+        if goal is None or start is None:
+            return self._finish(report, started, steps_before, turns_before)
+
+        self.planner = DStarLite(self.grid, start, goal)
+        try:
+            goal_x, goal_y = self.grid.center(goal)
+            while report.legs < MAX_DETOUR_LEGS:
+                if self.pose.relative(goal_x, goal_y)[0] <= self.grid.cell_mm:
+                    report.ok = True
+                    break
+                cell = self.grid.cell(self.pose.x, self.pose.y)
+                if cell is None:
+                    break
+                self.planner.move_start(cell)
+                expanded = self.planner.expanded
+                self.planner.compute()
+                if self.planner.expanded > expanded:
+                    report.replans += 1
+                    report.expanded += self.planner.expanded - expanded
+                path = self.planner.path()
+                if len(path) < 2:
+                    break
+
+                x, y = self.grid.center(self._waypoint(path))
+                await self._face(x, y)
+                distance = await self.look()
+                report.looks += 1
+                report.legs += 1
+                if distance >= NO_READING_MM:
+                    continue  # что впереди, неизвестно: на следующем отрезке смотрим ещё раз
+                if distance <= self.threshold_mm:
+                    if not self._last_changed:
+                        # Карта ничего нового не узнала: повороты кратны 30°, и луч упёрся в известное
+                        # препятствие рядом с путём. Туда робот всё равно не пройдёт — закрываем клетку
+                        self.planner.cells_changed(self.grid.mark_occupied(path[1]))
+                    continue  # препятствие уже на карте, следующий путь его обойдёт
+
+                room = int((distance - self.threshold_mm) // self.pose.step_length_mm)
+                steps = max(min(self.pose.steps_to(x, y), MAX_LEG_STEPS, room), 1)
+                if await self.watchdog.guard(MotionPlan("detour_leg").forward(steps).run()) is None:
+                    report.preempted += 1
+                    await self.look()
+
+            if report.ok:
+                # Снова вдоль маршрута: цель может совпасть с его концом, и целиться в неё уже бессмысленно
+                heading = math.atan2(route_to[1] - route_from[1], route_to[0] - route_from[0])
+                await self._face(self.pose.x + REJOIN_AHEAD_MM * math.cos(heading),
+                                 self.pose.y + REJOIN_AHEAD_MM * math.sin(heading))
+        finally:
+            self.planner = None
+        return self._finish(report, started, steps_before, turns_before)
+
+    def _finish(self, report: DetourReport, started: float, steps_before: float, turns_before: float) -> DetourReport:
+        report.steps = self.pose.steps_walked - steps_before
+        report.turn_units = self.pose.turn_units - turns_before
+        report.seconds = time.perf_counter() - started
+        registry.record("detour.seconds", report.seconds)
+        registry.set_gauge("grid.blocked_cells", int(self.grid.blocked.sum()))
+        print(report)
+        return report
@@ -0,0 +1,197 @@
+import asyncio
+import time
+from array import array
+
+from mini.apis.api_observe import ObserveInfraredDistance
+from mini.apis.api_sence import GetInfraredDistance
+from mini.apis.base_api import BaseEventApi, MiniApiResultType
+from mini.apis.cmdid import _PCProgramCmdId
+from mini.pb2.codemao_observeinfrareddistance_pb2 import ObserveInfraredDistanceRequest
+
+# === Constants ===
+SAMPLE_PERIOD = 0.1  # сек — период опроса фонового сэмплера
+OBSERVE_PERIOD_MS = 200  # период push-подписки робота
+RING_CAPACITY = 64
+MAX_SAMPLE_AGE = 0.5  # сек — более старый замер считается устаревшим
+SAMPLE_TIMEOUT = 2  # сек — у SDK по умолчанию 300 с на ответ
+NO_READING_MM = 1000.0  # то же значение, что get_distance() возвращал при ошибке
+
+
+# === Ring buffer ===
+class DistanceRing:
+    """Fixed-size ring of (timestamp, mm) samples backed by two flat arrays.
+
+    One writer (the sampler or the observer callback) and any number of readers. The writer
+    fills the slot first and publishes it by bumping `count`, so readers never see a torn sample
+    and no lock is needed.
+    """
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.capacity = capacity
+        self.timestamps = array("d", [0.0] * capacity)
+        self.distances = array("d", [0.0] * capacity)
+        self.count = 0
+
+    def push(self, timestamp: float, distance_mm: float):
+        slot = self.count % self.capacity
+        self.timestamps[slot] = timestamp
+        self.distances[slot] = distance_mm
+        self.count += 1
+
+    def latest(self) -> tuple[float, float] | None:
+        if self.count == 0:
+            return None
+        slot = (self.count - 1) % self.capacity
+        return self.timestamps[slot], self.distances[slot]
+
+    def recent(self, n: int) -> list[tuple[float, float]]:
+        """Up to n newest samples, oldest first."""
+        n = min(n, self.count, self.capacity)
+        first = self.count - n
+        return [(self.timestamps[i % self.capacity], self.distances[i % self.capacity])
+                for i in range(first, self.count)]
+
+
+class _ObserveInfraredDistance(ObserveInfraredDistance):
+    """ObserveInfraredDistance with a configurable sampling period (the SDK hard-codes 1 s)."""
+
+    def __init__(self, period_ms: int):
+        request = ObserveInfraredDistanceRequest()
+        request.samplingPeriod = period_ms
+        request.isSubscribe = True
+        BaseEventApi.__init__(self, cmd_id=_PCProgramCmdId.SUBSCRIBE_INFRARED_DISTANCE_REQUEST.value,
+                              message=request)
+
+
+# === Distance stream ===
+class IRDistanceStream:
+    """Keeps the ring filled with fresh IR readings in the background.
+
+    use_observer=True subscribes to the robot's push updates; otherwise a background task polls
+    GetInfraredDistance every SAMPLE_PERIOD seconds.
+    """
+
+    def __init__(self, use_observer: bool = False, period: float = SAMPLE_PERIOD,
+                 capacity: int = RING_CAPACITY):
+        self.use_observer = use_observer
+        self.period = period
+        self.ring = DistanceRing(capacity)
+        self.errors = 0
+        self.requested_at = 0.0  # когда был запрошен последний замер в кольце (только у сэмплера)
+        self._wake = asyncio.Event()
+        self._sampled = asyncio.Event()  # срабатывает на каждый новый замер и сразу заменяется новым
+        self._observer = None
+        self._task = None
+
+    def _publish(self, distance_mm: float):
+        self.ring.push(time.monotonic(), distance_mm)
+        # Будим всех, кто ждёт замер; следующие ожидающие подпишутся уже на новое событие
+        sampled, self._sampled = self._sampled, asyncio.Event()
+        sampled.set()
+
+    async def _next_sample(self, deadline: float) -> bool:
+        """Waits for the next reading to land in the ring; False if none came before `deadline`."""
+        try:
+            await asyncio.wait_for(self._sampled.wait(), max(deadline - time.monotonic(), 0))
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    def _on_observed(self, msg):
+        if msg is not None and hasattr(msg, "distance"):
+            self._publish(float(msg.distance))
+
+    async def _sample_loop(self):
+        sensor = GetInfraredDistance()
+        while True:
+            requested_at = time.monotonic()
+            try:
+                result_type, response = await asyncio.wait_for(sensor.execute(), SAMPLE_TIMEOUT)
+                if result_type == MiniApiResultType.Success and hasattr(response, "distance"):
+                    self.requested_at = requested_at
+                    self._publish(float(response.distance))
+                else:
+                    self.errors += 1
+            except asyncio.TimeoutError:
+                self.errors += 1
+            # Пауза до следующего запроса; distance_after() может прервать её, чтобы не ждать период
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.period)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self):
+        if self.use_observer:
+            if self._observer is None:
+                self._observer = _ObserveInfraredDistance(int(self.period * 1000))
+                self._observer.set_handler(self._on_observed)
+                self._observer.start()
+                print("[OBSERVE] IR distance observer started.")
+        elif self._task is None:
+            self._task = asyncio.create_task(self._sample_loop())
+            print("[OBSERVE] IR distance sampler started.")
+
+    def stop(self):
+        if self._observer:
+            self._observer.stop()
+            self._observer = None
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        print("[OBSERVE] IR distance stream stopped.")
+
+    def latest(self) -> tuple[float, float] | None:
+        """Freshest reading as (mm, age in seconds), or None before the first sample."""
+        sample = self.ring.latest()
+        if sample is None:
+            return None
+        timestamp, distance_mm = sample
+        return distance_mm, time.monotonic() - timestamp
+
+    async def _wait_next_sample(self) -> float:
+        # Сэмплер уже ждёт ответа на GetInfraredDistance. SDK сопоставляет ответы по cmd id,
+        # и второй такой же запрос снял бы обработчик первого, поэтому ждём следующий замер.
+        if not await self._next_sample(time.monotonic() + SAMPLE_TIMEOUT):
+            return NO_READING_MM
+        return self.ring.latest()[1]
+
+    async def distance_after(self, moment: float) -> float:
+        """First reading measured after `moment` (time.monotonic()), e.g. after a turn has finished.
+
+        The sampler keeps polling while the robot moves, so this only waits for the request that
+        follows `moment`, and wakes the sampler so that request goes out immediately.
+        """
+        if self._task is None and self._observer is None:
+            return await self.get_distance(max_age=0)
+        deadline = time.monotonic() + SAMPLE_TIMEOUT
+        self._wake.set()
+        while True:
+            if self._task is not None:
+                fresh = self.ring.count and self.requested_at >= moment
+            else:
+                # У push-подписки момент замера неизвестен: берём замер, пришедший через период
+                sample = self.ring.latest()
+                fresh = sample is not None and sample[0] >= moment + self.period
+            if fresh:
+                return self.ring.latest()[1]
+            if not await self._next_sample(deadline):
+                return NO_READING_MM
+
+    async def get_distance(self, max_age: float = MAX_SAMPLE_AGE) -> float:
+        """Freshest reading in mm; does one blocking request only if the stream is stale."""
+        sample = self.latest()
+        if sample is not None and sample[1] <= max_age:
+            return sample[0]
+
+        if self._task is not None:
+            return await self._wait_next_sample()
+
+        try:
+            result_type, response = await asyncio.wait_for(GetInfraredDistance().execute(), SAMPLE_TIMEOUT)
+        except asyncio.TimeoutError:
+            return NO_READING_MM
+        if result_type == MiniApiResultType.Success and hasattr(response, "distance"):
+            self._publish(float(response.distance))
+            return response.distance
+        return NO_READING_MM
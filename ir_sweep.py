@@ -0,0 +1,143 @@
+import math
+import time
+
+from ir_stream import IRDistanceStream
+from motion_plan import MotionPlan
+from pose_tracker import PoseTracker
+from sdk_metrics import registry
+
+# === Constants ===
+SWEEP_UNITS = 2  # замеры от -60° до +60° через шаг поворота (30°)
+CACHE_CELL_MM = 200  # профили из одной клетки такого размера считаются снятыми «в том же месте»
+CACHE_MAX_AGE = 120  # сек — люди у стенда уходят, старый профиль уже не про них
+
+
+def _wrap_angle(angle: float) -> float:
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+class RangeProfile:
+    """IR ranges around one spot, keyed by absolute heading so that any approach can reuse them."""
+
+    def __init__(self, x: float, y: float, turn_unit: float):
+        self.x = x
+        self.y = y
+        self.turn_unit = turn_unit  # рад
+        self.captured_at = time.monotonic()
+        self.readings: list[tuple[float, float]] = []  # (курс, мм)
+
+    def add(self, heading: float, distance_mm: float):
+        self.readings.append((_wrap_angle(heading), distance_mm))
+
+    def range_at(self, heading: float) -> float | None:
+        """Reading taken within half a turn step of the heading, or None."""
+        best = None
+        for reading_heading, distance in self.readings:
+            if abs(_wrap_angle(reading_heading - heading)) <= self.turn_unit / 2:
+                best = distance if best is None else min(best, distance)
+        return best
+
+    def covers(self, heading: float, units: int) -> bool:
+        return all(self.range_at(heading + offset * self.turn_unit) is not None for offset in range(-units, units + 1))
+
+    def clearance(self, heading: float) -> float:
+        """Free range in a direction, limited by its neighbours: the robot is wider than the IR beam."""
+        ranges = [self.range_at(heading + offset * self.turn_unit) for offset in (-1, 0, 1)]
+        return min((r for r in ranges if r is not None), default=0.0)
+
+    def best_offset(self, heading: float, units: int) -> int:
+        """Turn steps from `heading` (positive: left) towards the most clearance; ties go to the smaller turn."""
+        offsets = sorted(range(-units, units + 1), key=lambda offset: (abs(offset), -offset))
+        return max(offsets, key=lambda offset: self.clearance(heading + offset * self.turn_unit))
+
+    def __str__(self):
+        cells = " ".join(f"{math.degrees(h):+.0f}°:{d:.0f}" for h, d in sorted(self.readings))
+        return f"[SWEEP] ({self.x:.0f}, {self.y:.0f}) mm -> {cells}"
+
+
+class ProfileCache:
+    """Recent range profiles by the pose they were taken at."""
+
+    def __init__(self, cell_mm: float = CACHE_CELL_MM, max_age: float = CACHE_MAX_AGE):
+        self.cell_mm = cell_mm
+        self.max_age = max_age
+        self.profiles: dict[tuple[int, int], RangeProfile] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _key(self, x: float, y: float) -> tuple[int, int]:
+        return round(x / self.cell_mm), round(y / self.cell_mm)
+
+    def get(self, x: float, y: float, heading: float, units: int) -> RangeProfile | None:
+        profile = self.profiles.get(self._key(x, y))
+        if profile is not None and (time.monotonic() - profile.captured_at > self.max_age
+                                    or not profile.covers(heading, units)):
+            profile = None
+        if profile is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return profile
+
+    def put(self, profile: RangeProfile):
+        self.profiles[self._key(profile.x, profile.y)] = profile
+
+
+# === Sweep ===
+class RangeSweep:
+    """Turns through several headings and reads the IR range at each one.
+
+    Readings can't be taken concurrently: the SDK matches replies by command id, so two
+    GetInfraredDistance requests in flight would steal each other's reply. Instead the sweep is
+    pipelined with the background sampler of the IRDistanceStream, which keeps polling during
+    the turns. After each turn step the sweep only waits for the first sample requested after
+    the turn ended, and it wakes the sampler so that request goes out immediately. It also
+    sweeps from one side to the other, so every reading costs exactly one turn step.
+    """
+
+    def __init__(self, pose: PoseTracker, stream: IRDistanceStream, units: int = SWEEP_UNITS,
+                 cache: ProfileCache | None = None, on_reading=None):
+        self.pose = pose
+        self.stream = stream
+        self.units = units
+        self.cache = cache if cache is not None else ProfileCache()
+        self.on_reading = on_reading  # например, GridDetour.record: замеры попадают на карту
+
+    async def _read(self, profile: RangeProfile):
+        distance = await self.stream.distance_after(time.monotonic())
+        profile.add(self.pose.heading, distance)
+        if self.on_reading is not None:
+            self.on_reading(distance)
+
+    async def scan(self) -> RangeProfile:
+        """Profile around the current pose; the robot ends facing the way it started."""
+        turn_unit = math.radians(self.pose.turn_unit_deg)
+        cached = self.cache.get(self.pose.x, self.pose.y, self.pose.heading, self.units)
+        registry.set_gauge("sweep.cache_hits", self.cache.hits)
+        if cached is not None:
+            print(f"{cached} (cached)")
+            return cached
+
+        started = time.perf_counter()
+        profile = RangeProfile(self.pose.x, self.pose.y, turn_unit)
+        await MotionPlan("sweep_start").turn_right(self.units).run()
+        await self._read(profile)
+        for _ in range(2 * self.units):
+            await MotionPlan("sweep_step").turn_left(1).run()
+            await self._read(profile)
+        await MotionPlan("sweep_return").turn_right(self.units).run()
+
+        self.cache.put(profile)
+        registry.record("sweep.seconds", time.perf_counter() - started)
+        print(profile)
+        return profile
+
+    async def best_side(self) -> int:
+        """1 to go round on the left, -1 on the right, whichever the sweep found more open."""
+        profile = await self.scan()
+        offset = profile.best_offset(self.pose.heading, self.units)
+        if offset != 0:
+            return 1 if offset > 0 else -1
+        left = sum(profile.clearance(self.pose.heading + k * profile.turn_unit) for k in range(1, self.units + 1))
+        right = sum(profile.clearance(self.pose.heading - k * profile.turn_unit) for k in range(1, self.units + 1))
+        return 1 if left >= right else -1
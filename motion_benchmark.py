@@ -0,0 +1,311 @@
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+import motion_detector
+from motion_detector import MotionDetector
+from motion_engine import ENGINES, StageTimer
+from recording import FrameRecorder, ReplayCapture
+
+try:
+    import resource
+except ImportError:
+    resource = None  # Windows: пиковую память покажут только замеры tracemalloc по каждому случаю
+
+# === Constants ===
+FRAME_SIZES = [(640, 480), (1280, 720)]
+ANALYSIS_WIDTHS = [160, 320, None]  # None — анализ в полном разрешении
+BENCH_FRAMES = 300
+MEMORY_FRAMES = 30  # кадров под tracemalloc: он замедляет выделения, поэтому отдельный короткий прогон
+SYNTHETIC_FPS = 30
+SYNTHETIC_ONSET = 2.0  # сек до появления «посетителя» в синтетическом ролике
+LATENCY_TIMEOUT = 5.0  # сек ожидания детекции после начала движения
+LATENCY_POLL = 0.005
+LATENCY_RUNS = 4  # задержка зависит от фазы кадров при низкой частоте, поэтому берём медиану
+TOLERANCE = 0.2  # допустимое ухудшение относительно базовой линии
+LATENCY_SLACK = 0.05  # сек — дрожание планировщика, которое не считается регрессией
+BASELINE_PATH = os.path.join("benchmarks", "motion_baseline.json")
+STAGES = ("resize", "convert", "blur", "foreground", "dilate", "blobs")
+
+
+# === Frame sources ===
+def synthetic_frames(size: tuple, count: int, onset_frame: int, seed: int = 0):
+    """Deterministic hall footage: a noisy static scene and a bright 'visitor' walking across from onset_frame.
+
+    The same buffer is yielded every time; consumers must not keep references between frames.
+    """
+    width, height = size
+    rng = np.random.default_rng(seed)
+    scene = cv2.GaussianBlur(rng.integers(0, 256, (height, width, 3), np.uint8), (31, 31), 0)
+    noise = [rng.integers(-4, 5, (height, width, 3), np.int16) for _ in range(8)]
+    frame = np.empty_like(scene)
+    visitor_w, visitor_h = width // 8, height // 3
+    for i in range(count):
+        np.add(scene, noise[i % len(noise)], out=frame, casting="unsafe")
+        if i >= onset_frame:
+            x = (i - onset_frame) * width // (4 * SYNTHETIC_FPS) % (width - visitor_w)
+            y = height // 2 - visitor_h // 2
+            cv2.rectangle(frame, (x, y), (x + visitor_w, y + visitor_h), (235, 235, 235), -1)
+        yield frame
+
+
+def recorded_frames(path: str, count: int | None = None):
+    replay = ReplayCapture(path, speed=None)
+    for frame, _ in replay.frames_with_time(0, count):
+        yield frame
+
+
+def write_synthetic_recording(path: str, size: tuple, seconds: float, onset: float):
+    """Synthetic clip as a recording, so the full threaded detector can replay it in real time."""
+    recorder = FrameRecorder(path)
+    count = int(seconds * SYNTHETIC_FPS)
+    for i, frame in enumerate(synthetic_frames(size, count, int(onset * SYNTHETIC_FPS))):
+        recorder.write(frame, i / SYNTHETIC_FPS)
+    recorder.close()
+
+
+# === Measurements ===
+def _detector(engine: str, analysis_width, frame_shape: tuple) -> MotionDetector:
+    detector = MotionDetector(engine=engine, analysis_width=analysis_width, person_check=None)
+    detector._allocate_buffers(frame_shape)
+    return detector
+
+
+def profile_pipeline(frames, engine: str, analysis_width) -> dict:
+    """Runs MotionDetector._measure_motion on every frame and times it and each of its stages.
+
+    The stage times come from the StageTimer hooks in the detector and in MotionEngine.apply,
+    so the benchmark always measures the code the robot runs.
+    """
+    frame_times = []
+    motion_frames = 0
+    detector = None
+    stage_timer = StageTimer()
+    for frame in frames:
+        if detector is None:
+            detector = _detector(engine, analysis_width, frame.shape)
+            detector.stage_timer = stage_timer
+        started = time.perf_counter()
+        motion = detector._measure_motion(frame)
+        frame_times.append(time.perf_counter() - started)
+        if motion is not None:
+            motion_frames += motion.area > motion_detector.MOTION_THRESHOLD
+
+    if not frame_times:
+        raise ValueError("No frames to benchmark")
+    unknown = set(stage_timer.totals) - set(STAGES)
+    if unknown:
+        raise ValueError(f"Detector reports stages {sorted(unknown)} missing from STAGES")
+    times = np.array(frame_times)
+    return {
+        "frames": len(times),
+        "fps": round(len(times) / times.sum(), 1),
+        "frame_ms": {"mean": round(times.mean() * 1000, 4), "p50": round(np.percentile(times, 50) * 1000, 4),
+                     "p95": round(np.percentile(times, 95) * 1000, 4)},
+        "stages_ms": {stage: round(stage_timer.totals.get(stage, 0.0) / len(times) * 1000, 4) for stage in STAGES},
+        "motion_frames": int(motion_frames),
+    }
+
+
+def peak_memory(frames, engine: str, analysis_width) -> int:
+    """Peak bytes allocated from Python (numpy buffers included) while setting up and running the detector."""
+    frames = [frame.copy() for frame in frames]  # декодирование кадров не должно попасть в замер
+    tracemalloc.start()
+    try:
+        detector = _detector(engine, analysis_width, frames[0].shape)
+        for frame in frames:
+            detector._measure_motion(frame)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def onset_latency(recording: str, onset: float, engine: str, analysis_width) -> float | None:
+    """Seconds from the recorded motion onset to is_motion_detected() of a live, threaded detector.
+
+    Includes the duty-cycled idle rate, grabbing, decoding and the hold logic, i.e. what the robot
+    actually waits. None if nothing is detected within LATENCY_TIMEOUT.
+    """
+    detector = MotionDetector(recording, engine=engine, analysis_width=analysis_width, person_check=None,
+                              replay_speed=1.0)
+    saved_stdout, sys.stdout = sys.stdout, open(os.devnull, "w")  # детектор печатает баннеры в консоль
+    try:
+        if not detector.start():
+            return None
+        replay = detector.cap
+        onset_frame = int(np.searchsorted(replay.index["t"], onset))
+        while replay.due_at(onset_frame) is None:
+            time.sleep(LATENCY_POLL)
+        onset_at = replay.due_at(onset_frame)
+        deadline = onset_at + LATENCY_TIMEOUT
+        while time.monotonic() < deadline:
+            if detector.is_motion_detected():
+                return time.monotonic() - onset_at
+            time.sleep(LATENCY_POLL)
+        return None
+    finally:
+        detector.stop()
+        sys.stdout.close()
+        sys.stdout = saved_stdout
+
+
+# === Suite ===
+def case_name(engine: str, size: tuple, analysis_width) -> str:
+    return f"{engine}/{size[0]}x{size[1]}/analysis-{analysis_width or 'full'}"
+
+
+def run_suite(engines=None, sizes=None, widths=None, frames: int = BENCH_FRAMES, recording: str | None = None,
+              onset: float | None = None, latency: bool = True) -> dict:
+    engines = engines or list(ENGINES)
+    widths = widths or ANALYSIS_WIDTHS
+    if recording:
+        meta = ReplayCapture(recording).meta
+        sizes = [(meta["width"], meta["height"])]
+    else:
+        sizes = sizes or FRAME_SIZES
+        onset = SYNTHETIC_ONSET
+
+    def source(size, count):
+        if recording:
+            return recorded_frames(recording, count)
+        return synthetic_frames(size, count, min(int(onset * SYNTHETIC_FPS), count // 2))
+
+    results = {"meta": environment(recording, frames), "cases": {}}
+    with tempfile.TemporaryDirectory() as tmp:
+        latency_sources = [(recording, onset)] * LATENCY_RUNS
+        if latency and not recording:
+            # Начало движения сдвигается на долю периода простоя: иначе оно совпадает с тактом анализа
+            latency_sources = []
+            for run in range(LATENCY_RUNS):
+                run_onset = onset + run / (motion_detector.IDLE_FPS * LATENCY_RUNS)
+                path = os.path.join(tmp, f"synthetic-{run}")
+                write_synthetic_recording(path, (motion_detector.FRAME_WIDTH, motion_detector.FRAME_HEIGHT),
+                                          run_onset + LATENCY_TIMEOUT, run_onset)
+                latency_sources.append((path, run_onset))
+        for engine in engines:
+            for size in sizes:
+                for width in widths:
+                    if width is not None and width >= size[0]:
+                        continue  # совпадает с анализом в полном разрешении
+                    name = case_name(engine, size, width)
+                    print(f"[⏱] {name}...", flush=True)
+                    case = profile_pipeline(source(size, frames), engine, width)
+                    case["peak_memory_kb"] = round(peak_memory(source(size, MEMORY_FRAMES), engine, width) / 1024, 1)
+                    if latency and onset is not None and size == sizes[0]:
+                        runs = [onset_latency(path, run_onset, engine, width) for path, run_onset in latency_sources]
+                        detected = sorted(seconds * 1000 for seconds in runs if seconds is not None)
+                        if len(detected) < len(runs):
+                            case["onset_latency_ms"] = None  # хотя бы один прогон пропустил посетителя
+                        else:
+                            case["onset_latency_ms"] = round(float(np.median(detected)), 1)
+                            case["onset_latency_max_ms"] = round(detected[-1], 1)
+                    results["cases"][name] = case
+    if resource is not None:
+        results["meta"]["max_rss_kb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return results
+
+
+def environment(recording: str | None, frames: int) -> dict:
+    return {
+        "created": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "source": recording or "synthetic",
+        "frames": frames,
+        "machine": platform.machine(),
+        "processor": platform.processor() or platform.machine(),
+        "cpus": os.cpu_count(),
+        "python": platform.python_version(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "opencv_threads": cv2.getNumThreads(),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE) -> list[str]:
+    """Regressions of results against a baseline: slower, hungrier or later-detecting cases."""
+    regressions = []
+    for name, base in baseline["cases"].items():
+        case = results["cases"].get(name)
+        if case is None:
+            continue
+        if case["fps"] < base["fps"] * (1 - tolerance):
+            regressions.append(f"{name}: {case['fps']} fps < baseline {base['fps']} fps")
+        if case["peak_memory_kb"] > base["peak_memory_kb"] * (1 + tolerance):
+            regressions.append(f"{name}: peak memory {case['peak_memory_kb']} kB > baseline {base['peak_memory_kb']} kB")
+        if base.get("onset_latency_ms") is not None and "onset_latency_ms" in case:
+            if case["onset_latency_ms"] is None:
+                regressions.append(f"{name}: motion no longer detected (baseline {base['onset_latency_ms']} ms)")
+            elif case["onset_latency_ms"] > base["onset_latency_ms"] * (1 + tolerance) + LATENCY_SLACK * 1000:
+                regressions.append(f"{name}: onset latency {case['onset_latency_ms']} ms > "
+                                   f"baseline {base['onset_latency_ms']} ms")
+    return regressions
+
+
+def print_report(results: dict):
+    print(f"\n{'case':<34} {'fps':>8} {'p95 ms':>8} {'memory kB':>10} {'latency ms':>11}  stages ms "
+          f"({', '.join(STAGES)})")
+    for name, case in results["cases"].items():
+        latency = case.get("onset_latency_ms")
+        latency = "-" if latency is None else f"{latency:.0f}"
+        stages = " ".join(f"{case['stages_ms'][stage]:.3f}" for stage in STAGES)
+        print(f"{name:<34} {case['fps']:>8.0f} {case['frame_ms']['p95']:>8.3f} {case['peak_memory_kb']:>10.0f} "
+              f"{latency:>11}  {stages}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the laptop-camera motion detector")
+    parser.add_argument("--recording", help="recording directory (python recording.py record) instead of synthetic frames")
+    parser.add_argument("--onset", type=float, help="seconds into the recording when a visitor appears (for latency)")
+    parser.add_argument("--engines", nargs="+", choices=list(ENGINES))
+    parser.add_argument("--widths", nargs="+", help="analysis widths, 'full' for full resolution")
+    parser.add_argument("--frames", type=int, default=BENCH_FRAMES)
+    parser.add_argument("--no-latency", action="store_true", help="skip the real-time onset latency runs "
+                                                                      f"({LATENCY_RUNS} per engine and width)")
+    parser.add_argument("--save", nargs="?", const=BASELINE_PATH, help=f"write results as a baseline (default {BASELINE_PATH})")
+    parser.add_argument("--compare", nargs="?", const=BASELINE_PATH,
+                        help=f"fail on regressions against a baseline (default {BASELINE_PATH}); with --save "
+                             "to the same file the previous baseline is compared and kept on regressions")
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+    widths = None if args.widths is None else [None if w == "full" else int(w) for w in args.widths]
+    results = run_suite(args.engines, widths=widths, frames=args.frames, recording=args.recording,
+                        onset=args.onset, latency=not args.no_latency)
+    print_report(results)
+
+    # Сначала сравнение, потом сохранение: иначе --save --compare с одним файлом сравнивает прогон сам с собой
+    regressions = []
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n[❌] {len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"   {regression}")
+        else:
+            print(f"\n[✓] No regressions against {args.compare} (tolerance {args.tolerance:.0%})")
+
+    if args.save:
+        if regressions and os.path.abspath(args.save) == os.path.abspath(args.compare):
+            print(f"[⚠️] Baseline {args.save} kept: the new results regress against it")
+        else:
+            os.makedirs(os.path.dirname(args.save) or ".", exist_ok=True)
+            with open(args.save, "w", encoding="utf-8") as f:
+                json.dump(results, f, indent=2)
+            print(f"\n[✓] Baseline saved to {args.save}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
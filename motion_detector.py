@@ -0,0 +1,282 @@
+import time
+from threading import Thread
+
+import cv2
+import numpy as np
+
+from frame_grabber import LatestFrameGrabber
+from frame_rate import AdaptiveFrameRate
+from motion_engine import create_engine
+from person_check import PersonCheck
+from recording import FrameRecorder, RecordingCapture, is_recording, open_capture
+
+# ================== CONFIGURATION ==================
+FRAME_WIDTH = 640
+FRAME_HEIGHT = 480
+MOTION_THRESHOLD = 3000  # Чувствительность детекции (в пикселях кадра 640x480)
+MIN_BLOB_AREA = 500  # Движения меньше этой площади считаются шумом
+MOTION_ENGINE = "average"  # diff — разница кадров, average — скользящее среднее, mog2 — MOG2
+ANALYSIS_WIDTH = 160  # Ширина кадра для анализа (None — полное разрешение)
+IDLE_FPS = 4  # Частота анализа, пока перед стендом никого нет
+ACTIVE_FPS = 30  # Частота анализа при движении
+CPU_BUDGET = 0.2  # Доля одного ядра на захват и анализ
+ROI_MASK_PATH = None  # Маска зоны наблюдения: белое — анализируем
+IGNORE_MASK_PATH = None  # Маска исключений (фон стенда, экран): белое — игнорируем
+PERSON_CHECK = "face"  # Подтверждение человека в области движения: face, hog или None
+PERSON_RECHECK_INTERVAL = 0.5  # Сек между повторными проверками, если человек не найден
+RECORD_PATH = None  # Папка для записи кадров камеры (python recording.py info <папка>)
+REPLAY_SPEED = 1.0  # Скорость воспроизведения записи вместо камеры: 1.0 — как снято, None — максимум
+
+
+# ================== MOTION DETECTOR (LAPTOP CAMERA) ==================
+class MotionDetector:
+    """Детектор движения через камеру ноутбука"""
+
+    def __init__(self, camera_id=0, analysis_width=ANALYSIS_WIDTH, roi_mask=ROI_MASK_PATH,
+                 ignore_mask=IGNORE_MASK_PATH, engine=MOTION_ENGINE, person_check=PERSON_CHECK,
+                 record_to=RECORD_PATH, replay_speed=REPLAY_SPEED):
+        self.camera_id = camera_id  # номер камеры, видеофайл или папка с записью
+        self.record_to = record_to
+        self.replay_speed = replay_speed
+        self.person_check = PersonCheck(person_check) if person_check else None
+        self.last_person_check = 0
+        self.engine_name = engine
+        self.frame_rate = AdaptiveFrameRate(IDLE_FPS, ACTIVE_FPS, CPU_BUDGET)
+        self.engine = None
+        self.last_motion = None
+        self.analysis_width = analysis_width
+        self.roi_mask = roi_mask
+        self.ignore_mask = ignore_mask
+        self.mask = None
+        self.cap = None
+        self.detection_active = False
+        self.motion_detected = False
+        self.last_detection_time = 0
+        self.grabber = None
+        self.frame_count = 0
+        self.on_frame = None  # Вызывается для каждого кадра: (frame, captured_at, motion, motion_detected)
+        self.on_motion = None  # Вызывается при начале и конце движения: (started, motion, captured_at)
+        self.stage_timer = None  # motion_engine.StageTimer — время каждой стадии анализа (motion_benchmark)
+
+    def start(self):
+        """Запуск камеры и детекции"""
+        try:
+            if is_recording(self.camera_id):
+                print(f"[📼] Replaying recording {self.camera_id} (speed: {self.replay_speed or 'max'})...")
+            else:
+                print(f"[📷] Opening laptop camera (ID: {self.camera_id})...")
+            self.cap = open_capture(self.camera_id, self.replay_speed)
+
+            if not self.cap.isOpened():
+                print("[❌] Failed to open laptop camera!")
+                print("[💡] Make sure no other app is using the camera")
+                return False
+
+            # Настройка параметров камеры
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, FRAME_WIDTH)
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, FRAME_HEIGHT)
+            self.cap.set(cv2.CAP_PROP_FPS, 30)
+
+            # Проверка чтения кадра
+            ret, test_frame = self.cap.read()
+            if not ret:
+                print("[❌] Camera opened but cannot read frames!")
+                return False
+
+            print(f"[✓] Camera working! Resolution: {test_frame.shape[1]}x{test_frame.shape[0]}")
+
+            if self.record_to:
+                # Пишется каждый кадр камеры, а не только проанализированные
+                self.cap = RecordingCapture(self.cap, FrameRecorder(self.record_to))
+                print(f"[⏺] Recording camera to {self.record_to}")
+
+            # Захват кадров идёт в своём потоке, анализ берёт только самый свежий кадр
+            self._allocate_buffers(test_frame.shape)
+            self.grabber = LatestFrameGrabber(self.cap, test_frame.shape)
+            self.grabber.start()
+
+            self.detection_active = True
+
+            # Запуск потока детекции
+            detection_thread = Thread(target=self._detection_loop, daemon=True)
+            detection_thread.start()
+
+            print("[✓] Motion detection started!")
+            return True
+
+        except Exception as e:
+            print(f"[❌] Error starting camera: {e}")
+            return False
+
+    def _allocate_buffers(self, frame_shape):
+        """Буферы анализа создаются один раз; OpenCV пишет в них через dst="""
+        frame_height, frame_width = frame_shape[:2]
+        width = min(self.analysis_width or frame_width, frame_width)
+        height = round(frame_height * width / frame_width)
+        self.analysis_size = (width, height)
+
+        # Пороги заданы для полного кадра и масштабируются вместе с ним
+        scale = width / frame_width
+        self.frame_scale = 1 / scale
+        kernel = max(3, round(21 * scale) | 1)
+        self.blur_kernel = (kernel, kernel)
+
+        shape = (height, width)
+        self.small = np.empty((height, width, 3), np.uint8)
+        self.gray = np.empty(shape, np.uint8)
+        self.blurred = np.empty(shape, np.uint8)
+        self.mask = self._build_mask(shape)
+        self.engine = create_engine(self.engine_name, shape, MIN_BLOB_AREA * scale * scale,
+                                    dilate_iterations=max(1, round(2 * scale)))
+
+    def _build_mask(self, shape):
+        """Объединяет ROI и маску исключений в одну маску разрешения анализа"""
+        if self.roi_mask is None and self.ignore_mask is None:
+            return None
+        mask = np.full(shape, 255, np.uint8)
+        if self.roi_mask is not None:
+            cv2.bitwise_and(mask, self._load_mask(self.roi_mask, shape), dst=mask)
+        if self.ignore_mask is not None:
+            cv2.bitwise_and(mask, cv2.bitwise_not(self._load_mask(self.ignore_mask, shape)), dst=mask)
+        print(f"[✓] Motion mask: {cv2.countNonZero(mask) * 100 // mask.size}% of the frame analyzed")
+        return mask
+
+    @staticmethod
+    def _load_mask(mask, shape):
+        """Маска — путь к картинке или массив любого разрешения; ненулевые пиксели активны"""
+        if isinstance(mask, str):
+            loaded = cv2.imread(mask, cv2.IMREAD_GRAYSCALE)
+            if loaded is None:
+                raise ValueError(f"Cannot read mask image: {mask}")
+            mask = loaded
+        elif mask.ndim == 3:
+            mask = cv2.cvtColor(mask, cv2.COLOR_BGR2GRAY)
+        mask = cv2.resize(mask, (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST)
+        return cv2.threshold(mask, 0, 255, cv2.THRESH_BINARY)[1]
+
+    def _measure_motion(self, frame):
+        """Движение в координатах полного кадра или None, пока фоновая модель не готова"""
+        timer = self.stage_timer
+        if timer is not None:
+            timer.start()
+        # Уменьшение и конвертация в grayscale для детекции. INTER_LINEAR: INTER_AREA при сжатии
+        # в 4 раза в разы медленнее, а сглаживание всё равно делает размытие ниже
+        cv2.resize(frame, self.analysis_size, dst=self.small, interpolation=cv2.INTER_LINEAR)
+        if timer is not None:
+            timer.mark("resize")
+        cv2.cvtColor(self.small, cv2.COLOR_BGR2GRAY, dst=self.gray)
+        if timer is not None:
+            timer.mark("convert")
+        cv2.GaussianBlur(self.gray, self.blur_kernel, 0, dst=self.blurred)
+        if timer is not None:
+            timer.mark("blur")
+
+        # Фоновая модель, площадь и рамки пятен движения
+        motion = self.engine.apply(self.blurred, self.mask, timer)
+        return None if motion is None else motion.scaled(self.frame_scale)
+
+    def _detection_loop(self):
+        """Основной цикл детекции движения"""
+        print("\n" + "=" * 70)
+        print("👁️  MOTION DETECTION ACTIVE (USING LAPTOP CAMERA)")
+        print("=" * 70)
+        print("[ℹ️]  Position laptop so camera sees the area in front of robot")
+        print("[ℹ️]  Move your hand or walk in front of camera to test")
+        print("[ℹ️]  Robot will speak when motion is detected")
+        print("[ℹ️]  Press Ctrl+C to stop")
+        print("=" * 70 + "\n")
+
+        while self.detection_active:
+            try:
+                # Пауза между кадрами: низкая частота в пустом зале, полная — при движении
+                self.frame_rate.sleep()
+
+                grabbed = self.grabber.read()
+                if grabbed is None:
+                    continue
+                frame, captured_at = grabbed
+
+                self.frame_count += 1
+
+                cpu_started = time.thread_time()
+                started = time.perf_counter()
+                motion = self._measure_motion(frame)
+                if motion is not None:
+                    motion.motion_seconds = time.perf_counter() - started
+                    # Вторая стадия: движение лишь предлагает области, человека ищем только в них
+                    person_found = self._confirm_person(frame, motion)
+                cpu_time = time.thread_time() - cpu_started + self.grabber.last_decode_cpu
+                self.frame_rate.frame_done(cpu_time, motion is not None and motion.area > 0)
+                if motion is None:
+                    continue
+                self.last_motion = motion
+
+                # Обновление статуса детекции. Пишет только этот поток, а чтение bool атомарно,
+                # поэтому блокировка на каждом кадре не нужна
+                was_detected = self.motion_detected
+                current_time = time.time()
+
+                if person_found:
+                    # Движение обнаружено!
+                    if not was_detected:
+                        print(f"\n🔴 MOTION DETECTED!")
+                        print(f"   {motion} | Frame: #{self.frame_count}")
+
+                    self.motion_detected = True
+                    self.last_detection_time = current_time
+                else:
+                    # Движения нет
+                    if current_time - self.last_detection_time > 1.5:
+                        if was_detected:
+                            print("✅ Motion stopped\n")
+                        self.motion_detected = False
+
+                if self.on_frame:
+                    self.on_frame(frame, captured_at, motion, self.motion_detected)
+                if self.on_motion and self.motion_detected != was_detected:
+                    self.on_motion(self.motion_detected, motion, captured_at)
+
+            except Exception as e:
+                print(f"[❌] Detection error: {e}")
+                time.sleep(0.5)
+
+    def _confirm_person(self, frame, motion):
+        """Движение достаточно крупное и (если включено) в нём найден человек"""
+        if motion.area <= MOTION_THRESHOLD:
+            return False
+        if self.person_check is None or not self.person_check.available or self.motion_detected:
+            # Уже подтверждённого посетителя удерживаем по одному движению
+            return True
+        now = time.monotonic()
+        if now - self.last_person_check < PERSON_RECHECK_INTERVAL:
+            return False
+        self.last_person_check = now
+
+        started = time.perf_counter()
+        motion.person = self.person_check.confirm(frame, motion.boxes)
+        motion.person_seconds = time.perf_counter() - started
+        return motion.person
+
+    def is_motion_detected(self):
+        """Проверка наличия движения"""
+        return self.motion_detected
+
+    def stop(self):
+        """Остановка детекции и освобождение камеры"""
+        print("\n[🔧] Stopping camera...")
+        self.detection_active = False
+        if self.grabber:
+            self.grabber.stop()
+            print(f"[📊] Frames captured: {self.grabber.grabbed}, decoded: {self.grabber.frame_count}, "
+                  f"analyzed: {self.frame_count}, skipped: {self.grabber.dropped}")
+            print(f"[📊] Last rate: {self.frame_rate.fps:.1f} fps, "
+                  f"CPU per frame: {self.frame_rate.cpu_per_frame * 1000:.2f} ms")
+        if self.person_check and self.person_check.checks:
+            check = self.person_check
+            print(f"[📊] Person check ({check.method}): {check.hits}/{check.checks} confirmed, "
+                  f"{check.total_seconds / check.checks * 1000:.1f} ms per check")
+        if self.cap:
+            self.cap.release()
+        if isinstance(self.cap, RecordingCapture):
+            print(f"[📊] Recorded {self.cap.recorder.count} frames to {self.record_to}")
+        print("[✓] Camera released")
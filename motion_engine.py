@@ -0,0 +1,178 @@
+import time
+
+import cv2
+import numpy as np
+
+# === Constants ===
+DIFF_THRESHOLD = 25  # разница яркости, начиная с которой пиксель считается изменившимся
+AVERAGE_ALPHA = 0.05  # скорость обновления фона для скользящего среднего
+MOG2_HISTORY = 300
+MOG2_VAR_THRESHOLD = 25
+
+
+class MotionResult:
+    """Motion found in one frame: total blob area, blob boxes (x, y, w, h) and the largest centroid."""
+
+    def __init__(self, area: float, boxes: np.ndarray, centroid: tuple[float, float] | None):
+        self.area = area
+        self.boxes = boxes
+        self.centroid = centroid
+        self.person = None  # результат второй стадии: None — проверка не запускалась
+        self.motion_seconds = 0.0
+        self.person_seconds = 0.0
+
+    def scaled(self, factor: float) -> "MotionResult":
+        """Same result in the coordinates of a frame `factor` times larger."""
+        centroid = None if self.centroid is None else (self.centroid[0] * factor, self.centroid[1] * factor)
+        return MotionResult(self.area * factor * factor, np.rint(self.boxes * factor).astype(np.int32), centroid)
+
+    def __str__(self):
+        centroid = "-" if self.centroid is None else f"({self.centroid[0]:.0f}, {self.centroid[1]:.0f})"
+        person = "" if self.person is None else f" | Person: {'yes' if self.person else 'no'}"
+        return f"Area: {int(self.area)} | Blobs: {len(self.boxes)} | Largest at {centroid}{person}"
+
+
+class StageTimer:
+    """Accumulates the wall time of each analysis stage; set as MotionDetector.stage_timer to profile it."""
+
+    def __init__(self):
+        self.totals: dict[str, float] = {}
+        self._last = 0.0
+
+    def start(self):
+        self._last = time.perf_counter()
+
+    def mark(self, stage: str):
+        """Charges the time since the previous mark (or start) to `stage`."""
+        now = time.perf_counter()
+        self.totals[stage] = self.totals.get(stage, 0.0) + now - self._last
+        self._last = now
+
+
+# === Engines ===
+class MotionEngine:
+    """Turns a blurred grayscale frame into a foreground mask and measures its blobs.
+
+    Subclasses implement _foreground(); buffers are allocated once for the analysis shape.
+    """
+
+    name = "base"
+
+    def __init__(self, shape: tuple, min_blob_area: float, dilate_iterations: int = 2):
+        self.shape = shape
+        self.min_blob_area = min_blob_area
+        self.dilate_iterations = dilate_iterations
+        self.foreground = np.empty(shape, np.uint8)
+        self.dilated = np.empty(shape, np.uint8)
+        self.labels = np.empty(shape, np.int32)
+        self.ready = False
+
+    def _foreground(self, gray: np.ndarray) -> bool:
+        """Fills self.foreground (0/255); returns False while the model is still warming up."""
+        raise NotImplementedError
+
+    def apply(self, gray: np.ndarray, mask: np.ndarray | None = None,
+              timer: StageTimer | None = None) -> MotionResult | None:
+        # Разница и порог — одна стадия foreground: MOG2 делает их одним вызовом
+        ready = self._foreground(gray)
+        if timer is not None:
+            timer.mark("foreground")
+        if not ready:
+            return None
+        cv2.dilate(self.foreground, None, dst=self.dilated, iterations=self.dilate_iterations)
+        if mask is not None:
+            cv2.bitwise_and(self.dilated, mask, dst=self.dilated)
+        if timer is not None:
+            timer.mark("dilate")
+        motion = self._blobs(self.dilated)
+        if timer is not None:
+            timer.mark("blobs")
+        return motion
+
+    def _blobs(self, binary: np.ndarray) -> MotionResult:
+        if cv2.countNonZero(binary) == 0:
+            return MotionResult(0.0, np.empty((0, 4), np.int32), None)
+
+        count, _, stats, centroids = cv2.connectedComponentsWithStats(binary, labels=self.labels, connectivity=8)
+        # Метка 0 — фон; мелкие пятна отбрасываем векторно, без цикла по контурам
+        areas = stats[1:count, cv2.CC_STAT_AREA]
+        keep = np.flatnonzero(areas > self.min_blob_area)
+        if keep.size == 0:
+            return MotionResult(0.0, np.empty((0, 4), np.int32), None)
+
+        largest = keep[np.argmax(areas[keep])]
+        centroid = (float(centroids[largest + 1, 0]), float(centroids[largest + 1, 1]))
+        return MotionResult(float(areas[keep].sum()), stats[keep + 1, :4], centroid)
+
+
+class FrameDiffEngine(MotionEngine):
+    """Difference with the previous frame (the original detector)."""
+
+    name = "diff"
+
+    def __init__(self, shape: tuple, min_blob_area: float, dilate_iterations: int = 2):
+        super().__init__(shape, min_blob_area, dilate_iterations)
+        self.prev = np.empty(shape, np.uint8)
+        self.delta = np.empty(shape, np.uint8)
+
+    def _foreground(self, gray):
+        if not self.ready:
+            np.copyto(self.prev, gray)
+            self.ready = True
+            return False
+        cv2.absdiff(self.prev, gray, dst=self.delta)
+        cv2.threshold(self.delta, DIFF_THRESHOLD, 255, cv2.THRESH_BINARY, dst=self.foreground)
+        np.copyto(self.prev, gray)
+        return True
+
+
+class RunningAverageEngine(MotionEngine):
+    """Difference with an exponentially averaged background; slow walkers stay visible."""
+
+    name = "average"
+
+    def __init__(self, shape: tuple, min_blob_area: float, dilate_iterations: int = 2,
+                 alpha: float = AVERAGE_ALPHA):
+        super().__init__(shape, min_blob_area, dilate_iterations)
+        self.alpha = alpha
+        self.background = np.empty(shape, np.float32)
+        self.background8 = np.empty(shape, np.uint8)
+        self.delta = np.empty(shape, np.uint8)
+
+    def _foreground(self, gray):
+        if not self.ready:
+            self.background[...] = gray
+            self.ready = True
+            return False
+        cv2.convertScaleAbs(self.background, dst=self.background8)
+        cv2.absdiff(self.background8, gray, dst=self.delta)
+        cv2.threshold(self.delta, DIFF_THRESHOLD, 255, cv2.THRESH_BINARY, dst=self.foreground)
+        cv2.accumulateWeighted(gray, self.background, self.alpha)
+        return True
+
+
+class MOG2Engine(MotionEngine):
+    """OpenCV's Gaussian-mixture background subtractor."""
+
+    name = "mog2"
+
+    def __init__(self, shape: tuple, min_blob_area: float, dilate_iterations: int = 2,
+                 history: int = MOG2_HISTORY, var_threshold: float = MOG2_VAR_THRESHOLD):
+        super().__init__(shape, min_blob_area, dilate_iterations)
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history, var_threshold, detectShadows=False)
+
+    def _foreground(self, gray):
+        self.subtractor.apply(gray, fgmask=self.foreground)
+        if not self.ready:
+            self.ready = True
+            return False
+        return True
+
+
+ENGINES = {engine.name: engine for engine in (FrameDiffEngine, RunningAverageEngine, MOG2Engine)}
+
+
+def create_engine(name: str, shape: tuple, min_blob_area: float, dilate_iterations: int = 2) -> MotionEngine:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown motion engine '{name}', expected one of: {', '.join(ENGINES)}")
+    return ENGINES[name](shape, min_blob_area, dilate_iterations)
@@ -0,0 +1,120 @@
+import asyncio
+import time
+
+from mini.apis.api_action import MoveRobot, MoveRobotDirection, MoveRobotResponse
+from mini.apis.base_api import MiniApiResultType
+
+# === Constants ===
+TURN_90_UNITS = 3  # один шаг поворота ≈ 30°
+
+# Примерная длительность одного шага робота (сек), откалибровать на месте
+STEP_SECONDS = {
+    MoveRobotDirection.FORWARD: 0.8,
+    MoveRobotDirection.BACKWARD: 0.8,
+    MoveRobotDirection.LEFTWARD: 1.0,
+    MoveRobotDirection.RIGHTWARD: 1.0,
+}
+
+# Готовые блоки MoveRobot: execute() каждый раз собирает новый запрос, блок можно переиспользовать
+_block_cache: dict[tuple[MoveRobotDirection, int], MoveRobot] = {}
+
+
+def get_block(direction: MoveRobotDirection, steps: int) -> MoveRobot:
+    key = (direction, steps)
+    block = _block_cache.get(key)
+    if block is None:
+        block = MoveRobot(step=steps, direction=direction)
+        _block_cache[key] = block
+    return block
+
+
+class PlanReport:
+    def __init__(self, name: str, primitives: int, commands: int, planned: float):
+        self.name = name
+        self.primitives = primitives
+        self.commands = commands
+        self.planned = planned
+        self.actual = 0.0
+        self.completed = 0
+        self.ok = True
+
+    @property
+    def overhead(self) -> float:
+        """Wall time not explained by robot motion: protocol round trips and gaps."""
+        return max(self.actual - self.planned, 0.0)
+
+    def __str__(self):
+        status = "OK" if self.ok else f"FAILED after {self.completed}/{self.commands}"
+        return (f"[PLAN] {self.name}: {self.commands} cmds (from {self.primitives} primitives), "
+                f"planned {self.planned:.1f}s, actual {self.actual:.1f}s, "
+                f"overhead {self.overhead:.1f}s -> {status}")
+
+
+# === Motion plan ===
+class MotionPlan:
+    """Sequence of movement primitives executed as the fewest possible MoveRobot commands.
+
+    Adjacent primitives in the same direction are merged, so turn_left_90() followed by
+    turn_left(1) is sent as a single MoveRobot(step=4, LEFTWARD).
+    """
+
+    def __init__(self, name: str = "plan"):
+        self.name = name
+        self.primitives: list[tuple[MoveRobotDirection, int]] = []
+
+    def add(self, direction: MoveRobotDirection, steps: int) -> "MotionPlan":
+        if steps > 0:
+            self.primitives.append((direction, steps))
+        return self
+
+    def forward(self, steps: int) -> "MotionPlan":
+        return self.add(MoveRobotDirection.FORWARD, steps)
+
+    def backward(self, steps: int) -> "MotionPlan":
+        return self.add(MoveRobotDirection.BACKWARD, steps)
+
+    def turn_left(self, units: int = 1) -> "MotionPlan":
+        return self.add(MoveRobotDirection.LEFTWARD, units)
+
+    def turn_right(self, units: int = 1) -> "MotionPlan":
+        return self.add(MoveRobotDirection.RIGHTWARD, units)
+
+    def turn_left_90(self) -> "MotionPlan":
+        return self.turn_left(TURN_90_UNITS)
+
+    def turn_right_90(self) -> "MotionPlan":
+        return self.turn_right(TURN_90_UNITS)
+
+    def compile(self) -> list[tuple[MoveRobotDirection, int]]:
+        commands = []
+        for direction, steps in self.primitives:
+            if commands and commands[-1][0] == direction:
+                commands[-1] = (direction, commands[-1][1] + steps)
+            else:
+                commands.append((direction, steps))
+        return commands
+
+    def planned_duration(self) -> float:
+        return sum(STEP_SECONDS[direction] * steps for direction, steps in self.primitives)
+
+    async def run(self) -> PlanReport:
+        commands = self.compile()
+        report = PlanReport(self.name, len(self.primitives), len(commands), self.planned_duration())
+
+        started = time.perf_counter()
+        try:
+            for direction, steps in commands:
+                result_type, response = await get_block(direction, steps).execute()
+                if not (result_type == MiniApiResultType.Success and isinstance(response, MoveRobotResponse)
+                        and response.isSuccess):
+                    report.ok = False
+                    break
+                report.completed += 1
+        except asyncio.CancelledError:
+            # Прервано (например, ObstacleWatchdog) — оставшиеся команды не отправляем
+            report.ok = False
+            raise
+        finally:
+            report.actual = time.perf_counter() - started
+            print(report)
+        return report
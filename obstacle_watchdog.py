@@ -0,0 +1,117 @@
+import asyncio
+import functools
+import time
+
+from mini.apis.api_action import MoveRobot, StopAllAction
+
+from ir_stream import IRDistanceStream
+
+# === Constants ===
+WATCH_PERIOD = 0.02  # сек — как часто проверяем кольцевой буфер (дешёвое локальное чтение)
+STOP_REPLY_TIMEOUT = 2.0  # сек — сколько следующий MoveRobot ждёт ответа робота на прерванный
+
+
+class StopEvent:
+    def __init__(self, distance_mm: float, sample_age: float, detect_to_stop: float):
+        self.distance_mm = distance_mm
+        self.sample_age = sample_age  # насколько замер был старым в момент обнаружения
+        self.detect_to_stop = detect_to_stop  # от обнаружения до ответа на StopAllAction
+
+    @property
+    def reaction_time(self) -> float:
+        """Time from the IR sample being taken to the robot confirming the stop."""
+        return self.sample_age + self.detect_to_stop
+
+    def __str__(self):
+        return (f"[WATCHDOG] Obstacle at {self.distance_mm:.0f} mm -> stopped in "
+                f"{self.detect_to_stop * 1000:.0f} ms (sample age {self.sample_age * 1000:.0f} ms)")
+
+
+# === Preempt-safe MoveRobot ===
+# Отмена execute() оставляет в SDK обработчик ответа прерванной команды. Когда робот всё-таки
+# отвечает (isSuccess=False после StopAllAction), диспетчер SDK снимает все обработчики MoveRobot,
+# в том числе обработчик следующей команды, и та ждёт ответа 300 с. Поэтому прерванная команда
+# дожидается своего ответа в фоне, а следующий MoveRobot уходит только после него
+_unanswered: asyncio.Task | None = None
+
+
+def _wrap_move_robot():
+    execute = MoveRobot.execute
+    if getattr(execute, "_preempt_safe", False):
+        return
+
+    @functools.wraps(execute)
+    async def preempt_safe_execute(self):
+        global _unanswered
+        if _unanswered is not None and not _unanswered.done():
+            await asyncio.wait({_unanswered}, timeout=STOP_REPLY_TIMEOUT)
+        _unanswered = None
+        task = asyncio.ensure_future(execute(self))
+        try:
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            _unanswered = task
+            raise
+
+    preempt_safe_execute._preempt_safe = True
+    MoveRobot.execute = preempt_safe_execute
+
+
+# === Watchdog ===
+class ObstacleWatchdog:
+    """Runs a move while watching the IR stream, and preempts it with StopAllAction."""
+
+    def __init__(self, stream: IRDistanceStream, threshold_mm: float):
+        self.stream = stream
+        self.threshold_mm = threshold_mm
+        self.events: list[StopEvent] = []
+        _wrap_move_robot()
+
+    def worst_reaction_time(self) -> float:
+        return max((event.reaction_time for event in self.events), default=0.0)
+
+    def _obstacle_sample(self, seen_count: int) -> tuple[float, float] | None:
+        ring = self.stream.ring
+        if ring.count == seen_count:
+            return None
+        sample = self.stream.latest()
+        if sample is not None and sample[0] <= self.threshold_mm:
+            return sample
+        return None
+
+    async def guard(self, move) -> bool | None:
+        """Awaits the move coroutine and returns its result (True/False from the move helper).
+
+        Returns None if an obstacle preempted the move: the move was cancelled, StopAllAction was
+        sent and the StopEvent was recorded. Callers tell None apart from False (move refused)
+        and start a bypass on it.
+        """
+        task = asyncio.create_task(move)
+        seen_count = self.stream.ring.count
+
+        while not task.done():
+            sample = self._obstacle_sample(seen_count)
+            seen_count = self.stream.ring.count
+            if sample is None:
+                try:
+                    await asyncio.wait({task}, timeout=WATCH_PERIOD)
+                except asyncio.CancelledError:
+                    task.cancel()
+                    raise
+                continue
+
+            distance_mm, sample_age = sample
+            detected = time.perf_counter()
+            task.cancel()
+            await StopAllAction(is_serial=True).execute()
+            event = StopEvent(distance_mm, sample_age, time.perf_counter() - detected)
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+            self.events.append(event)
+            print(event)
+            return None
+
+        return task.result()
@@ -0,0 +1,272 @@
+import heapq
+import math
+
+import numpy as np
+
+from ir_stream import NO_READING_MM
+
+# === Constants ===
+GRID_SIZE_MM = 8000  # квадрат 8×8 м с центром в точке старта
+CELL_MM = 100
+ROBOT_RADIUS_MM = 100  # препятствия раздуваются на радиус робота, чтобы планировать путь для точки
+IR_MAX_RANGE_MM = 800  # дальше ИК-датчик не видит: конец луча не считается препятствием
+SENSOR_OFFSET_MM = 60  # ИК-датчик на груди, впереди центра робота
+INFLATED_COST = 3.0  # клетка у препятствия проходима, но дорога: из неё уходят кратчайшим путём
+LOG_ODDS_HIT = 40
+LOG_ODDS_MISS = -10
+LOG_ODDS_LIMIT = 120  # влезает в int8 и не даёт клетке «застыть» навсегда
+OCCUPIED_LOG_ODDS = 20
+SQRT2 = math.sqrt(2)
+NEIGHBOURS = [(-1, -1, SQRT2), (-1, 0, 1.0), (-1, 1, SQRT2), (0, -1, 1.0),
+              (0, 1, 1.0), (1, -1, SQRT2), (1, 0, 1.0), (1, 1, SQRT2)]
+
+
+# === Map ===
+class OccupancyGrid:
+    """Log-odds occupancy of the booth floor in one int8 array, updated ray by ray from IR readings.
+
+    `occupied` cells are impassable; `blocked` is the occupancy inflated by the robot radius,
+    which the robot may cross at a price (it is standing in it whenever it stops at the
+    obstacle threshold). Each update recomputes the inflation only in a window around the
+    cells that changed and returns the cells whose state flipped, so an incremental planner
+    can repair its search instead of starting over. Unobserved cells count as free.
+    """
+
+    def __init__(self, size_mm: float = GRID_SIZE_MM, cell_mm: float = CELL_MM,
+                 robot_radius_mm: float = ROBOT_RADIUS_MM, max_range_mm: float = IR_MAX_RANGE_MM,
+                 sensor_offset_mm: float = SENSOR_OFFSET_MM):
+        self.cell_mm = cell_mm
+        self.max_range_mm = max_range_mm
+        self.sensor_offset_mm = sensor_offset_mm
+        self.size = math.ceil(size_mm / cell_mm)
+        self.origin = -self.size * cell_mm / 2  # мировые координаты угла клетки (0, 0)
+        self.log_odds = np.zeros((self.size, self.size), np.int8)
+        self.occupied = np.zeros((self.size, self.size), bool)
+        self.blocked = np.zeros((self.size, self.size), bool)
+        radius = math.ceil(robot_radius_mm / cell_mm)
+        self._radius = radius
+        self._footprint = [(dr, dc) for dr in range(-radius, radius + 1) for dc in range(-radius, radius + 1)
+                           if math.hypot(dr, dc) * cell_mm <= robot_radius_mm + cell_mm / 2]
+        self.observations = 0
+
+    def cell(self, x: float, y: float) -> tuple[int, int] | None:
+        row = int((y - self.origin) // self.cell_mm)
+        col = int((x - self.origin) // self.cell_mm)
+        if 0 <= row < self.size and 0 <= col < self.size:
+            return row, col
+        return None
+
+    def center(self, cell: tuple[int, int]) -> tuple[float, float]:
+        row, col = cell
+        return self.origin + (col + 0.5) * self.cell_mm, self.origin + (row + 0.5) * self.cell_mm
+
+    def observe(self, x: float, y: float, heading: float, distance_mm: float) -> list[tuple[int, int]]:
+        """Integrates one IR reading taken with the robot at (x, y) facing `heading`; returns cells that changed.
+
+        NO_READING_MM (the sensor did not answer) is skipped: read as "nothing within range" it
+        would clear every cell along the ray, known obstacles included.
+        """
+        if distance_mm >= NO_READING_MM:
+            return []
+        self.observations += 1
+        hit = distance_mm < self.max_range_mm
+        length = min(distance_mm, self.max_range_mm) + self.sensor_offset_mm
+        # Точки луча через полклетки: каждая клетка на пути попадёт хотя бы раз
+        t = np.arange(0.0, length, self.cell_mm / 2)
+        rows = ((y + t * math.sin(heading) - self.origin) // self.cell_mm).astype(np.intp)
+        cols = ((x + t * math.cos(heading) - self.origin) // self.cell_mm).astype(np.intp)
+        inside = (rows >= 0) & (rows < self.size) & (cols >= 0) & (cols < self.size)
+        free = np.unique(np.stack((rows[inside], cols[inside]), axis=1), axis=0)
+
+        end = self.cell(x + length * math.cos(heading), y + length * math.sin(heading))
+        if hit and end is not None:
+            free = free[(free[:, 0] != end[0]) | (free[:, 1] != end[1])]
+        touched = [free]
+        values = self.log_odds.astype(np.int16)
+        values[free[:, 0], free[:, 1]] += LOG_ODDS_MISS
+        if hit and end is not None:
+            values[end] += LOG_ODDS_HIT
+            touched.append(np.array([end]))
+        np.clip(values, -LOG_ODDS_LIMIT, LOG_ODDS_LIMIT, out=values)
+        self.log_odds[:] = values
+
+        touched = np.concatenate(touched)
+        if touched.size == 0:
+            return []
+        occupied = self.log_odds[touched[:, 0], touched[:, 1]] > OCCUPIED_LOG_ODDS
+        changed = occupied != self.occupied[touched[:, 0], touched[:, 1]]
+        if not changed.any():
+            return []
+        flipped = touched[changed]
+        self.occupied[flipped[:, 0], flipped[:, 1]] = occupied[changed]
+        cells = set(self._reinflate(flipped))
+        cells.update((int(row), int(col)) for row, col in flipped)
+        return list(cells)
+
+    def mark_occupied(self, cell: tuple[int, int]) -> list[tuple[int, int]]:
+        """Marks a cell as an obstacle without a ray, e.g. when the robot could not move into it."""
+        if self.occupied[cell]:
+            return []
+        self.log_odds[cell] = max(int(self.log_odds[cell]), LOG_ODDS_HIT)
+        self.occupied[cell] = True
+        return list(set(self._reinflate(np.array([cell]))) | {cell})
+
+    def _reinflate(self, flipped: np.ndarray) -> list[tuple[int, int]]:
+        # Окно вокруг изменившихся клеток: раздувание меняется не дальше радиуса робота
+        r = self._radius
+        top, left = np.maximum(flipped.min(axis=0) - r, 0)
+        bottom, right = np.minimum(flipped.max(axis=0) + r + 1, self.size)
+        # Для пересчёта окна нужны препятствия ещё на радиус дальше
+        top2, left2 = max(top - r, 0), max(left - r, 0)
+        bottom2, right2 = min(bottom + r, self.size), min(right + r, self.size)
+        occupied = self.occupied[top2:bottom2, left2:right2]
+        inflated = np.zeros_like(occupied)
+        height, width = occupied.shape
+        for dr, dc in self._footprint:
+            # inflated[i, j] |= occupied[i + dr, j + dc]
+            src_r = slice(max(dr, 0), height + min(dr, 0))
+            dst_r = slice(max(-dr, 0), height + min(-dr, 0))
+            src_c = slice(max(dc, 0), width + min(dc, 0))
+            dst_c = slice(max(-dc, 0), width + min(-dc, 0))
+            inflated[dst_r, dst_c] |= occupied[src_r, src_c]
+        window = inflated[top - top2:bottom - top2, left - left2:right - left2]
+        changed = np.argwhere(window != self.blocked[top:bottom, left:right])
+        self.blocked[top:bottom, left:right] = window
+        return [(int(row) + top, int(col) + left) for row, col in changed]
+
+    def line_cells(self, a: tuple[int, int], b: tuple[int, int]) -> tuple[np.ndarray, np.ndarray]:
+        """Rows and columns of the cells on the straight segment from a to b, a itself excluded."""
+        steps = max(abs(b[0] - a[0]), abs(b[1] - a[1])) * 2
+        t = np.linspace(0.0, 1.0, steps + 1)[1:]
+        rows = np.rint(a[0] + t * (b[0] - a[0])).astype(np.intp)
+        cols = np.rint(a[1] + t * (b[1] - a[1])).astype(np.intp)
+        return rows, cols
+
+
+# === Planner ===
+class DStarLite:
+    """D* Lite shortest paths on the occupancy grid, repaired in place when cells change.
+
+    The search runs backwards from the goal, so when the robot moves only the key modifier km
+    grows, and when the map changes only the vertices around changed cells are re-expanded.
+    The heuristic (octile distance from the robot) is cached as one array per start cell.
+    """
+
+    def __init__(self, grid: OccupancyGrid, start: tuple[int, int], goal: tuple[int, int]):
+        self.grid = grid
+        # Те же массивы, что у карты: планировщик видит её обновления
+        self.occupied = grid.occupied
+        self.blocked = grid.blocked
+        self.start = start
+        self.goal = goal
+        self.g = np.full(self.blocked.shape, np.inf)
+        self.rhs = np.full(self.blocked.shape, np.inf)
+        self.rhs[goal] = 0.0
+        self.km = 0.0
+        self.expanded = 0
+        self._last_start = start
+        self._heap: list = []
+        self._queued: dict = {}  # клетка -> актуальный ключ; устаревшие записи кучи пропускаются
+        self._h = self._heuristic(start)
+        self._push(goal)
+
+    @staticmethod
+    def _octile(a: tuple[int, int], b: tuple[int, int]) -> float:
+        dr, dc = abs(a[0] - b[0]), abs(a[1] - b[1])
+        return max(dr, dc) + (SQRT2 - 1) * min(dr, dc)
+
+    def _heuristic(self, start: tuple[int, int]) -> np.ndarray:
+        rows, cols = np.indices(self.blocked.shape)
+        dr, dc = np.abs(rows - start[0]), np.abs(cols - start[1])
+        return np.maximum(dr, dc) + (SQRT2 - 1) * np.minimum(dr, dc)
+
+    def _key(self, cell) -> tuple[float, float]:
+        best = min(self.g[cell], self.rhs[cell])
+        return best + self._h[cell] + self.km, best
+
+    def _push(self, cell):
+        key = self._key(cell)
+        self._queued[cell] = key
+        heapq.heappush(self._heap, (key, cell))
+
+    def _neighbours(self, cell):
+        row, col = cell
+        size_r, size_c = self.blocked.shape
+        for dr, dc, cost in NEIGHBOURS:
+            r, c = row + dr, col + dc
+            if 0 <= r < size_r and 0 <= c < size_c:
+                yield (r, c), cost
+
+    def _cost(self, a, b, base: float) -> float:
+        """Cost of stepping from a to its neighbour b: entering or cutting the corner of an obstacle is impossible."""
+        if self.occupied[b]:
+            return math.inf
+        if base > 1.0 and (self.occupied[a[0], b[1]] or self.occupied[b[0], a[1]]):
+            return math.inf
+        return base * INFLATED_COST if self.blocked[b] else base
+
+    def _update_vertex(self, cell):
+        if cell != self.goal:
+            self.rhs[cell] = min((self._cost(cell, n, cost) + self.g[n] for n, cost in self._neighbours(cell)),
+                                 default=math.inf)
+        self._queued.pop(cell, None)
+        if self.g[cell] != self.rhs[cell]:
+            self._push(cell)
+
+    def compute(self):
+        while self._heap:
+            key, cell = self._heap[0]
+            if self._queued.get(cell) != key:
+                heapq.heappop(self._heap)  # запись устарела
+                continue
+            if key >= self._key(self.start) and self.rhs[self.start] == self.g[self.start]:
+                break
+            heapq.heappop(self._heap)
+            del self._queued[cell]
+            self.expanded += 1
+            new_key = self._key(cell)
+            if key < new_key:
+                self._push(cell)
+            elif self.g[cell] > self.rhs[cell]:
+                self.g[cell] = self.rhs[cell]
+                for n, _ in self._neighbours(cell):
+                    self._update_vertex(n)
+            else:
+                self.g[cell] = math.inf
+                self._update_vertex(cell)
+                for n, _ in self._neighbours(cell):
+                    self._update_vertex(n)
+
+    def move_start(self, start: tuple[int, int]):
+        if start == self.start:
+            return
+        self.km += self._octile(self._last_start, start)
+        self._last_start = start
+        self.start = start
+        self._h = self._heuristic(start)
+
+    def cells_changed(self, cells):
+        """Repairs the search after the map changed: edges into and around each cell changed cost."""
+        dirty = set()
+        for cell in cells:
+            dirty.add(cell)
+            dirty.update(n for n, _ in self._neighbours(cell))
+        for cell in dirty:
+            self._update_vertex(cell)
+
+    @property
+    def reachable(self) -> bool:
+        return math.isfinite(self.g[self.start])
+
+    def path(self, max_cells: int = 200) -> list[tuple[int, int]]:
+        """Cells from the start to the goal following the cheapest g values; empty if unreachable."""
+        if not self.reachable:
+            return []
+        path = [self.start]
+        cell = self.start
+        while cell != self.goal and len(path) <= max_cells:
+            cell = min(self._neighbours(cell), key=lambda item: self._cost(cell, item[0], item[1]) + self.g[item[0]])[0]
+            if not math.isfinite(self.g[cell]):
+                return []
+            path.append(cell)
+        return path
@@ -0,0 +1,99 @@
+import time
+
+import cv2
+import numpy as np
+
+# === Constants ===
+CHECK_HEIGHT = 160  # высота, до которой уменьшается вырезанная область перед проверкой
+ROI_MARGIN = 0.2  # на сколько расширять рамку движения с каждой стороны
+MAX_PROPOSALS = 3  # сколько самых крупных областей движения проверять
+HOG_MIN_HEIGHT = 128  # окно детектора людей HOG — 64x128
+FACE_MIN_SIZE = (24, 24)
+HEAD_CROP_ASPECT = 1.0  # для лиц проверяем верх рамки высотой в столько её ширин: у идущего это голова и плечи
+METHODS = ("hog", "face")
+
+
+class PersonCheck:
+    """Second stage of detection: looks for a person only inside the motion boxes.
+
+    "hog" runs OpenCV's default HOG people detector, "face" the bundled frontal-face Haar cascade.
+    Each crop is scaled to CHECK_HEIGHT pixels, so the cost depends on the number of proposals,
+    not on the camera resolution. For faces only the top of a motion box is checked (head_crop):
+    scaled whole, a full-body box would leave the face far below FACE_MIN_SIZE. If the installed
+    OpenCV lacks the detector (e.g. an OpenCV 5 build without objdetect), `available` is False
+    and callers fall back to motion only.
+    """
+
+    def __init__(self, method: str = "face", check_height: int = CHECK_HEIGHT, margin: float = ROI_MARGIN,
+                 max_proposals: int = MAX_PROPOSALS, head_crop: bool = True):
+        if method not in METHODS:
+            raise ValueError(f"Unknown person check '{method}', expected one of: {', '.join(METHODS)}")
+        self.method = method
+        self.check_height = check_height
+        self.margin = margin
+        self.max_proposals = max_proposals
+        self.head_crop = head_crop and method == "face"
+        self.checks = 0
+        self.hits = 0
+        self.total_seconds = 0.0
+        self.available = False
+        self._detector = None
+        try:
+            if method == "hog":
+                self._detector = cv2.HOGDescriptor()
+                self._detector.setSVMDetector(cv2.HOGDescriptor_getDefaultPeopleDetector())
+            else:
+                self._detector = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
+                if self._detector.empty():
+                    raise AttributeError("face cascade not found")
+            self.available = True
+        except AttributeError as e:
+            print(f"[⚠️]  Person check '{method}' unavailable in OpenCV {cv2.__version__} ({e}); using motion only")
+
+    @property
+    def hit_rate(self) -> float:
+        return self.hits / self.checks if self.checks else 0.0
+
+    def _crops(self, frame: np.ndarray, boxes: np.ndarray):
+        height, width = frame.shape[:2]
+        # Сначала самые крупные области движения
+        order = np.argsort(boxes[:, 2] * boxes[:, 3])[::-1][:self.max_proposals]
+        for x, y, w, h in boxes[order]:
+            if self.head_crop:
+                # Лицо — вверху рамки: на уменьшенной целиком рамке человека в рост оно мельче FACE_MIN_SIZE
+                h = min(h, int(w * HEAD_CROP_ASPECT))
+            dx, dy = int(w * self.margin), int(h * self.margin)
+            x0, y0 = max(x - dx, 0), max(y - dy, 0)
+            x1, y1 = min(x + w + dx, width), min(y + h + dy, height)
+            crop = frame[y0:y1, x0:x1]
+            if crop.size == 0:
+                continue
+            target = self.check_height
+            if self.method == "hog":
+                target = max(target, HOG_MIN_HEIGHT)
+            scale = target / crop.shape[0]
+            # Далёкую голову увеличиваем: лицо должно дорасти до FACE_MIN_SIZE
+            if scale < 1 or self.method == "hog" or self.head_crop:
+                crop = cv2.resize(crop, (max(int(crop.shape[1] * scale), 1), target), interpolation=cv2.INTER_LINEAR)
+            yield crop
+
+    def _has_person(self, crop: np.ndarray) -> bool:
+        if self.method == "hog":
+            if crop.shape[1] < 64:
+                return False
+            found, _ = self._detector.detectMultiScale(crop, winStride=(8, 8), padding=(8, 8), scale=1.1)
+        else:
+            gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+            found = self._detector.detectMultiScale(gray, scaleFactor=1.1, minNeighbors=4, minSize=FACE_MIN_SIZE)
+        return len(found) > 0
+
+    def confirm(self, frame: np.ndarray, boxes: np.ndarray) -> bool:
+        """True if any of the largest motion boxes contains a person (or a face)."""
+        if not self.available or len(boxes) == 0:
+            return False
+        started = time.perf_counter()
+        found = any(self._has_person(crop) for crop in self._crops(frame, boxes))
+        self.total_seconds += time.perf_counter() - started
+        self.checks += 1
+        self.hits += found
+        return found
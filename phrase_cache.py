@@ -0,0 +1,202 @@
+import asyncio
+import functools
+import hashlib
+import io
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import wave
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from mini.apis.api_sound import PlayAudio, AudioStorageType
+from mini.apis.base_api import MiniApiResultType
+
+# === Constants ===
+CACHE_DIR = os.path.expanduser("~/.alphamini_phrases")
+MAX_CACHE_BYTES = 50 * 1024 * 1024
+AUDIO_PORT = 8808
+DEFAULT_VOICE = "en"
+PLAY_TIMEOUT = 30  # сек
+
+
+# === Synthesizers ===
+class EspeakSynthesizer:
+    """Offline TTS through the espeak-ng / espeak command line tool."""
+
+    def __init__(self, executable: str | None = None, speed: int = 150):
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+        self.speed = speed
+
+    @property
+    def available(self) -> bool:
+        return self.executable is not None
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        result = subprocess.run([self.executable, "-v", voice, "-s", str(self.speed), "--stdout", text],
+                                capture_output=True, check=True)
+        return result.stdout
+
+
+class SilentSynthesizer:
+    """Produces a short silent WAV per phrase; for tests and the fake robot."""
+
+    available = True
+
+    def __init__(self, seconds_per_char: float = 0.06, sample_rate: int = 16000):
+        self.seconds_per_char = seconds_per_char
+        self.sample_rate = sample_rate
+
+    def synthesize(self, text: str, voice: str) -> bytes:
+        frames = int(len(text) * self.seconds_per_char * self.sample_rate)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(b"\x00\x00" * frames)
+        return buffer.getvalue()
+
+
+# === Cache ===
+def _local_address_for(robot_address: str) -> str:
+    # Адрес сетевого интерфейса, через который виден робот (пакеты не отправляются)
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+        s.connect((robot_address, 9))
+        return s.getsockname()[0]
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class PhraseCache:
+    """Pre-rendered phrase audio on disk, played by the robot through PlayAudio.
+
+    Files are keyed by sha1(voice + text) and evicted least-recently-used (by mtime, which is
+    refreshed on every play) once the directory grows past max_bytes. The robot fetches the
+    audio over HTTP from this machine.
+    """
+
+    def __init__(self, synthesizer=None, voice: str = DEFAULT_VOICE, cache_dir: str = CACHE_DIR,
+                 max_bytes: int = MAX_CACHE_BYTES):
+        self.synthesizer = synthesizer or EspeakSynthesizer()
+        self.voice = voice
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.base_url = None
+        self.hits = 0
+        self.misses = 0
+        self._server = None
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _file_name(self, text: str) -> str:
+        key = hashlib.sha1(f"{self.voice}\n{text}".encode("utf-8")).hexdigest()
+        return f"{key}.wav"
+
+    def path_for(self, text: str) -> str:
+        return os.path.join(self.cache_dir, self._file_name(text))
+
+    def has(self, text: str) -> bool:
+        return os.path.exists(self.path_for(text))
+
+    def render(self, text: str) -> str | None:
+        """Synthesizes the phrase unless it is already on disk; returns the file path."""
+        path = self.path_for(text)
+        if os.path.exists(path):
+            return path
+        if not self.synthesizer.available:
+            return None
+        try:
+            audio = self.synthesizer.synthesize(text, self.voice)
+        except (OSError, subprocess.CalledProcessError) as e:
+            print(f"[X] Could not synthesize '{text}': {e}")
+            return None
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(audio)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            # Полный или доступный только для чтения каталог: фразу скажет StartPlayTTS
+            print(f"[X] Could not cache '{text}': {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return None
+        try:
+            self._evict()
+        except OSError as e:
+            print(f"[⚠️] Phrase cache eviction failed: {e}")
+        return path
+
+    def _evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.cache_dir):
+            if not name.endswith(".wav"):
+                continue
+            stat = os.stat(os.path.join(self.cache_dir, name))
+            entries.append((stat.st_mtime, stat.st_size, name))
+            total += stat.st_size
+        for _, size, name in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(os.path.join(self.cache_dir, name))
+            total -= size
+
+    async def prewarm(self, phrases):
+        """Renders all known phrases in a worker thread so the first play is instant."""
+        loop = asyncio.get_running_loop()
+        for text in phrases:
+            await loop.run_in_executor(None, self.render, text)
+        print(f"[✓] Phrase cache ready ({len(phrases)} phrases in {self.cache_dir})")
+
+    def serve(self, robot_address: str, port: int = AUDIO_PORT) -> bool:
+        """Starts the HTTP server the robot downloads the audio from."""
+        if self._server is not None:
+            return True
+        try:
+            host = _local_address_for(robot_address)
+            handler = functools.partial(_QuietHandler, directory=self.cache_dir)
+            self._server = ThreadingHTTPServer((host, port), handler)
+        except OSError as e:
+            print(f"[X] Phrase audio server not started: {e}")
+            return False
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self.base_url = f"http://{host}:{port}"
+        print(f"[✓] Serving phrase audio at {self.base_url}")
+        return True
+
+    def shutdown(self):
+        if self._server:
+            self._server.shutdown()
+            self._server = None
+            self.base_url = None
+
+    async def play(self, text: str) -> bool:
+        """Plays a cached phrase on the robot; returns False if it is not cached or was refused (caller uses TTS).
+
+        A timeout counts as played: the robot may still be playing the file.
+        """
+        if self.base_url is None or not self.has(text):
+            self.misses += 1
+            return False
+        self.hits += 1
+        path = self.path_for(text)
+        try:
+            os.utime(path)  # отмечаем использование для LRU
+        except OSError:
+            pass
+
+        block = PlayAudio(url=f"{self.base_url}/{self._file_name(text)}", storage_type=AudioStorageType.NET_PUBLIC)
+        try:
+            result_type, response = await asyncio.wait_for(block.execute(), PLAY_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Робот мог уже начать проигрывать фразу: повтор через TTS прозвучал бы дважды
+            print(f"[⚠️] PlayAudio timed out, not repeating: '{text}'")
+            return True
+        return result_type == MiniApiResultType.Success and response is not None and response.isSuccess
@@ -0,0 +1,232 @@
+import functools
+import json
+import math
+import os
+import time
+
+import numpy as np
+
+from mini.apis.api_action import MoveRobot, MoveRobotDirection, MoveRobotResponse
+from mini.apis.base_api import MiniApiResultType
+
+from motion_plan import STEP_SECONDS, TURN_90_UNITS
+from sdk_metrics import registry
+
+# === Constants ===
+CALIBRATION_PATH = os.environ.get("ALPHAMINI_CALIBRATION", os.path.expanduser("~/.alphamini_calibration.json"))
+STEP_LENGTH_MM = 60.0  # длина шага вперёд, откалибровать на месте
+TURN_UNIT_DEG = 90.0 / TURN_90_UNITS  # один шаг поворота ≈ 30°
+STEP_SIGMA = 0.1  # σ длины шага как доля самого шага
+TURN_SIGMA_DEG = 3.0  # σ одного шага поворота
+WALK_DRIFT_SIGMA_DEG = 0.5  # σ ухода курса за шаг вперёд
+INTERRUPTED_SIGMA_STEPS = 0.5  # доп. σ, если движение прервано и пройденное оценено по времени
+
+
+def _wrap_angle(angle: float) -> float:
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+
+# === Pose estimate ===
+class PoseTracker:
+    """Dead reckoning of (x, y, heading) from the commanded MoveRobot steps, with uncertainty.
+
+    The start pose is the origin facing +x; positive heading is to the left (counterclockwise),
+    distances are in mm. The covariance is propagated like an extended Kalman filter prediction
+    step: step-length error grows along the heading, turn and walking drift grow the heading
+    error, and heading error turns into sideways position error as the robot keeps walking.
+    """
+
+    def __init__(self, step_length_mm: float = STEP_LENGTH_MM, turn_unit_deg: float = TURN_UNIT_DEG,
+                 step_sigma: float = STEP_SIGMA, turn_sigma_deg: float = TURN_SIGMA_DEG,
+                 walk_drift_sigma_deg: float = WALK_DRIFT_SIGMA_DEG):
+        self.step_length_mm = step_length_mm
+        self.turn_unit_deg = turn_unit_deg
+        self.step_sigma = step_sigma
+        self.turn_sigma_deg = turn_sigma_deg
+        self.walk_drift_sigma_deg = walk_drift_sigma_deg
+        self.state = np.zeros(3)  # x, y, heading
+        self.cov = np.zeros((3, 3))
+        self.steps_walked = 0.0
+        self.turn_units = 0.0
+        self.interrupted = 0
+        self.moved_at = 0.0  # time.monotonic(), когда закончилась последняя команда MoveRobot
+
+    # --- calibration ---
+    @classmethod
+    def load(cls, path: str = CALIBRATION_PATH) -> "PoseTracker":
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                calibration = json.load(f)
+        except (OSError, ValueError):
+            return cls()
+        return cls(calibration.get("step_length_mm", STEP_LENGTH_MM),
+                   calibration.get("turn_unit_deg", TURN_UNIT_DEG))
+
+    def save(self, path: str = CALIBRATION_PATH):
+        calibration = {"step_length_mm": self.step_length_mm, "turn_unit_deg": self.turn_unit_deg,
+                       "saved_at": time.time()}
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(calibration, f, indent=2)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"[X] Could not save calibration: {e}")
+
+    def calibrate_step(self, commanded_steps: int, measured_mm: float):
+        """Sets the step length from a measured walk, e.g. 20 steps -> 1150 mm on the tape."""
+        self.step_length_mm = measured_mm / commanded_steps
+
+    def calibrate_turn(self, commanded_units: int, measured_deg: float):
+        """Sets the turn unit from a measured turn, e.g. 12 units -> 345° instead of a full circle."""
+        self.turn_unit_deg = measured_deg / commanded_units
+
+    # --- pose ---
+    @property
+    def x(self) -> float:
+        return float(self.state[0])
+
+    @property
+    def y(self) -> float:
+        return float(self.state[1])
+
+    @property
+    def heading(self) -> float:
+        return float(self.state[2])
+
+    @property
+    def position_sigma(self) -> float:
+        """1σ position error along the worst axis, mm."""
+        return math.sqrt(max(np.linalg.eigvalsh(self.cov[:2, :2])[-1], 0.0))
+
+    @property
+    def heading_sigma_deg(self) -> float:
+        return math.degrees(math.sqrt(self.cov[2, 2]))
+
+    def reset(self, x: float = 0.0, y: float = 0.0, heading: float = 0.0):
+        """Known pose, e.g. the robot was put back on the start mark."""
+        self.state[:] = (x, y, heading)
+        self.cov[:] = 0.0
+
+    def forward(self, steps: float, extra_sigma_steps: float = 0.0):
+        """Integrates a walk of `steps` steps (negative: backwards)."""
+        heading = self.heading
+        distance = steps * self.step_length_mm
+        cos_h, sin_h = math.cos(heading), math.sin(heading)
+        self.state[0] += distance * cos_h
+        self.state[1] += distance * sin_h
+
+        jacobian = np.array([[1.0, 0.0, -distance * sin_h],
+                             [0.0, 1.0, distance * cos_h],
+                             [0.0, 0.0, 1.0]])
+        noise_map = np.array([[cos_h, 0.0], [sin_h, 0.0], [0.0, 1.0]])
+        distance_var = abs(steps) * (self.step_length_mm * self.step_sigma) ** 2 + \
+            (extra_sigma_steps * self.step_length_mm) ** 2
+        drift_var = abs(steps) * math.radians(self.walk_drift_sigma_deg) ** 2
+        self.cov = jacobian @ self.cov @ jacobian.T + noise_map @ np.diag((distance_var, drift_var)) @ noise_map.T
+        self.steps_walked += abs(steps)
+
+    def turn(self, units: float, extra_sigma_units: float = 0.0):
+        """Integrates a turn of `units` turn steps (positive: left)."""
+        self.state[2] = _wrap_angle(self.heading + math.radians(units * self.turn_unit_deg))
+        self.cov[2, 2] += abs(units) * math.radians(self.turn_sigma_deg) ** 2 + \
+            math.radians(extra_sigma_units * self.turn_unit_deg) ** 2
+        self.turn_units += abs(units)
+
+    def apply(self, direction: MoveRobotDirection, steps: float, extra_sigma: float = 0.0):
+        if direction == MoveRobotDirection.FORWARD:
+            self.forward(steps, extra_sigma)
+        elif direction == MoveRobotDirection.BACKWARD:
+            self.forward(-steps, extra_sigma)
+        elif direction == MoveRobotDirection.LEFTWARD:
+            self.turn(steps, extra_sigma)
+        else:
+            self.turn(-steps, extra_sigma)
+        registry.set_gauge("pose.sigma_mm", round(self.position_sigma, 1))
+        registry.set_gauge("pose.heading_sigma_deg", round(self.heading_sigma_deg, 2))
+
+    # --- navigation helpers ---
+    def relative(self, x: float, y: float) -> tuple[float, float]:
+        """Distance (mm) and bearing (rad, positive: to the left) of a point from the current pose."""
+        dx, dy = x - self.x, y - self.y
+        return math.hypot(dx, dy), _wrap_angle(math.atan2(dy, dx) - self.heading)
+
+    def turn_units_to(self, x: float, y: float) -> int:
+        """Whole turn steps (positive: left) that point the robot closest to the point."""
+        distance, bearing = self.relative(x, y)
+        if distance < self.step_length_mm:
+            return 0  # ближе шага точнее не подойти, разворот на месте только собьёт курс
+        return round(math.degrees(bearing) / self.turn_unit_deg)
+
+    def steps_to(self, x: float, y: float) -> int:
+        """Whole forward steps that bring the robot closest to the point along its heading."""
+        distance, bearing = self.relative(x, y)
+        return max(round(distance * math.cos(bearing) / self.step_length_mm), 0)
+
+    def __str__(self):
+        return (f"[POSE] ({self.x:.0f}, {self.y:.0f}) mm, heading {math.degrees(self.heading):.0f}° "
+                f"± {self.position_sigma:.0f} mm / {self.heading_sigma_deg:.1f}°")
+
+    # --- MoveRobot hook ---
+    def attach(self):
+        """Feeds this tracker with every MoveRobot command sent from now on."""
+        global _tracker
+        _tracker = self
+        _wrap_move_robot()
+
+    def _on_move(self, direction: MoveRobotDirection, steps: int, completed: bool, elapsed: float):
+        self.moved_at = time.monotonic()
+        if completed:
+            self.apply(direction, steps)
+            return
+        # Движение прервано (сторож препятствий) или не подтверждено: пройденное оцениваем по времени
+        self.interrupted += 1
+        done = min(elapsed / (STEP_SECONDS[direction] * steps), 1.0) * steps
+        self.apply(direction, done, INTERRUPTED_SIGMA_STEPS)
+
+
+_tracker: PoseTracker | None = None
+
+
+def _wrap_move_robot():
+    execute = MoveRobot.execute
+    if getattr(execute, "_pose_tracked", False):
+        return
+
+    @functools.wraps(execute)
+    async def tracked_execute(self):
+        direction = MoveRobotDirection(self._MoveRobot__direction)
+        steps = self._MoveRobot__step
+        started = time.perf_counter()
+        completed = False
+        try:
+            result = await execute(self)
+            if isinstance(result, tuple):
+                result_type, response = result
+                completed = (result_type == MiniApiResultType.Success and isinstance(response, MoveRobotResponse)
+                             and response.isSuccess)
+            return result
+        finally:
+            if _tracker is not None:
+                _tracker._on_move(direction, steps, completed, time.perf_counter() - started)
+
+    tracked_execute._pose_tracked = True
+    MoveRobot.execute = tracked_execute
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Save the dead-reckoning calibration of the robot")
+    parser.add_argument("kind", choices=("step", "turn"))
+    parser.add_argument("commanded", type=int, help="steps or turn units the robot was commanded")
+    parser.add_argument("measured", type=float, help="measured distance (mm) or angle (degrees)")
+    args = parser.parse_args()
+
+    tracker = PoseTracker.load()
+    if args.kind == "step":
+        tracker.calibrate_step(args.commanded, args.measured)
+    else:
+        tracker.calibrate_turn(args.commanded, args.measured)
+    tracker.save()
+    print(f"[✓] Step {tracker.step_length_mm:.1f} mm, turn unit {tracker.turn_unit_deg:.1f}° -> {CALIBRATION_PATH}")
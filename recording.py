@@ -0,0 +1,288 @@
+import argparse
+import json
+import os
+import time
+
+import cv2
+import numpy as np
+
+# === Constants ===
+FRAMES_FILE = "frames.bin"
+INDEX_FILE = "index.bin"
+META_FILE = "meta.json"
+JPEG_QUALITY = 90
+INDEX_FLUSH_FRAMES = 30  # индекс сбрасываем на диск раз в столько кадров (≈ 1 с при 30 fps)
+# Запись индекса: смещение кадра в frames.bin, его размер и время от начала записи
+INDEX_DTYPE = np.dtype([("offset", "<u8"), ("size", "<u4"), ("t", "<f8")])
+
+
+# === Recorder ===
+class FrameRecorder:
+    """Appends encoded frames to frames.bin and a fixed-size record per frame to index.bin.
+
+    Both files are append-only, so a recording cut short by a crash stays readable up to the
+    last complete index record. An existing recording is never overwritten or extended.
+    """
+
+    def __init__(self, path: str, codec: str = "jpg", quality: int = JPEG_QUALITY):
+        if codec not in ("jpg", "png"):
+            raise ValueError(f"Unsupported codec '{codec}', expected jpg or png")
+        if is_recording(path):
+            raise FileExistsError(f"Recording already exists: {path}")
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.codec = codec
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, quality] if codec == "jpg" else []
+        self.frames = open(os.path.join(path, FRAMES_FILE), "wb")
+        self.index = open(os.path.join(path, INDEX_FILE), "wb")
+        self.offset = 0
+        self.count = 0
+        self.started_at = None
+        self._record = np.zeros((), INDEX_DTYPE)
+        self._meta_written = False
+
+    def _write_meta(self, frame: np.ndarray):
+        meta = {"width": frame.shape[1], "height": frame.shape[0], "codec": self.codec, "created": time.time()}
+        with open(os.path.join(self.path, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+        self._meta_written = True
+
+    def write(self, frame: np.ndarray, timestamp: float | None = None):
+        timestamp = time.monotonic() if timestamp is None else timestamp
+        if self.started_at is None:
+            self.started_at = timestamp
+        if not self._meta_written:
+            self._write_meta(frame)
+        ok, encoded = cv2.imencode(f".{self.codec}", frame, self.params)
+        if not ok:
+            raise ValueError("Frame could not be encoded")
+        self.frames.write(encoded)
+        # Кадр попадает в файл раньше своей записи индекса: индекс никогда не ссылается на недописанный кадр
+        self.frames.flush()
+        self._record["offset"] = self.offset
+        self._record["size"] = encoded.size
+        self._record["t"] = timestamp - self.started_at
+        self.index.write(self._record.tobytes())
+        self.offset += encoded.size
+        self.count += 1
+        if self.count % INDEX_FLUSH_FRAMES == 0:
+            self.index.flush()
+
+    def close(self):
+        self.frames.close()
+        self.index.close()
+
+
+class RecordingCapture:
+    """Wraps a cv2.VideoCapture and records every grabbed frame while passing it through."""
+
+    def __init__(self, cap, recorder: FrameRecorder):
+        self.cap = cap
+        self.recorder = recorder
+        self._frame = None
+
+    def grab(self) -> bool:
+        if not self.cap.grab():
+            return False
+        ret, self._frame = self.cap.retrieve(self._frame)
+        if ret:
+            self.recorder.write(self._frame)
+        return ret
+
+    def retrieve(self, image=None):
+        if self._frame is None:
+            return False, image
+        if image is None or image.shape != self._frame.shape:
+            return True, self._frame.copy()
+        np.copyto(image, self._frame)
+        return True, image
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, image
+        return self.retrieve(image)
+
+    def release(self):
+        self.cap.release()
+        self.recorder.close()
+
+    def __getattr__(self, name):
+        return getattr(self.cap, name)
+
+
+# === Replay ===
+class ReplayCapture:
+    """Plays a recording back through the cv2.VideoCapture interface the detector uses.
+
+    speed=1.0 keeps the recorded timing, 2.0 plays twice as fast and None feeds frames as fast
+    as they are grabbed. Frames are decoded straight from the memory-mapped frames.bin.
+    """
+
+    def __init__(self, path: str, speed: float | None = 1.0, loop: bool = False):
+        self.path = path
+        self.speed = speed
+        self.loop = loop
+        with open(os.path.join(path, META_FILE), encoding="utf-8") as f:
+            self.meta = json.load(f)
+        index_path = os.path.join(path, INDEX_FILE)
+        count = os.path.getsize(index_path) // INDEX_DTYPE.itemsize
+        if count == 0:
+            # Запись оборвалась до первого кадра: пустой файл не отображается в память
+            self.index = np.zeros(0, INDEX_DTYPE)
+            self.frames = np.zeros(0, np.uint8)
+        else:
+            self.index = np.memmap(index_path, INDEX_DTYPE, "r", shape=(count,))
+            self.frames = np.memmap(os.path.join(path, FRAMES_FILE), np.uint8, "r")
+        self.position = 0  # индекс следующего кадра
+        self._current = None
+        self._clock_start = None
+
+    def __len__(self):
+        return len(self.index)
+
+    @property
+    def duration(self) -> float:
+        return float(self.index["t"][-1]) if len(self.index) else 0.0
+
+    def due_at(self, position: int) -> float | None:
+        """time.monotonic() at which frame `position` is (or was) played; None before the first grab."""
+        if self._clock_start is None or not self.speed:
+            return None
+        return self._clock_start + float(self.index["t"][position]) / self.speed
+
+    def isOpened(self) -> bool:
+        return len(self.index) > 0
+
+    def seek(self, position: int):
+        self.position = min(max(position, 0), len(self.index))
+        self._clock_start = None
+
+    def set(self, prop, value) -> bool:
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.seek(int(value))
+            return True
+        return False  # разрешение и FPS записи менять нельзя
+
+    def get(self, prop) -> float:
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            return float(self.position)
+        if prop == cv2.CAP_PROP_FRAME_COUNT:
+            return float(len(self.index))
+        if prop == cv2.CAP_PROP_FRAME_WIDTH:
+            return float(self.meta["width"])
+        if prop == cv2.CAP_PROP_FRAME_HEIGHT:
+            return float(self.meta["height"])
+        if prop == cv2.CAP_PROP_FPS:
+            return (len(self.index) - 1) / self.duration if self.duration else 0.0
+        return 0.0
+
+    def grab(self) -> bool:
+        if self.position >= len(self.index):
+            if not self.loop or not len(self.index):
+                return False
+            self.seek(0)
+        record = self.index[self.position]
+        if self.speed:
+            # Ждём момента, когда кадр был снят, относительно начала воспроизведения
+            if self._clock_start is None:
+                self._clock_start = time.monotonic() - record["t"] / self.speed
+            delay = self._clock_start + record["t"] / self.speed - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+        self._current = record
+        self.position += 1
+        return True
+
+    def _decode(self, record, image=None):
+        start = int(record["offset"])
+        frame = cv2.imdecode(self.frames[start:start + int(record["size"])], cv2.IMREAD_COLOR)
+        if frame is None or image is None or image.shape != frame.shape:
+            return frame
+        # imdecode не умеет писать в готовый массив; копия сохраняет буфер вызывающего
+        np.copyto(image, frame)
+        return image
+
+    def retrieve(self, image=None):
+        if self._current is None:
+            return False, image
+        frame = self._decode(self._current, image)
+        return frame is not None, frame
+
+    def read(self, image=None):
+        if not self.grab():
+            return False, image
+        return self.retrieve(image)
+
+    def frames_with_time(self, start: int = 0, stop: int | None = None):
+        """Decodes frames in order without pacing: (frame, seconds from start); for offline runs."""
+        stop = len(self.index) if stop is None else min(stop, len(self.index))
+        for position in range(start, stop):
+            record = self.index[position]
+            yield self._decode(record), float(record["t"])
+
+    def release(self):
+        # memmap закрывается вместе с последней ссылкой на него
+        self.index = self.index[:0]
+        self.frames = self.frames[:0]
+
+
+def is_recording(source) -> bool:
+    return isinstance(source, str) and os.path.isfile(os.path.join(source, INDEX_FILE))
+
+
+def open_capture(source, replay_speed: float | None = 1.0):
+    """cv2.VideoCapture for a camera id, file or URL; ReplayCapture for a recording directory."""
+    if is_recording(source):
+        return ReplayCapture(source, replay_speed)
+    return cv2.VideoCapture(source)
+
+
+# === Command line ===
+def record(camera_id, path: str, seconds: float, codec: str):
+    cap = cv2.VideoCapture(camera_id)
+    if not cap.isOpened():
+        print(f"[❌] Failed to open camera {camera_id}")
+        return
+    cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+    cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+    recorder = FrameRecorder(path, codec)
+    capture = RecordingCapture(cap, recorder)
+    print(f"[⏺] Recording camera {camera_id} to {path} for {seconds:.0f} s (Ctrl+C to stop)...")
+    deadline = time.monotonic() + seconds
+    try:
+        while time.monotonic() < deadline and capture.grab():
+            pass
+    except KeyboardInterrupt:
+        pass
+    finally:
+        capture.release()
+    print(f"[✓] Recorded {recorder.count} frames, {recorder.offset / 1e6:.1f} MB")
+
+
+def info(path: str):
+    replay = ReplayCapture(path)
+    sizes = replay.index["size"]
+    print(f"{path}: {len(replay)} frames, {replay.meta['width']}x{replay.meta['height']} {replay.meta['codec']}, "
+          f"{replay.duration:.1f} s, {replay.get(cv2.CAP_PROP_FPS):.1f} fps, "
+          f"{sizes.sum() / 1e6:.1f} MB ({sizes.mean() / 1e3:.0f} kB per frame)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Record the laptop camera for offline detection runs")
+    commands = parser.add_subparsers(dest="command", required=True)
+    record_parser = commands.add_parser("record", help="record a camera into a directory")
+    record_parser.add_argument("path")
+    record_parser.add_argument("--camera", default="6", help="camera index, file or URL")
+    record_parser.add_argument("--seconds", type=float, default=600)
+    record_parser.add_argument("--codec", choices=("jpg", "png"), default="jpg")
+    info_parser = commands.add_parser("info", help="describe a recording")
+    info_parser.add_argument("path")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.command == "record":
+        record(int(args.camera) if args.camera.isdigit() else args.camera, args.path, args.seconds, args.codec)
+    else:
+        info(args.path)
@@ -0,0 +1,373 @@
+import asyncio
+import base64
+import functools
+import json
+import logging
+import os
+import sys
+import time
+
+import mini.mini_sdk as MiniSdk
+from mini.dns.dns_browser import WiFiDevice
+from mini.apis.base_api import BaseApi, BaseEventApi, MiniApiResultType
+from mini.apis import base_api
+from mini.channels.websocket_client import AbstractMsgHandler
+from google.protobuf import symbol_database
+
+import discovery_cache
+
+# === SDK Configuration ===
+MiniSdk.set_log_level(logging.INFO)
+MiniSdk.set_robot_type(MiniSdk.RobotType.EDU)
+
+# === Constants ===
+ROBOT_ID = "412"
+SEARCH_TIMEOUT = 20
+SLEEP_AFTER_PROGRAM = 1
+SOCKET_PATH = os.environ.get("ALPHAMINI_SOCKET", f"/tmp/alphamini_{ROBOT_ID}.sock")
+ATTACH_TIMEOUT = 0.5  # сек — сколько ждём ответа демона при подключении
+
+
+# === Wire format ===
+# Protobuf-сообщения SDK передаём как имя типа + сериализованные байты, чтобы у получателя был тот же тип
+def _encode_message(message) -> dict | None:
+    if message is None:
+        return None
+    return {
+        "type": message.DESCRIPTOR.full_name,
+        "data": base64.b64encode(message.SerializeToString()).decode(),
+    }
+
+
+def _decode_message(payload: dict | None):
+    if not payload:
+        return None
+    message = symbol_database.Default().GetSymbol(payload["type"])()
+    message.ParseFromString(base64.b64decode(payload["data"]))
+    return message
+
+
+class _EventForwarder(AbstractMsgHandler):
+    """Relays the events the robot pushes for one command (face count, IR observer...) to a client."""
+
+    def __init__(self, writer: asyncio.StreamWriter):
+        super().__init__()
+        self.writer = writer
+
+    def handle_msg(self, message):
+        if not self.writer.is_closing():
+            self.writer.write(json.dumps({"event": _encode_message(message)}).encode() + b"\n")
+
+
+# === Daemon (owns the single robot connection) ===
+class RobotDaemon:
+    """Long-running owner of the robot connection, serving scripts over a Unix socket."""
+
+    def __init__(self, serial_suffix: str = ROBOT_ID, socket_path: str = SOCKET_PATH):
+        self.serial_suffix = serial_suffix
+        self.socket_path = socket_path
+        self.device: WiFiDevice | None = None
+        self.started_at = 0.0
+        self.request_count = 0
+        self.client_count = 0
+        # SDK на первом же ответе снимает все обработчики команды, поэтому одинаковые команды
+        # разных запросов отправляем по очереди, иначе второй запрос ждал бы свой ответ 300 с
+        self._command_locks: dict[int, asyncio.Lock] = {}
+
+    async def connect_robot(self) -> bool:
+        self.device = await discovery_cache.connect_robot(self.serial_suffix, SEARCH_TIMEOUT)
+        if not self.device:
+            return False
+
+        await MiniSdk.enter_program()
+        print("[✓] Entered programming mode")
+        await asyncio.sleep(SLEEP_AFTER_PROGRAM)
+        return True
+
+    async def send(self, args: dict, writer: asyncio.StreamWriter, forwarders: dict) -> dict:
+        """Sends a request a client's SDK block has already built; the raw SDK reply goes back."""
+        self.request_count += 1
+        cmd_id = int(args["cmd_id"])
+        message = _decode_message(args["message"])
+        timeout = args.get("timeout", 0)
+
+        if args.get("subscribe") and cmd_id not in forwarders:
+            forwarders[cmd_id] = _EventForwarder(writer)
+            base_api.socket.register_msg_handler(cmd_id, forwarders[cmd_id])
+        if timeout <= 0:
+            sent = await base_api.socket.send_msg0(cmd_id, message)
+            return {"result": MiniApiResultType.Success.name if sent else MiniApiResultType.Timeout.name}
+
+        async with self._command_locks.setdefault(cmd_id, asyncio.Lock()):
+            reply = await base_api.socket.send_msg(cmd_id, message, timeout)
+        if reply is None:
+            return {"result": MiniApiResultType.Timeout.name, "response": None}
+        return {"result": MiniApiResultType.Success.name, "response": _encode_message(reply)}
+
+    def status(self) -> dict:
+        return {
+            "robot": self.device.name if self.device else None,
+            "address": self.device.address if self.device else None,
+            "uptime": round(time.time() - self.started_at, 1),
+            "requests": self.request_count,
+            "clients": self.client_count,
+        }
+
+    async def _serve_request(self, line: bytes, writer: asyncio.StreamWriter, forwarders: dict):
+        request = None
+        try:
+            request = json.loads(line)
+            api = request.get("api")
+            if api == "ping":
+                reply = {"result": "Success"}
+            elif api == "status":
+                reply = {"result": "Success", "response": self.status()}
+            elif api == "send":
+                reply = await self.send(request.get("args", {}), writer, forwarders)
+            else:
+                reply = {"error": f"unknown api '{api}'"}
+        except Exception as e:
+            reply = {"error": str(e)}
+        reply["id"] = request.get("id") if isinstance(request, dict) else None
+        if writer.is_closing():
+            return
+        writer.write(json.dumps(reply).encode() + b"\n")
+        try:
+            await writer.drain()
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+
+    async def _handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.client_count += 1
+        forwarders: dict[int, _EventForwarder] = {}
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                # Каждый запрос — своя задача: StopAllAction не должен ждать, пока дойдёт MoveRobot
+                task = asyncio.create_task(self._serve_request(line, writer, forwarders))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            self.client_count -= 1
+            for cmd_id, forwarder in forwarders.items():
+                base_api.socket.unregister_msg_handler(cmd_id, forwarder)
+            writer.close()
+
+    async def serve_forever(self):
+        if not await self.connect_robot():
+            return
+
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+        server = await asyncio.start_unix_server(self._handle_client, path=self.socket_path)
+        self.started_at = time.time()
+        print(f"[✓] Robot daemon listening on {self.socket_path}")
+
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            await MiniSdk.quit_program()
+            await MiniSdk.release()
+            print("[✓] Daemon shutdown complete")
+
+
+# === SDK internals ===
+def _sdk_dispatcher():
+    """The SDK socket's own message dispatcher, where the scripts' observers are registered.
+
+    The SDK has no public way to feed it a message: _UBTWebSocketClient keeps it in the private
+    __dispatch method. This is the only place that reaches for the mangled name; if an SDK update
+    renames it, attaching to the daemon fails here instead of events silently going nowhere.
+    """
+    dispatch = getattr(base_api.socket, "_UBTWebSocketClient__dispatch", None)
+    if dispatch is None:
+        raise RuntimeError("mini SDK changed: _UBTWebSocketClient.__dispatch not found, "
+                           "robot daemon events cannot be delivered")
+    return dispatch
+
+
+# === Client (used by the scripts) ===
+class DaemonClient:
+    """Attaches to a running RobotDaemon; send() mirrors BaseApi.send of the SDK.
+
+    Requests are matched to replies by id, so several can be in flight at once (a MoveRobot
+    and the StopAllAction that preempts it); events the daemon forwards go to the local SDK
+    dispatcher, where the scripts' observers are registered.
+    """
+
+    def __init__(self, socket_path: str = SOCKET_PATH):
+        self.socket_path = socket_path
+        self._reader = None
+        self._writer = None
+        self._read_task: asyncio.Task | None = None
+        self._pending: dict[int, asyncio.Future] = {}
+        self._next_id = 0
+        self._dispatch = None
+
+    async def attach(self) -> bool:
+        if not os.path.exists(self.socket_path):
+            return False
+        self._dispatch = _sdk_dispatcher()
+        try:
+            self._reader, self._writer = await asyncio.wait_for(
+                asyncio.open_unix_connection(self.socket_path), ATTACH_TIMEOUT)
+            self._read_task = asyncio.create_task(self._read_loop())
+            reply = await asyncio.wait_for(self._request({"api": "ping"}), ATTACH_TIMEOUT)
+        except (OSError, ConnectionError, asyncio.TimeoutError) as e:
+            print(f"[X] Robot daemon not reachable: {e}")
+            await self.close()
+            return False
+        return reply.get("result") == "Success"
+
+    async def _read_loop(self):
+        try:
+            while True:
+                line = await self._reader.readline()
+                if not line:
+                    break
+                reply = json.loads(line)
+                if "event" in reply:
+                    # Событие от робота: раздаём его так же, как это сделал бы сокет SDK
+                    self._dispatch(_decode_message(reply["event"]))
+                    continue
+                future = self._pending.get(reply.get("id"))
+                if future is not None and not future.done():
+                    future.set_result(reply)
+        except (OSError, ValueError) as e:
+            print(f"[X] Robot daemon connection lost: {e}")
+        finally:
+            for future in self._pending.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("robot daemon closed the connection"))
+
+    async def _request(self, request: dict) -> dict:
+        if self._writer is None or self._read_task is None or self._read_task.done():
+            raise ConnectionError("robot daemon closed the connection")
+        self._next_id += 1
+        request_id = request["id"] = self._next_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+        try:
+            self._writer.write(json.dumps(request).encode() + b"\n")
+            await self._writer.drain()
+            return await future
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def send(self, cmd_id: int, message, timeout: float, subscribe: bool = False):
+        """BaseApi.send through the daemon: the raw reply Message, None on timeout, or bool if timeout <= 0."""
+        args = {"cmd_id": cmd_id, "message": _encode_message(message), "timeout": timeout, "subscribe": subscribe}
+        reply = await self._request({"api": "send", "args": args})
+        if "error" in reply:
+            raise RuntimeError(reply["error"])
+        if timeout <= 0:
+            return reply["result"] == MiniApiResultType.Success.name
+        return _decode_message(reply.get("response"))
+
+    async def status(self) -> dict:
+        return (await self._request({"api": "status"})).get("response", {})
+
+    async def close(self):
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+            self._reader = None
+        if self._read_task is not None:
+            self._read_task.cancel()
+            self._read_task = None
+
+
+# === Routing the scripts' SDK calls ===
+_client: DaemonClient | None = None
+
+
+def _wrap_send():
+    send = BaseApi.send
+    if getattr(send, "_routed", False):
+        return
+
+    # Подменяем самый нижний уровень SDK: execute() блоков, их разбор ответа, а также
+    # обёртки sdk_metrics и pose_tracker работают как при прямом подключении
+    @functools.wraps(send)
+    async def routed_send(self, cmd_id, message, timeout):
+        if _client is None:
+            return await send(self, cmd_id, message, timeout)
+        if timeout <= 0:
+            return await _client.send(cmd_id, message, 0, subscribe=isinstance(self, BaseEventApi))
+        reply = await _client.send(cmd_id, message, timeout)
+        if reply is None:
+            return MiniApiResultType.Timeout, None
+        if reply.header.target == -1:
+            return MiniApiResultType.Unsupported, None
+        return MiniApiResultType.Success, self._parse_msg(reply)
+
+    routed_send._routed = True
+    BaseApi.send = routed_send
+
+
+class RobotSession:
+    """A script's hold on the robot: the daemon's connection if one is running, otherwise its own."""
+
+    def __init__(self, name: str | None, address: str | None, client: DaemonClient | None = None):
+        self.name = name
+        self.address = address
+        self.client = client
+
+    @property
+    def via_daemon(self) -> bool:
+        return self.client is not None
+
+    async def close(self):
+        """Detaches from the daemon, or quits programming mode and releases a direct connection."""
+        global _client
+        if self.client is not None:
+            _client = None
+            await self.client.close()
+            print("[✓] Detached from robot daemon")
+        else:
+            await MiniSdk.quit_program()
+            await MiniSdk.release()
+
+
+async def open_session(serial_suffix: str = ROBOT_ID, search_timeout: int = SEARCH_TIMEOUT,
+                       socket_path: str = SOCKET_PATH) -> RobotSession | None:
+    """Attaches to the robot daemon if it is running; otherwise connects directly and enters programming mode.
+
+    Through the daemon every SDK block the script executes is sent over the daemon's connection,
+    so a script starts in milliseconds instead of paying discovery, connect and enter_program.
+    Returns None if neither worked.
+    """
+    global _client
+    client = DaemonClient(socket_path)
+    if await client.attach():
+        status = await client.status()
+        _wrap_send()
+        _client = client
+        print(f"[✓] Attached to robot daemon on {socket_path} ({status.get('robot')}, "
+              f"up {status.get('uptime')}s)")
+        return RobotSession(status.get("robot"), status.get("address"), client)
+
+    device = await discovery_cache.connect_robot(serial_suffix, search_timeout)
+    if not device:
+        return None
+    await MiniSdk.enter_program()
+    print("[✓] Entered programming mode")
+    await asyncio.sleep(SLEEP_AFTER_PROGRAM)
+    return RobotSession(device.name, device.address)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(RobotDaemon().serve_forever())
+    except KeyboardInterrupt:
+        print("\nDaemon interrupted by user.")
+        sys.exit(0)
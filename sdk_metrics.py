@@ -0,0 +1,241 @@
+import asyncio
+import functools
+import json
+import math
+import os
+import threading
+import time
+from array import array
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from mini.apis.api_action import MoveRobot, StopAllAction, PlayAction
+from mini.apis.api_sence import GetInfraredDistance
+from mini.apis.api_sound import StartPlayTTS, PlayAudio
+from mini.apis.base_api import BaseEventApi, MiniApiResultType
+
+# === Constants ===
+METRICS_HOST = "127.0.0.1"
+METRICS_PORT = 9108
+DUMP_PATH = "metrics.json"
+DUMP_INTERVAL = 30  # сек
+
+# Логарифмические корзины: 8 на каждое удвоение (~9% точность) от 0.1 мс до ~10 мин
+MIN_LATENCY = 0.0001
+BUCKETS_PER_DOUBLING = 8
+BUCKET_COUNT = 8 * 23
+
+INSTRUMENTED_BLOCKS = (MoveRobot, StopAllAction, PlayAction, GetInfraredDistance, StartPlayTTS, PlayAudio)
+
+
+# === Histogram ===
+class LatencyHistogram:
+    """HDR-style histogram: fixed log-spaced buckets, so memory does not grow with samples."""
+
+    def __init__(self):
+        self.buckets = array("L", [0] * BUCKET_COUNT)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    @staticmethod
+    def _bucket(seconds: float) -> int:
+        if seconds <= MIN_LATENCY:
+            return 0
+        index = int(math.log2(seconds / MIN_LATENCY) * BUCKETS_PER_DOUBLING) + 1
+        return min(index, BUCKET_COUNT - 1)
+
+    @staticmethod
+    def _upper_bound(index: int) -> float:
+        return MIN_LATENCY * 2 ** (index / BUCKETS_PER_DOUBLING)
+
+    def record(self, seconds: float, ok: bool = True):
+        self.buckets[self._bucket(seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        if not ok:
+            self.errors += 1
+
+    def quantile(self, q: float) -> float:
+        if self.count == 0:
+            return 0.0
+        rank = math.ceil(q * self.count)
+        seen = 0
+        for index, n in enumerate(self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+            "sum": self.total,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "max": self.max,
+        }
+
+
+# === Registry ===
+class MetricsRegistry:
+    def __init__(self):
+        self.histograms: dict[str, LatencyHistogram] = {}
+        self.gauges: dict[str, float] = {}
+        self.lock = threading.Lock()  # HTTP-поток читает, event loop пишет
+
+    def record(self, name: str, seconds: float, ok: bool = True):
+        with self.lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = LatencyHistogram()
+            histogram.record(seconds, ok)
+
+    def set_gauge(self, name: str, value: float):
+        with self.lock:
+            self.gauges[name] = value
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {name: histogram.snapshot() for name, histogram in sorted(self.histograms.items())}
+
+    def gauge_snapshot(self) -> dict:
+        with self.lock:
+            return dict(sorted(self.gauges.items()))
+
+    def export(self) -> dict:
+        return {"time": time.time(), "apis": self.snapshot(), "gauges": self.gauge_snapshot()}
+
+    def prometheus(self) -> str:
+        lines = [
+            "# TYPE alphamini_api_latency_seconds summary",
+            "# TYPE alphamini_api_errors_total counter",
+        ]
+        for name, s in self.snapshot().items():
+            label = f'api="{name}"'
+            lines.append(f'alphamini_api_latency_seconds{{{label},quantile="0.5"}} {s["p50"]:.6f}')
+            lines.append(f'alphamini_api_latency_seconds{{{label},quantile="0.99"}} {s["p99"]:.6f}')
+            lines.append(f'alphamini_api_latency_seconds{{{label},quantile="1"}} {s["max"]:.6f}')
+            lines.append(f"alphamini_api_latency_seconds_sum{{{label}}} {s['sum']:.6f}")
+            lines.append(f"alphamini_api_latency_seconds_count{{{label}}} {s['count']}")
+            lines.append(f"alphamini_api_errors_total{{{label}}} {s['errors']}")
+        lines.append("# TYPE alphamini_gauge gauge")
+        for name, value in self.gauge_snapshot().items():
+            lines.append(f'alphamini_gauge{{name="{name}"}} {value}')
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+
+# === SDK instrumentation ===
+def _is_ok(result) -> bool:
+    if isinstance(result, tuple):
+        result_type, response = result
+        return result_type == MiniApiResultType.Success and getattr(response, "isSuccess", True) is not False
+    return bool(result)
+
+
+def _wrap_execute(block_class):
+    execute = block_class.execute
+    if getattr(execute, "_instrumented", False):
+        return
+
+    @functools.wraps(execute)
+    async def timed_execute(self):
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = await execute(self)
+            ok = _is_ok(result)
+            return result
+        finally:
+            registry.record(block_class.__name__, time.perf_counter() - started, ok)
+
+    timed_execute._instrumented = True
+    block_class.execute = timed_execute
+
+
+def _wrap_set_handler():
+    set_handler = BaseEventApi.set_handler
+    if getattr(set_handler, "_instrumented", False):
+        return
+
+    @functools.wraps(set_handler)
+    def timed_set_handler(self, handler=None):
+        if handler is None:
+            return set_handler(self, handler)
+        name = f"{type(self).__name__}.handler"
+
+        def timed_handler(message):
+            started = time.perf_counter()
+            ok = False
+            try:
+                handler(message)
+                ok = True
+            finally:
+                registry.record(name, time.perf_counter() - started, ok)
+
+        return set_handler(self, timed_handler)
+
+    timed_set_handler._instrumented = True
+    BaseEventApi.set_handler = timed_set_handler
+
+
+def instrument_sdk():
+    """Times every execute() of the blocks the scripts use and every observer callback."""
+    for block_class in INSTRUMENTED_BLOCKS:
+        _wrap_execute(block_class)
+    _wrap_set_handler()
+
+
+# === Export ===
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path == "/metrics":
+            body = registry.prometheus().encode()
+            content_type = "text/plain; version=0.0.4"
+        elif self.path == "/metrics.json":
+            body = json.dumps(registry.export(), indent=2).encode()
+            content_type = "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(host: str = METRICS_HOST, port: int = METRICS_PORT) -> ThreadingHTTPServer | None:
+    try:
+        server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    except OSError as e:
+        print(f"[X] Metrics endpoint not started: {e}")
+        return None
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"[✓] Metrics at http://{host}:{port}/metrics")
+    return server
+
+
+def dump_json(path: str = DUMP_PATH):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry.export(), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+async def dump_periodically(path: str = DUMP_PATH, interval: float = DUMP_INTERVAL):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            dump_json(path)
+        except OSError as e:
+            print(f"[X] Metrics dump failed: {e}")
@@ -0,0 +1,142 @@
+import asyncio
+import heapq
+import itertools
+import time
+
+from mini.apis.api_sound import StartPlayTTS
+from mini.apis.base_api import MiniApiResultType
+
+from sdk_metrics import registry
+
+# === Priorities (меньше — важнее) ===
+SAFETY = 0
+FACE_GREETING = 1
+PROMOTION = 2
+
+PRIORITY_NAMES = {SAFETY: "safety", FACE_GREETING: "face", PROMOTION: "promotion"}
+
+# Через сколько секунд фраза теряет смысл и выбрасывается из очереди
+MAX_AGE = {SAFETY: 3.0, FACE_GREETING: 4.0, PROMOTION: 10.0}
+
+MAX_QUEUE = 4
+TTS_TIMEOUT = 30  # сек — у SDK по умолчанию 300 с
+
+
+class _Phrase:
+    def __init__(self, text: str, priority: int):
+        self.text = text
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+
+    @property
+    def stale(self) -> bool:
+        return time.monotonic() - self.enqueued_at > MAX_AGE[self.priority]
+
+
+# === Scheduler ===
+class SpeechScheduler:
+    """Speaks one phrase at a time from a small priority queue.
+
+    Duplicate phrases are merged and phrases older than MAX_AGE are dropped. Speech that is already
+    playing is never interrupted: the SDK matches replies by command id, so a StopPlayTTS sent while
+    StartPlayTTS is pending would swallow the StartPlayTTS reply.
+
+    With a phrase_cache, pre-rendered phrases are played as audio and only unknown text goes
+    through the robot's TTS engine.
+    """
+
+    def __init__(self, max_queue: int = MAX_QUEUE, phrase_cache=None):
+        self.max_queue = max_queue
+        self.phrase_cache = phrase_cache
+        self._heap: list[tuple[int, int, _Phrase]] = []
+        self._order = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._speaking: _Phrase | None = None
+        self._task = None
+        self.dropped = 0
+        self.coalesced = 0
+
+    def _update_depth(self):
+        registry.set_gauge("speech.queue_depth", len(self._heap))
+
+    def say(self, text: str, priority: int = PROMOTION) -> bool:
+        """Queues a phrase without waiting for it; returns False if it was rejected."""
+        for index, (_, _, queued) in enumerate(self._heap):
+            if queued.text == text:
+                self.coalesced += 1
+                if priority < queued.priority:
+                    queued.priority = priority
+                    self._heap[index] = (priority, self._heap[index][1], queued)
+                    heapq.heapify(self._heap)
+                return True
+        if self._speaking is not None and self._speaking.text == text:
+            self.coalesced += 1
+            return True
+
+        if len(self._heap) >= self.max_queue:
+            # Вытесняем самую неважную (и самую новую среди равных) фразу, если новая важнее
+            worst = max(self._heap)
+            if worst[0] <= priority:
+                self.dropped += 1
+                print(f"[SPEECH] Queue full, dropped: '{text}'")
+                return False
+            self._heap.remove(worst)
+            heapq.heapify(self._heap)
+            self.dropped += 1
+
+        heapq.heappush(self._heap, (priority, next(self._order), _Phrase(text, priority)))
+        self._update_depth()
+        self._wakeup.set()
+        return True
+
+    def _next_phrase(self) -> _Phrase | None:
+        while self._heap:
+            _, _, phrase = heapq.heappop(self._heap)
+            if not phrase.stale:
+                return phrase
+            self.dropped += 1
+            print(f"[SPEECH] Dropped stale phrase: '{phrase.text}'")
+        return None
+
+    async def _speak(self, text: str):
+        if self.phrase_cache is not None and await self.phrase_cache.play(text):
+            print(f"Spoke (cached): '{text}'")
+            return
+        try:
+            result_type, response = await asyncio.wait_for(StartPlayTTS(text=text).execute(), TTS_TIMEOUT)
+            if result_type == MiniApiResultType.Success and response is not None and response.isSuccess:
+                print(f"Spoke: '{text}'")
+            else:
+                print(f"[SPEECH] TTS failed for '{text}'")
+        except asyncio.TimeoutError:
+            print(f"[SPEECH] TTS timed out for '{text}'")
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            phrase = self._next_phrase()
+            self._update_depth()
+            while phrase is not None:
+                self._speaking = phrase
+                registry.record(f"speech.enqueue_to_audio.{PRIORITY_NAMES[phrase.priority]}",
+                                time.monotonic() - phrase.enqueued_at)
+                try:
+                    await self._speak(phrase.text)
+                finally:
+                    self._speaking = None
+
+                phrase = self._next_phrase()
+                self._update_depth()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+        self._heap.clear()
+        self._update_depth()
@@ -0,0 +1,84 @@
+import time
+from collections import deque
+
+import numpy as np
+
+from mini.apis.api_action import MoveRobotDirection
+
+from ir_stream import IRDistanceStream, NO_READING_MM
+from motion_plan import STEP_SECONDS
+from pose_tracker import PoseTracker
+from sdk_metrics import registry
+
+# === Constants ===
+MIN_CHUNK_STEPS = 1
+MAX_CHUNK_STEPS = 10  # 10 шагов ≈ 600 мм — примерно предел ИК-датчика
+MARGIN_MM = 50  # запас до порога сторожа: кусок должен кончаться до того, как тот сработает
+TREND_SECONDS = 1.0  # по замерам за это время оцениваем, приближается ли препятствие само
+MIN_TREND_SAMPLES = 3
+RATE_WINDOW = 60  # сек — окно для шагов и остановок в минуту
+
+
+class StepGovernor:
+    """Picks the MoveRobot step count of each forward chunk from the measured clearance.
+
+    The chunk is the number of steps that ends MARGIN_MM short of the watchdog threshold,
+    taking into account how fast the obstacle itself is closing in (the slope of the recent
+    readings, e.g. a visitor walking towards the robot). In an open aisle that is a long chunk
+    and few round trips; near an obstacle it is single steps, so the robot creeps up instead
+    of being stopped by the watchdog. Steps and watchdog stops per minute are exported as
+    gauges to check that throughput goes up without more near-misses.
+    """
+
+    def __init__(self, stream: IRDistanceStream, pose: PoseTracker, threshold_mm: float,
+                 min_steps: int = MIN_CHUNK_STEPS, max_steps: int = MAX_CHUNK_STEPS):
+        self.stream = stream
+        self.pose = pose
+        self.threshold_mm = threshold_mm
+        self.min_steps = min_steps
+        self.max_steps = max_steps
+        self.started_at = time.monotonic()
+        self.events: deque = deque()  # (время, шагов, остановлен ли сторожем)
+        self._steps_before = pose.steps_walked
+
+    def closing_speed(self) -> float:
+        """How fast the reading shrinks on its own, mm/s (0 if steady or receding)."""
+        # Только замеры с момента остановки: на ходу и на повороте расстояние меняет сам робот
+        samples = [(t, d) for t, d in self.stream.ring.recent(self.stream.ring.capacity)
+                   if d < NO_READING_MM and t >= self.pose.moved_at]
+        if not samples:
+            return 0.0
+        latest = samples[-1][0]
+        samples = [(t, d) for t, d in samples if t >= latest - TREND_SECONDS]
+        if len(samples) < MIN_TREND_SAMPLES or latest - samples[0][0] <= 0:
+            return 0.0
+        times, distances = np.array(samples).T
+        slope = np.polyfit(times - latest, distances, 1)[0]
+        return max(-float(slope), 0.0)
+
+    def chunk(self, distance_mm: float) -> int:
+        if distance_mm >= NO_READING_MM:
+            # Так ir_stream сообщает об отказе датчика: это не свободный проход, идём по шагу
+            registry.set_gauge("governor.chunk_steps", self.min_steps)
+            return self.min_steps
+        step_mm = self.pose.step_length_mm
+        step_seconds = STEP_SECONDS[MoveRobotDirection.FORWARD]
+        free_mm = distance_mm - self.threshold_mm - MARGIN_MM
+        # За каждый шаг робот проходит step_mm, а препятствие приближается ещё на closing * время шага
+        steps = int(free_mm // (step_mm + self.closing_speed() * step_seconds))
+        steps = min(max(steps, self.min_steps), self.max_steps)
+        registry.set_gauge("governor.chunk_steps", steps)
+        return steps
+
+    def record(self, preempted: bool):
+        """Call after every guarded forward chunk; preempted is True if the watchdog stopped it."""
+        now = time.monotonic()
+        steps = self.pose.steps_walked - self._steps_before
+        self._steps_before = self.pose.steps_walked
+        self.events.append((now, steps, preempted))
+        while self.events and self.events[0][0] < now - RATE_WINDOW:
+            self.events.popleft()
+        minutes = min(now - self.started_at, RATE_WINDOW) / 60
+        if minutes > 0:
+            registry.set_gauge("governor.steps_per_min", round(sum(e[1] for e in self.events) / minutes, 1))
+            registry.set_gauge("governor.stops_per_min", round(sum(e[2] for e in self.events) / minutes, 2))